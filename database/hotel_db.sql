@@ -136,4 +136,374 @@ ALTER TABLE public.reservation_room
 
 ALTER TABLE public.reservation_room
   ADD CONSTRAINT fk_rr_room
-  FOREIGN KEY (room_id) REFERENCES public.room(room_id);
\ No newline at end of file
+  FOREIGN KEY (room_id) REFERENCES public.room(room_id);
+-- Secondary indexes for the hot query paths (see migrations.py, version 1).
+-- On an existing database apply them online with: python migrations.py
+CREATE INDEX IF NOT EXISTS idx_reservation_guest_id ON public.reservation (guest_id);
+CREATE INDEX IF NOT EXISTS idx_reservation_room_room_id ON public.reservation_room (room_id);
+CREATE INDEX IF NOT EXISTS idx_room_status_floor ON public.room (status, floor, room_id);
+CREATE INDEX IF NOT EXISTS idx_guest_family_name ON public.guest (family, name);
+CREATE INDEX IF NOT EXISTS idx_guest_address_guest_id ON public.guest_address (guest_id);
+
+-- Active reservations are a small, hot slice of the table (migrations.py, version 2).
+CREATE INDEX IF NOT EXISTS idx_reservation_active ON public.reservation (res_id DESC) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_reservation_active_guest ON public.reservation (guest_id) WHERE status = 'active';
+
+-- Finished/canceled history, partitioned by check_out year (migrations.py, version 3).
+-- Yearly partitions are created on demand by history.ensure_history_partitions().
+CREATE TABLE IF NOT EXISTS public.reservation_history (
+  res_id        integer NOT NULL,
+  guest_id      integer NOT NULL,
+  emp_id        integer NOT NULL,
+  check_in      date    NOT NULL,
+  check_out     date    NOT NULL,
+  booking_date  timestamp without time zone NOT NULL,
+  num_people    integer NOT NULL,
+  status        varchar(20) NOT NULL,
+  total_cost    numeric(10,2) NOT NULL,
+  payment       numeric(10,2) NOT NULL,
+  discount      numeric(5,2)  NOT NULL,
+  archived_at   timestamp without time zone NOT NULL DEFAULT now(),
+  CONSTRAINT chk_res_history_status CHECK (status IN ('canceled','finished')),
+  PRIMARY KEY (res_id, check_out)
+) PARTITION BY RANGE (check_out);
+
+CREATE TABLE IF NOT EXISTS public.reservation_room_history (
+  res_id    integer NOT NULL,
+  room_id   integer NOT NULL,
+  check_out date    NOT NULL,
+  PRIMARY KEY (res_id, room_id, check_out)
+) PARTITION BY RANGE (check_out);
+
+CREATE INDEX IF NOT EXISTS idx_reservation_history_guest ON public.reservation_history (guest_id);
+CREATE INDEX IF NOT EXISTS idx_reservation_room_history_room ON public.reservation_room_history (room_id);
+
+-- Totals of archived reservations by check_out month (migrations.py, version 4).
+CREATE TABLE IF NOT EXISTS public.reservation_rollup (
+  month         date PRIMARY KEY,
+  reservations  integer       NOT NULL DEFAULT 0,
+  total_cost    numeric(14,2) NOT NULL DEFAULT 0,
+  payment       numeric(14,2) NOT NULL DEFAULT 0
+);
+
+-- Day-of arrival/departure queues (migrations.py, version 5).
+CREATE INDEX IF NOT EXISTS idx_reservation_arrivals ON public.reservation (check_in) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_reservation_departures ON public.reservation (check_out) WHERE status = 'active';
+
+-- Scheduler bookkeeping (migrations.py, version 6).
+CREATE TABLE IF NOT EXISTS public.scheduler_job (
+  name              varchar(64) PRIMARY KEY,
+  last_started_at   timestamp without time zone,
+  last_finished_at  timestamp without time zone,
+  last_duration_ms  integer,
+  last_error        text,
+  runs              integer NOT NULL DEFAULT 0
+);
+
+-- Per-night room inventory (migrations.py, version 7).
+CREATE TABLE IF NOT EXISTS public.room_night (
+  room_id  integer NOT NULL,
+  night    date    NOT NULL,
+  res_id   integer NOT NULL,
+  PRIMARY KEY (room_id, night),
+  CONSTRAINT fk_room_night_room FOREIGN KEY (room_id) REFERENCES public.room(room_id) ON DELETE CASCADE,
+  CONSTRAINT fk_room_night_res FOREIGN KEY (res_id) REFERENCES public.reservation(res_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_room_night_night ON public.room_night (night);
+CREATE INDEX IF NOT EXISTS idx_room_night_res ON public.room_night (res_id);
+
+-- Bot subscriptions and the hotel_events change feed (migrations.py, version 8).
+CREATE TABLE IF NOT EXISTS public.bot_subscription (
+  chat_id     bigint      NOT NULL,
+  event       varchar(32) NOT NULL,
+  created_at  timestamp without time zone NOT NULL DEFAULT now(),
+  PRIMARY KEY (chat_id, event)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bot_subscription_event ON public.bot_subscription (event);
+
+CREATE TABLE IF NOT EXISTS public.overdue_notice (
+  res_id       integer PRIMARY KEY,
+  notified_at  timestamp without time zone NOT NULL DEFAULT now(),
+  CONSTRAINT fk_overdue_notice_res FOREIGN KEY (res_id) REFERENCES public.reservation(res_id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION public.notify_room_cleaning() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('hotel_events', json_build_object(
+    'event', 'room_cleaning', 'room_id', NEW.room_id, 'floor', NEW.floor)::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_room_cleaning ON public.room;
+CREATE TRIGGER trg_room_cleaning
+AFTER UPDATE OF status ON public.room
+FOR EACH ROW
+WHEN (NEW.status = 'cleaning' AND OLD.status IS DISTINCT FROM 'cleaning')
+EXECUTE FUNCTION public.notify_room_cleaning();
+
+CREATE OR REPLACE FUNCTION public.notify_reservation_created() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('hotel_events', json_build_object(
+    'event', 'reservation_created', 'res_id', NEW.res_id,
+    'check_in', NEW.check_in, 'check_out', NEW.check_out)::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_reservation_created ON public.reservation;
+CREATE TRIGGER trg_reservation_created
+AFTER INSERT ON public.reservation
+FOR EACH ROW
+EXECUTE FUNCTION public.notify_reservation_created();
+
+-- Telegram bot sessions (migrations.py, version 9).
+CREATE TABLE IF NOT EXISTS public.bot_session (
+  chat_id     bigint PRIMARY KEY,
+  emp_id      integer,
+  data        jsonb NOT NULL DEFAULT '{}',
+  expires_at  timestamp without time zone NOT NULL,
+  CONSTRAINT fk_bot_session_emp FOREIGN KEY (emp_id) REFERENCES public.employee(emp_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_bot_session_expires ON public.bot_session (expires_at);
+
+-- Inventory version for in-process availability indexes (migrations.py, version 10).
+CREATE TABLE IF NOT EXISTS public.inventory_version (
+  id       smallint PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  version  bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO public.inventory_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.bump_inventory_version() RETURNS trigger AS $$
+BEGIN
+  UPDATE public.inventory_version SET version = version + 1 WHERE id = 1;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_room_night_version ON public.room_night;
+CREATE TRIGGER trg_room_night_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.room_night
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.bump_inventory_version();
+
+DROP TRIGGER IF EXISTS trg_room_version ON public.room;
+CREATE TRIGGER trg_room_version
+AFTER INSERT OR DELETE OR UPDATE OF room_id, type, capacity, floor, bed_type, smoking OR TRUNCATE ON public.room
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.bump_inventory_version();
+
+-- Rooms the assignment optimizer must not move (migrations.py, version 11).
+ALTER TABLE public.reservation ADD COLUMN IF NOT EXISTS room_locked boolean NOT NULL DEFAULT false;
+
+-- Waitlist for bookings that could not be placed (migrations.py, version 12).
+CREATE TABLE IF NOT EXISTS public.waitlist (
+  wait_id        integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  guest_id       integer NOT NULL,
+  emp_id         integer NOT NULL,
+  check_in       date    NOT NULL,
+  check_out      date    NOT NULL,
+  room_type      varchar(50),
+  min_capacity   integer,
+  rooms          integer NOT NULL DEFAULT 1,
+  num_people     integer NOT NULL,
+  status         varchar(10) NOT NULL DEFAULT 'waiting',
+  matched_rooms  integer[],
+  res_id         integer,
+  created_at     timestamp without time zone NOT NULL DEFAULT now(),
+  matched_at     timestamp without time zone,
+
+  CONSTRAINT chk_waitlist_status CHECK (status IN ('waiting','matched','booked','canceled')),
+  CONSTRAINT chk_waitlist_rooms CHECK (rooms > 0),
+  CONSTRAINT chk_waitlist_dates CHECK (check_out > check_in),
+  CONSTRAINT fk_waitlist_guest FOREIGN KEY (guest_id) REFERENCES public.guest(guest_id) ON DELETE CASCADE,
+  CONSTRAINT fk_waitlist_emp FOREIGN KEY (emp_id) REFERENCES public.employee(emp_id),
+  CONSTRAINT fk_waitlist_res FOREIGN KEY (res_id) REFERENCES public.reservation(res_id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_waiting_dates
+  ON public.waitlist USING gist (daterange(check_in, check_out)) WHERE status = 'waiting';
+CREATE INDEX IF NOT EXISTS idx_waitlist_matched_dates
+  ON public.waitlist USING gist (daterange(check_in, check_out)) WHERE status = 'matched';
+
+CREATE OR REPLACE FUNCTION public.notify_waitlist_matched() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('hotel_events', json_build_object(
+    'event', 'waitlist_matched', 'wait_id', NEW.wait_id, 'rooms', NEW.matched_rooms,
+    'check_in', NEW.check_in, 'check_out', NEW.check_out)::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_waitlist_matched ON public.waitlist;
+CREATE TRIGGER trg_waitlist_matched
+AFTER UPDATE OF status ON public.waitlist
+FOR EACH ROW
+WHEN (NEW.status = 'matched' AND OLD.status IS DISTINCT FROM 'matched')
+EXECUTE FUNCTION public.notify_waitlist_matched();
+
+-- Occupancy/revenue forecast written by forecast.py (migrations.py, version 13).
+CREATE TABLE IF NOT EXISTS public.occupancy_forecast (
+  night      date        NOT NULL,
+  room_type  varchar(50) NOT NULL,
+  capacity   integer     NOT NULL,
+  on_books   integer     NOT NULL,
+  rooms      numeric(8,2)  NOT NULL,
+  revenue    numeric(14,2) NOT NULL,
+  fitted_at  timestamp without time zone NOT NULL DEFAULT now(),
+  PRIMARY KEY (night, room_type)
+);
+
+-- Idempotency keys for reservation and payment writes (migrations.py, version 14).
+CREATE TABLE IF NOT EXISTS public.idempotency_key (
+  scope         varchar(20)  NOT NULL,
+  key           varchar(100) NOT NULL,
+  request_hash  char(64),
+  result        jsonb,
+  created_at    timestamp without time zone NOT NULL DEFAULT now(),
+  expires_at    timestamp without time zone NOT NULL,
+  PRIMARY KEY (scope, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_key_expires ON public.idempotency_key (expires_at);
+
+-- Append-only payment ledger and per-reservation paid totals (migrations.py, version 15).
+-- reservation.payment is no longer written; reservation_balance.paid is the paid total.
+CREATE TABLE IF NOT EXISTS public.payment (
+  payment_id  bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  res_id      integer NOT NULL,
+  amount      numeric(10,2) NOT NULL,
+  method      varchar(20)   NOT NULL DEFAULT 'cash',
+  emp_id      integer,
+  reference   varchar(100),
+  posted_at   timestamp without time zone NOT NULL DEFAULT now(),
+  CONSTRAINT payment_amount_check CHECK (amount <> 0),
+  CONSTRAINT payment_method_check CHECK (method IN ('cash','card','transfer','other')),
+  CONSTRAINT fk_payment_res FOREIGN KEY (res_id) REFERENCES public.reservation(res_id) ON DELETE CASCADE,
+  CONSTRAINT fk_payment_emp FOREIGN KEY (emp_id) REFERENCES public.employee(emp_id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_payment_res ON public.payment (res_id);
+
+CREATE TABLE IF NOT EXISTS public.reservation_balance (
+  res_id          integer PRIMARY KEY,
+  paid            numeric(12,2) NOT NULL DEFAULT 0,
+  postings        integer NOT NULL DEFAULT 0,
+  last_posted_at  timestamp without time zone,
+  CONSTRAINT fk_balance_res FOREIGN KEY (res_id) REFERENCES public.reservation(res_id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION public.apply_payment_postings() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO public.reservation_balance (res_id, paid, postings, last_posted_at)
+  SELECT res_id, SUM(amount), COUNT(*), MAX(posted_at)
+  FROM posted
+  GROUP BY res_id
+  ORDER BY res_id
+  ON CONFLICT (res_id) DO UPDATE SET
+    paid = reservation_balance.paid + EXCLUDED.paid,
+    postings = reservation_balance.postings + EXCLUDED.postings,
+    last_posted_at = GREATEST(reservation_balance.last_posted_at, EXCLUDED.last_posted_at);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_posted ON public.payment;
+CREATE TRIGGER trg_payment_posted
+AFTER INSERT ON public.payment
+REFERENCING NEW TABLE AS posted
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.apply_payment_postings();
+
+CREATE OR REPLACE FUNCTION public.payment_is_append_only() RETURNS trigger AS $$
+BEGIN
+  RAISE EXCEPTION 'payment is append-only; post a correcting entry instead';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_append_only ON public.payment;
+CREATE TRIGGER trg_payment_append_only
+BEFORE UPDATE ON public.payment
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.payment_is_append_only();
+
+-- Payment ledger kept through archival (migrations.py, version 16).
+-- Postings block deleting their reservation; archive.py moves them to payment_history.
+ALTER TABLE public.payment DROP CONSTRAINT IF EXISTS fk_payment_res;
+ALTER TABLE public.payment ADD CONSTRAINT fk_payment_res
+  FOREIGN KEY (res_id) REFERENCES public.reservation(res_id) ON DELETE RESTRICT;
+
+CREATE OR REPLACE FUNCTION public.payment_is_append_only() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' AND current_setting('hotel.archiving', true) = 'on' THEN
+    RETURN NULL;
+  END IF;
+  RAISE EXCEPTION 'payment is append-only; post a correcting entry instead';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_append_only ON public.payment;
+CREATE TRIGGER trg_payment_append_only
+BEFORE UPDATE OR DELETE ON public.payment
+FOR EACH STATEMENT
+EXECUTE FUNCTION public.payment_is_append_only();
+
+CREATE TABLE IF NOT EXISTS public.payment_history (
+  payment_id  bigint NOT NULL,
+  res_id      integer NOT NULL,
+  amount      numeric(10,2) NOT NULL,
+  method      varchar(20) NOT NULL,
+  emp_id      integer,
+  reference   varchar(100),
+  posted_at   timestamp without time zone NOT NULL,
+  check_out   date NOT NULL,
+  PRIMARY KEY (payment_id, check_out)
+) PARTITION BY RANGE (check_out);
+
+CREATE INDEX IF NOT EXISTS idx_payment_history_res ON public.payment_history (res_id);
+
+-- Rehydrated reservations are held out of archival and not announced (migrations.py, version 17).
+ALTER TABLE public.reservation ADD COLUMN IF NOT EXISTS hold_until timestamp without time zone;
+
+DROP TRIGGER IF EXISTS trg_reservation_created ON public.reservation;
+CREATE TRIGGER trg_reservation_created
+AFTER INSERT ON public.reservation
+FOR EACH ROW
+WHEN (NEW.hold_until IS NULL)
+EXECUTE FUNCTION public.notify_reservation_created();
+
+-- Matched waitlist entries not booked in time expire (migrations.py, version 18).
+ALTER TABLE public.waitlist DROP CONSTRAINT IF EXISTS chk_waitlist_status;
+ALTER TABLE public.waitlist ADD CONSTRAINT chk_waitlist_status
+  CHECK (status IN ('waiting','matched','booked','canceled','expired'));
+
+-- Only one booking may claim a matched waitlist entry (migrations.py, version 19).
+ALTER TABLE public.waitlist DROP CONSTRAINT IF EXISTS chk_waitlist_status;
+ALTER TABLE public.waitlist ADD CONSTRAINT chk_waitlist_status
+  CHECK (status IN ('waiting','matched','booking','booked','canceled','expired'));
+
+DROP TRIGGER IF EXISTS trg_waitlist_matched ON public.waitlist;
+CREATE TRIGGER trg_waitlist_matched
+AFTER UPDATE OF status ON public.waitlist
+FOR EACH ROW
+WHEN (NEW.status = 'matched' AND OLD.status NOT IN ('matched','booking'))
+EXECUTE FUNCTION public.notify_waitlist_matched();
+
+-- Guests whose stays are all archived (migrations.py, version 20).
+CREATE TABLE IF NOT EXISTS public.guest_history (
+  guest_id     integer PRIMARY KEY,
+  name         varchar(50)  NOT NULL,
+  family       varchar(50)  NOT NULL,
+  national_id  varchar(20),
+  passport     varchar(20),
+  birthdate    date         NOT NULL,
+  email        varchar(100) NOT NULL,
+  phones       jsonb        NOT NULL DEFAULT '[]',
+  addresses    jsonb        NOT NULL DEFAULT '[]',
+  emp_ids      integer[]    NOT NULL DEFAULT '{}',
+  archived_at  timestamp without time zone NOT NULL DEFAULT now()
+);
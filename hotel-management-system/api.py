@@ -0,0 +1,433 @@
+"""
+Versioned JSON API (/api/v1) for guests, rooms, reservations and payments
+(the append-only payment ledger; a reservation's "payment" is its paid total).
+
+- Lists are keyset-paged: ?limit= (max API_PAGE_MAX) and ?after=<last key>,
+  the response carries "next" for the following page (null on the last).
+- ?fields=a,b trims rows to those columns in the SELECT itself.
+- POST/PATCH take one object or a list; lists go to the set-based Database
+  methods (one statement per batch, all or nothing) up to API_BULK_MAX rows.
+- POST /reservations and /payments honour an Idempotency-Key header: a
+  retry with the same key and body returns the first result (marked with
+  Idempotent-Replayed: true) and writes nothing.
+- numeric columns are sent as exact decimal strings ("150.00"), dates and
+  timestamps as ISO 8601; nothing goes through float().
+
+Uses the web session (log in through /login); unauthenticated calls get 401.
+"""
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Blueprint, current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from flask_login import current_user
+from psycopg2 import DataError, IntegrityError
+
+from database import GUEST_COLUMNS, ROOM_COLUMNS, IdempotencyKeyReused, db
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+API_PAGE_MAX = 1000
+API_BULK_MAX = int(os.environ.get("API_BULK_MAX", "1000"))
+IDEMPOTENCY_KEY_MAX = 80  # list items use "<key>:<index>" within the 100-char column
+
+# resource -> (table, key column, readable columns, equality filters)
+RESOURCES = {
+    "guests": ("guest", "guest_id", ("guest_id",) + tuple(GUEST_COLUMNS), ("email", "national_id", "passport")),
+    "rooms": ("room", "room_id", ("room_id",) + tuple(ROOM_COLUMNS), ("type", "status", "floor", "bed_type")),
+    "reservations": (
+        "reservation",
+        "res_id",
+        (
+            "res_id", "guest_id", "emp_id", "check_in", "check_out", "booking_date", "num_people",
+            "status", "total_cost", "payment", "discount", "room_locked",
+        ),
+        ("status", "guest_id", "emp_id", "check_in", "check_out"),
+    ),
+    "payments": (
+        "payment",
+        "payment_id",
+        ("payment_id", "res_id", "amount", "method", "emp_id", "reference", "posted_at"),
+        ("res_id", "method", "emp_id"),
+    ),
+}
+
+
+def _default(o):
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, "_asdict"):  # Database CompactCursor rows
+        return o._asdict()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    app.json for the whole app: orjson when installed (dates natively,
+    Decimal via _default), otherwise json with the same _default.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None:
+            return self._dumpb(obj).decode()
+        kwargs.setdefault("ensure_ascii", False)
+        kwargs.setdefault("default", _default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def _dumpb(self, obj, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is not None:
+            body = self._dumpb(obj, indent=indent) + b"\n"
+        else:
+            body = self.dumps(obj, **({"indent": 2} if indent else {"separators": (",", ":")})) + "\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+api = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@api.errorhandler(ApiError)
+def _api_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+
+@api.errorhandler(ValueError)
+def _value_error(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@api.errorhandler(IdempotencyKeyReused)
+def _idempotency_key_reused(e):
+    return jsonify({"error": str(e)}), 422
+
+
+@api.errorhandler(DataError)
+def _data_error(e):
+    return jsonify({"error": e.pgerror.strip() if e.pgerror else str(e)}), 400
+
+
+@api.errorhandler(IntegrityError)
+def _integrity_error(e):
+    return jsonify({"error": e.pgerror.strip() if e.pgerror else str(e)}), 409
+
+
+@api.before_request
+def _require_login():
+    if current_app.config.get("LOGIN_DISABLED") or current_user.is_authenticated:
+        return None
+    return jsonify({"error": "login required"}), 401
+
+
+def _fields(columns, key, extra=()):
+    """?fields= as a column list (key always first, so "next" can be computed)."""
+    wanted = [f.strip() for f in (request.args.get("fields") or "").split(",") if f.strip()]
+    if not wanted:
+        return list(columns)
+    unknown = [f for f in wanted if f not in columns and f not in extra]
+    if unknown:
+        raise ApiError(f"unknown fields: {', '.join(unknown)}")
+    return [key] + [f for f in wanted if f != key]
+
+
+def _body_items():
+    """Request body as a list of objects, and whether it was a list."""
+    body = request.get_json(silent=True)
+    many = isinstance(body, list)
+    items = body if many else [body]
+    if not items or not all(isinstance(i, dict) for i in items):
+        raise ApiError("body must be a JSON object or a non-empty list of objects")
+    if len(items) > API_BULK_MAX:
+        raise ApiError(f"at most {API_BULK_MAX} items per request", 413)
+    return items, many
+
+
+def _idempotency_key():
+    key = (request.headers.get("Idempotency-Key") or "").strip() or None
+    if key and len(key) > IDEMPOTENCY_KEY_MAX:
+        raise ApiError(f"Idempotency-Key is longer than {IDEMPOTENCY_KEY_MAX} characters")
+    return key
+
+
+def _replayed(body, status):
+    response = jsonify(body)
+    response.status_code = status
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _require(items, names):
+    for i, item in enumerate(items):
+        missing = [n for n in names if item.get(n) in (None, "")]
+        if missing:
+            raise ApiError(f"item {i}: missing {', '.join(missing)}")
+
+
+def _only(items, allowed):
+    for i, item in enumerate(items):
+        unknown = set(item) - set(allowed)
+        if unknown:
+            raise ApiError(f"item {i}: unknown fields {', '.join(sorted(unknown))}")
+
+
+def _list(resource):
+    table, key, columns, filters = RESOURCES[resource]
+    fields = _fields(columns, key, extra=("rooms",) if resource == "reservations" else ())
+    with_rooms = "rooms" in fields
+    # reservation.payment is not maintained; the paid total comes from reservation_balance
+    with_paid = resource == "reservations" and "payment" in fields
+    limit = min(max(request.args.get("limit", 100, type=int), 1), API_PAGE_MAX)
+    rows = db.get_page(
+        table,
+        key,
+        [f for f in fields if f != "rooms" and not (with_paid and f == "payment")],
+        after=request.args.get("after", type=int),
+        limit=limit,
+        filters={f: request.args[f] for f in filters if request.args.get(f)},
+    )
+    if with_rooms:
+        from queries import attach_reservation_rooms
+
+        conn = db.get_connection(readonly=True)
+        try:
+            with conn.cursor() as cur:
+                attach_reservation_rooms(cur, rows)
+        finally:
+            db.put_connection(conn)
+    if with_paid:
+        paid = db.get_balances([r[key] for r in rows])
+        for r in rows:
+            r["payment"] = paid.get(r[key], Decimal("0.00"))
+    return jsonify({"data": rows, "next": rows[-1][key] if len(rows) == limit else None})
+
+
+def _one(row, key):
+    if not row:
+        raise ApiError(f"{key} not found", 404)
+    wanted = [f.strip() for f in (request.args.get("fields") or "").split(",") if f.strip()]
+    if wanted:
+        row = {k: v for k, v in row.items() if k in wanted or k == key}
+    return jsonify(row)
+
+
+def _created(ids, many, key):
+    return jsonify({"data": [{key: i} for i in ids]} if many else {key: ids[0]}), 201
+
+
+def _updated(items, found, key):
+    found_set = set(found)
+    missing = [i[key] for i in items if i[key] not in found_set]
+    return jsonify({"updated": found, "not_found": missing})
+
+
+# ---- guests ----
+
+@api.get("/guests")
+def list_guests():
+    return _list("guests")
+
+
+@api.get("/guests/<int:guest_id>")
+def get_guest(guest_id):
+    return _one(db.get_guest_by_id(guest_id), "guest_id")
+
+
+@api.post("/guests")
+def create_guests():
+    items, many = _body_items()
+    _only(items, GUEST_COLUMNS)
+    _require(items, ("name", "family", "birthdate", "email"))
+    return _created(db.add_guests(items), many, "guest_id")
+
+
+@api.patch("/guests")
+def update_guests():
+    items, _ = _body_items()
+    _only(items, ("guest_id",) + tuple(GUEST_COLUMNS))
+    _require(items, ("guest_id",))
+    return _updated(items, db.update_guests(items), "guest_id")
+
+
+# ---- rooms ----
+
+@api.get("/rooms")
+def list_rooms():
+    return _list("rooms")
+
+
+@api.get("/rooms/<int:room_id>")
+def get_room(room_id):
+    return _one(db.get_room_by_id(room_id), "room_id")
+
+
+@api.post("/rooms")
+def create_rooms():
+    items, many = _body_items()
+    _only(items, ("room_id",) + tuple(ROOM_COLUMNS))
+    _require(items, ("room_id", "type", "capacity", "price", "floor", "bed_type", "status"))
+    return _created(db.add_rooms(items), many, "room_id")
+
+
+@api.patch("/rooms")
+def update_rooms():
+    items, _ = _body_items()
+    _only(items, ("room_id",) + tuple(ROOM_COLUMNS))
+    _require(items, ("room_id",))
+    return _updated(items, db.update_rooms(items), "room_id")
+
+
+# ---- reservations ----
+
+@api.get("/reservations")
+def list_reservations():
+    return _list("reservations")
+
+
+@api.get("/reservations/<int:res_id>")
+def get_reservation(res_id):
+    row = db.get_reservation_by_id(res_id)
+    if row:
+        row["rooms"] = [r["room_id"] for r in db.get_reservation_rooms(res_id) or []]
+    return _one(row, "res_id")
+
+
+@api.get("/reservations/<int:res_id>/payments")
+def get_reservation_payments(res_id):
+    row = db.get_reservation_by_id(res_id)
+    if not row:
+        raise ApiError("res_id not found", 404)
+    return jsonify({"res_id": res_id, "payment": row["payment"], "data": db.get_payments(res_id) or []})
+
+
+@api.post("/reservations")
+def create_reservations():
+    """
+    Each stay is placed in its own transaction (its nights are checked
+    against room_night), so a list reports per item: created ids and errors.
+    With an Idempotency-Key, list item i uses "<key>:<i>": a retry returns
+    the stays that were booked and tries the failed ones again.
+    """
+    items, many = _body_items()
+    _only(
+        items,
+        ("guest_id", "check_in", "check_out", "num_people", "total_cost", "rooms", "payment", "payment_method", "discount", "room_locked"),
+    )
+    _require(items, ("guest_id", "check_in", "check_out", "num_people", "total_cost", "rooms"))
+    key = _idempotency_key()
+    if key and not many:
+        done = db.get_idempotent_result("reservation", key, db.request_hash(sorted(items[0].items())))
+        if done:
+            return _replayed({"res_id": done["res_id"]}, 201)
+    created, errors = [], []
+    for i, item in enumerate(items):
+        item_key = (f"{key}:{i}" if many else key) if key else None
+        try:
+            created.append(
+                db.create_reservation(
+                    guest_id=item["guest_id"],
+                    emp_id=current_user.id,
+                    check_in=item["check_in"],
+                    check_out=item["check_out"],
+                    num_people=item["num_people"],
+                    status="active",
+                    total_cost=item["total_cost"],
+                    room_ids=[int(r) for r in item["rooms"]],
+                    payment=item.get("payment", 0),
+                    discount=item.get("discount", 0),
+                    payment_method=item.get("payment_method") or "cash",
+                    room_locked=bool(item.get("room_locked")),
+                    idempotency_key=item_key,
+                    request_hash=db.request_hash(sorted(item.items())) if item_key else None,
+                )
+            )
+        except (ValueError, IntegrityError) as e:
+            if not many:
+                raise
+            errors.append({"index": i, "error": str(e).strip()})
+    if not many:
+        return jsonify({"res_id": created[0]}), 201
+    return jsonify({"data": [{"res_id": r} for r in created], "errors": errors}), 201 if created else 409
+
+
+@api.patch("/reservations")
+def update_reservations():
+    """[{"res_id": 1, "status": "canceled" | "finished"}, ...]: bulk cancel / check-out."""
+    items, _ = _body_items()
+    _only(items, ("res_id", "status"))
+    _require(items, ("res_id", "status"))
+    bad = [i["status"] for i in items if i["status"] not in ("canceled", "finished")]
+    if bad:
+        raise ApiError(f"status must be canceled or finished, got {bad[0]}")
+    canceled = db.cancel_reservations([i["res_id"] for i in items if i["status"] == "canceled"])
+    finished = db.check_out_reservations([i["res_id"] for i in items if i["status"] == "finished"])
+    return _updated(items, canceled + finished, "res_id")
+
+
+# ---- payments ----
+
+@api.get("/payments")
+def list_payments():
+    return _list("payments")
+
+
+@api.post("/payments")
+def create_payments():
+    """
+    Post to the ledger: [{"res_id": 1, "amount": "50.00", "method": "card",
+    "reference": "..."}, ...], one INSERT for the whole batch (negative
+    amounts are refunds). Returns the new paid totals.
+    """
+    items, many = _body_items()
+    _only(items, ("res_id", "amount", "method", "reference"))
+    _require(items, ("res_id", "amount"))
+    try:
+        payments = [
+            (int(i["res_id"]), Decimal(str(i["amount"])), i.get("method") or "cash", i.get("reference"))
+            for i in items
+        ]
+    except (ValueError, ArithmeticError):
+        raise ApiError("res_id must be an integer and amount a number")
+    if any(amount == 0 for _, amount, _, _ in payments):
+        raise ApiError("amount must not be zero")
+
+    def body(totals):
+        missing = sorted({p[0] for p in payments} - set(totals))
+        return {"data": [{"res_id": r, "payment": p} for r, p in totals.items()], "not_found": missing}
+
+    key = _idempotency_key()
+    request_hash = db.request_hash(sorted((r, str(a), m, ref) for r, a, m, ref in payments)) if key else None
+    if key:
+        done = db.get_idempotent_result("payment", key, request_hash)
+        if done is not None:
+            totals = {int(r): Decimal(p) for r, p in done}
+            return _replayed(body(totals), 201 if totals else 404)
+    totals = db.add_payments(
+        payments, emp_id=getattr(current_user, "id", None), idempotency_key=key, request_hash=request_hash
+    )
+    return jsonify(body(totals)), 201 if totals else 404
@@ -1,6 +1,12 @@
 import os
-from datetime import datetime
-from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify
+import threading
+import time
+import uuid
+
+_IMPORT_STARTED = time.perf_counter()
+
+from datetime import datetime, timedelta
+from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify, g
 from flask_login import login_required, logout_user, current_user
 from dotenv import load_dotenv
 from flask_login import login_user
@@ -11,13 +17,90 @@ load_dotenv()
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-key")
 
-from database import db
+from database import IdempotencyKeyReused, db
 from auth import EmployeeUser, login_manager 
 
 login_manager.init_app(app)
 login_manager.login_view = "login"
 login_manager.login_message = "لطفاً برای دسترسی به این صفحه وارد سیستم شوید."
 
+from api import JSONProvider, api as api_v1
+
+app.json = JSONProvider(app)
+app.register_blueprint(api_v1)
+
+import assets
+import profiling
+
+assets.init_app(app)
+profiling.init_app(app, db)
+
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "").lower() in ("1", "true", "yes")
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+@app.before_request
+def _start_scheduler():
+    """
+    SCHEDULER_ENABLED: run the scheduler in each serving process, started by
+    its first request, i.e. after gunicorn (--preload too) forked the worker,
+    so neither the thread nor its connections live in the master.
+    """
+    global _scheduler_pid
+    if not SCHEDULER_ENABLED or _scheduler_pid == os.getpid():
+        return
+    with _scheduler_lock:
+        if _scheduler_pid != os.getpid():
+            from scheduler import Scheduler
+
+            app.extensions["scheduler"] = Scheduler(db)
+            app.extensions["scheduler"].start_in_background()
+            _scheduler_pid = os.getpid()
+
+
+_first_request_seen = False
+
+
+@app.before_request
+def _report_startup_time():
+    """Log once per process how long it took from importing app.py to the first request."""
+    global _first_request_seen
+    if _first_request_seen:
+        return
+    _first_request_seen = True
+    elapsed_ms = (time.perf_counter() - _IMPORT_STARTED) * 1000
+    app.config["STARTUP_MS"] = elapsed_ms
+    print(f"[startup] pid={os.getpid()} import -> first request: {elapsed_ms:.1f} ms (app import {IMPORT_MS:.1f} ms)")
+
+
+# after a write, this user's reads stay on the primary this long (the redirect
+# target and the next few pages), longer than a caught-up replica may lag
+REPLICA_PIN_SECONDS = float(os.environ.get("REPLICA_PIN_SECONDS", os.environ.get("REPLICA_MAX_LAG_SECONDS", "5")))
+
+
+@app.before_request
+def _pin_writes_to_primary():
+    """
+    Form posts write; keep their reads on the primary so they see their own
+    changes, and the GETs that follow (POST -> redirect) for REPLICA_PIN_SECONDS.
+    """
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        if db.replica_urls:
+            session["db_pin_until"] = time.time() + REPLICA_PIN_SECONDS
+    elif session.get("db_pin_until", 0) <= time.time():
+        session.pop("db_pin_until", None)
+        return
+    g.db_pin = db.pinned_to_primary()
+    g.db_pin.__enter__()
+
+
+@app.teardown_request
+def _unpin_primary(exc):
+    pin = g.pop("db_pin", None)
+    if pin is not None:
+        pin.__exit__(None, None, None)
+
 
 @app.context_processor
 def inject_now():
@@ -88,13 +171,45 @@ def api_stats():
         }
     )
 
+@app.route("/api/scheduler")
+@login_required
+def api_scheduler():
+    from scheduler import job_status
+
+    in_process = app.extensions.get("scheduler")
+    return jsonify(
+        {
+            "jobs": [
+                {
+                    "name": r["name"],
+                    "runs": r["runs"],
+                    "last_finished_at": r["last_finished_at"].isoformat() if r["last_finished_at"] else None,
+                    "last_duration_ms": r["last_duration_ms"],
+                    "last_error": r["last_error"],
+                }
+                for r in job_status(db)
+            ],
+            "this_process": in_process.metrics if in_process else None,
+        }
+    )
+
 @app.route("/guests")
 @login_required
 def guests():
-    guests_list = db.get_all_guests()
+    guests_list = db.list_guest_profiles()
     return render_template("guests.html", guests=guests_list)
 
 
+@app.route("/guests/<int:guest_id>")
+@login_required
+def guest_detail(guest_id):
+    profile = db.get_guest_profile(guest_id)
+    if not profile:
+        flash("مهمان یافت نشد.", "danger")
+        return redirect(url_for("guests"))
+    return render_template("guest_detail.html", guest=profile)
+
+
 @app.route("/guests/add", methods=["GET", "POST"])
 @login_required
 def add_guest():
@@ -255,17 +370,18 @@ def delete_room(room_id):
 @app.route("/reservations")
 @login_required
 def reservations():
-   
-    res_list = db.list_active_reservations()
+    res_list = db.list_active_reservations(with_rooms=True)
     return render_template("reservations.html", reservations=res_list)
 
 
+DASHBOARD_FORECAST_DAYS = 90
+
+
 @app.route("/dashboard")
 @login_required
 def dashboard():
     stats = db.get_stats()
 
-    =
     recent_activities = [
         {"title": "رزرو جدید ثبت شد", "time": "چند دقیقه پیش", "description": "رزرو جدید توسط کارمند ثبت شد"},
         {"title": "مهمان جدید اضافه شد", "time": "امروز", "description": "یک مهمان جدید در سیستم ثبت شد"},
@@ -274,11 +390,49 @@ def dashboard():
 
     cleaning_rooms = db.get_cleaning_rooms(limit=200)
 
+    forecast_nights, forecast_months = [], []
+    try:
+        import forecast
+
+        rows = forecast.get_forecast(db, days=DASHBOARD_FORECAST_DAYS)
+        forecast_nights = forecast.by_night(rows)[:14]
+        forecast_months = forecast.by_month(rows)
+    except Exception as e:
+        print(f"forecast error: {e}")
+
     return render_template(
         "dashboard.html",
         stats=stats,
         recent_activities=recent_activities,
         cleaning_rooms=cleaning_rooms,
+        forecast_nights=forecast_nights,
+        forecast_months=forecast_months,
+    )
+
+
+@app.route("/api/forecast")
+@login_required
+def api_forecast():
+    """
+    Occupancy/revenue forecast for ?days= (1-365, default 90) [&type=]:
+    per night and room type, plus hotel-wide "nights" and "months".
+    """
+    import forecast
+
+    days = min(max(request.args.get("days", 90, type=int), 1), forecast.HORIZON_DAYS)
+    rows = forecast.get_forecast(db, days=days, room_type=(request.args.get("type") or "").strip() or None)
+
+    def plain(r):
+        return {k: (v.isoformat() if hasattr(v, "isoformat") else float(v) if k in ("rooms", "revenue") else v) for k, v in r.items()}
+
+    return jsonify(
+        {
+            "days": days,
+            "fitted_at": rows[0]["fitted_at"].isoformat() if rows else None,
+            "rows": [plain(r) for r in rows],
+            "nights": [plain(n) for n in forecast.by_night(rows)],
+            "months": [plain(m) for m in forecast.by_month(rows)],
+        }
     )
 
 @app.route("/reservations/add", methods=["GET", "POST"])
@@ -292,10 +446,34 @@ def add_reservation():
         total_cost = (request.form.get("total_cost") or "0").strip()
         payment = (request.form.get("payment") or "0").strip()
         discount = (request.form.get("discount") or "0").strip()
+        payment_method = (request.form.get("payment_method") or "cash").strip()
+        if payment_method not in ("cash", "card", "transfer", "other"):
+            payment_method = "cash"
         status = (request.form.get("status") or "active").strip()
 
 
         room_ids = request.form.getlist("room_ids")
+        # no rooms ticked: pick `auto_rooms` rooms that leave the fewest unsellable gaps
+        auto_rooms = request.form.get("auto_rooms", 0, type=int)
+        room_type = (request.form.get("room_type") or "").strip() or None
+        room_locked = bool(request.form.get("room_locked"))
+        waitlist_if_full = bool(request.form.get("waitlist_if_full"))
+
+        # the form carries a one-time key: a double submit or a retried POST
+        # gets the first reservation back instead of booking again
+        idempotency_key = (request.form.get("idempotency_key") or "").strip()[:100] or None
+        request_hash = db.request_hash(
+            *sorted((k, tuple(request.form.getlist(k))) for k in request.form if k != "idempotency_key")
+        )
+        if idempotency_key:
+            try:
+                done = db.get_idempotent_result("reservation", idempotency_key, request_hash)
+            except IdempotencyKeyReused:
+                flash("این فرم قبلاً با مقادیر دیگری ارسال شده است؛ دوباره تلاش کنید.", "danger")
+                return redirect(url_for("add_reservation"))
+            if done:
+                flash(f"این رزرو قبلاً ثبت شده است. کد رزرو: {done['res_id']}", "info")
+                return redirect(url_for("reservations"))
 
         try:
             guest_id = int(guest_id)
@@ -323,7 +501,8 @@ def add_reservation():
             flash("مقادیر مالی باید عدد باشند.", "danger")
             return redirect(url_for("add_reservation"))
 
-        if not room_ids:
+        auto = not room_ids and auto_rooms > 0
+        if not room_ids and not auto:
             flash("حداقل یک اتاق انتخاب کنید.", "danger")
             return redirect(url_for("add_reservation"))
 
@@ -333,36 +512,149 @@ def add_reservation():
             flash("شناسه اتاق‌ها باید عدد باشند.", "danger")
             return redirect(url_for("add_reservation"))
 
-        try:
-            emp_id = int(getattr(current_user, "id"))
-            res_id = db.create_reservation(
-                guest_id=guest_id,
-                emp_id=emp_id,
-                check_in=check_in,
-                check_out=check_out,
-                num_people=num_people,
-                status=status,
-                total_cost=total_cost,
-                room_ids=room_ids,
-                payment=payment,
-                discount=discount,
-            )
-            flash(f"رزرو با موفقیت ثبت شد. کد رزرو: {res_id}", "success")
-            return redirect(url_for("reservations"))
-        except Exception as e:
-            flash(f"خطا در ثبت رزرو: {str(e)}", "danger")
+        # an automatic pick can lose a race for a room; pick again once
+        for attempt in range(2 if auto else 1):
+            try:
+                if auto:
+                    room_ids = _suggest_rooms(
+                        check_in, check_out, auto_rooms, room_type, min_capacity=-(-num_people // auto_rooms)
+                    )
+                    if not room_ids:
+                        raise ValueError("اتاق آزاد کافی با این مشخصات پیدا نشد.")
+                emp_id = int(getattr(current_user, "id"))
+                res_id = db.create_reservation(
+                    guest_id=guest_id,
+                    emp_id=emp_id,
+                    check_in=check_in,
+                    check_out=check_out,
+                    num_people=num_people,
+                    status=status,
+                    total_cost=total_cost,
+                    room_ids=room_ids,
+                    payment=payment,
+                    payment_method=payment_method,
+                    discount=discount,
+                    room_locked=room_locked and not auto,
+                    idempotency_key=idempotency_key,
+                    request_hash=request_hash,
+                )
+                rooms_note = f" اتاق‌ها: {', '.join(str(r) for r in room_ids)}" if auto else ""
+                flash(f"رزرو با موفقیت ثبت شد. کد رزرو: {res_id}{rooms_note}", "success")
+                return redirect(url_for("reservations"))
+            except IdempotencyKeyReused as e:
+                flash(f"خطا در ثبت رزرو: {str(e)}", "danger")
+                break
+            except ValueError as e:
+                if auto and attempt == 0:
+                    continue
+                if waitlist_if_full and status == "active":
+                    wait_id, matched = db.add_waitlist_entry(
+                        guest_id,
+                        int(getattr(current_user, "id")),
+                        check_in,
+                        check_out,
+                        num_people,
+                        rooms=auto_rooms if auto else len(room_ids),
+                        room_type=room_type,
+                        like_room_ids=[] if auto else room_ids,
+                    )
+                    if matched:
+                        flash(f"{str(e)} ولی اتاق دیگری پیدا شد؛ درخواست {wait_id} آماده رزرو است.", "success")
+                    else:
+                        flash(f"{str(e)} درخواست {wait_id} در لیست انتظار ثبت شد.", "warning")
+                    return redirect(url_for("waitlist"))
+                flash(f"خطا در ثبت رزرو: {str(e)}", "danger")
+            except Exception as e:
+                flash(f"خطا در ثبت رزرو: {str(e)}", "danger")
+                break
 
 
     guests_list = db.get_all_guests(limit=500)
-    available_rooms = db.get_available_rooms(limit=500)
-    return render_template("add_reservation.html", guests=guests_list, rooms=available_rooms)
+    # ?check_in=&check_out= narrows the list to rooms free for every night of the stay
+    available_rooms = db.get_available_rooms(
+        request.args.get("check_in"), request.args.get("check_out"), limit=500
+    )
+    return render_template(
+        "add_reservation.html", guests=guests_list, rooms=available_rooms, idempotency_key=uuid.uuid4().hex
+    )
+
+
+@app.route("/waitlist")
+@login_required
+def waitlist():
+    return render_template(
+        "waitlist.html",
+        entries=db.list_waitlist(),
+        guests=db.get_all_guests(limit=500),
+        today=datetime.now().date(),
+    )
+
+
+@app.route("/waitlist/add", methods=["POST"])
+@login_required
+def add_waitlist_entry():
+    try:
+        guest_id = int(request.form.get("guest_id") or "")
+        num_people = int(request.form.get("num_people") or "1")
+        rooms = int(request.form.get("rooms") or "1")
+        check_in = datetime.strptime(request.form.get("check_in") or "", "%Y-%m-%d").date()
+        check_out = datetime.strptime(request.form.get("check_out") or "", "%Y-%m-%d").date()
+    except ValueError:
+        flash("مهمان، تاریخ‌ها و تعدادها را درست وارد کنید.", "danger")
+        return redirect(url_for("waitlist"))
+    if check_out <= check_in or num_people <= 0 or rooms <= 0:
+        flash("تاریخ خروج باید بعد از ورود و تعدادها مثبت باشند.", "danger")
+        return redirect(url_for("waitlist"))
+    try:
+        wait_id, matched = db.add_waitlist_entry(
+            guest_id,
+            int(getattr(current_user, "id")),
+            check_in,
+            check_out,
+            num_people,
+            rooms=rooms,
+            room_type=(request.form.get("room_type") or "").strip() or None,
+        )
+        if matched:
+            flash(f"برای درخواست {wait_id} همین حالا اتاق پیدا شد.", "success")
+        else:
+            flash(f"درخواست {wait_id} در لیست انتظار ثبت شد.", "success")
+    except Exception as e:
+        flash(f"خطا در ثبت لیست انتظار: {str(e)}", "danger")
+    return redirect(url_for("waitlist"))
+
+
+@app.route("/waitlist/<int:wait_id>/book", methods=["POST"])
+@login_required
+def book_waitlist_entry(wait_id):
+    try:
+        res_id = db.book_waitlist_entry(wait_id, int(getattr(current_user, "id")))
+        flash(f"درخواست {wait_id} رزرو شد. کد رزرو: {res_id}", "success")
+    except ValueError as e:
+        flash(f"{str(e)} درخواست دوباره در صف قرار گرفت.", "warning")
+    except Exception as e:
+        flash(f"خطا در رزرو: {str(e)}", "danger")
+    return redirect(url_for("waitlist"))
+
+
+@app.route("/waitlist/<int:wait_id>/cancel", methods=["POST"])
+@login_required
+def cancel_waitlist_entry(wait_id):
+    try:
+        if db.cancel_waitlist_entry(wait_id):
+            flash(f"درخواست {wait_id} از لیست انتظار حذف شد.", "success")
+        else:
+            flash(f"درخواست {wait_id} باز نیست.", "warning")
+    except Exception as e:
+        flash(f"خطا در حذف: {str(e)}", "danger")
+    return redirect(url_for("waitlist"))
 
 
 @app.route("/reservations/<int:res_id>/cancel")
 @login_required
 def cancel_reservation(res_id):
     try:
-        db.set_reservation_status(res_id, "canceled")
+        db.cancel_reservation(res_id)
         flash(f"رزرو {res_id} لغو شد.", "success")
     except Exception as e:
         flash(f"خطا در لغو رزرو: {str(e)}", "danger")
@@ -373,12 +665,219 @@ def cancel_reservation(res_id):
 @login_required
 def finish_reservation(res_id):
     try:
-        db.set_reservation_status(res_id, "finished")
+        db.finish_reservation(res_id)
         flash(f"رزرو {res_id} پایان یافت.", "success")
     except Exception as e:
         flash(f"خطا در پایان رزرو: {str(e)}", "danger")
     return redirect(url_for("reservations"))
 
+@app.route("/operations")
+@login_required
+def day_operations():
+    day_str = (request.args.get("day") or "").strip()
+    try:
+        day = datetime.strptime(day_str, "%Y-%m-%d").date() if day_str else datetime.now().date()
+    except ValueError:
+        flash("تاریخ نامعتبر است.", "danger")
+        day = datetime.now().date()
+
+    arrivals = db.get_arrivals(day)
+    departures = db.get_departures(day)
+    return render_template("day_ops.html", day=day, arrivals=arrivals, departures=departures)
+
+
+TIMELINE_MAX_NIGHTS = 90
+
+
+def _timeline_window():
+    """(start, nights) from the query string, clamped to TIMELINE_MAX_NIGHTS."""
+    start_str = (request.args.get("start") or "").strip()
+    try:
+        start = datetime.strptime(start_str, "%Y-%m-%d").date() if start_str else datetime.now().date()
+    except ValueError:
+        start = datetime.now().date()
+    nights = min(max(request.args.get("nights", 30, type=int), 1), TIMELINE_MAX_NIGHTS)
+    return start, nights
+
+
+@app.route("/rooms/timeline")
+@login_required
+def rooms_timeline():
+    start, nights = _timeline_window()
+    return render_template(
+        "timeline.html",
+        start=start,
+        nights=nights,
+        room_type=(request.args.get("type") or "").strip(),
+        floor=request.args.get("floor", type=int),
+    )
+
+
+@app.route("/api/timeline")
+@login_required
+def api_timeline():
+    """
+    Run-length occupancy per room for ?start=&nights=[&type=&floor=]:
+    {"start", "nights", "rooms": [[room_id, type, floor, [[offset, nights, res_id, status, guest], ...]], ...]}
+    """
+    start, nights = _timeline_window()
+    rows = db.get_room_timeline(
+        start,
+        start + timedelta(days=nights),
+        room_type=(request.args.get("type") or "").strip() or None,
+        floor=request.args.get("floor", type=int),
+    )
+    return jsonify(
+        {
+            "start": start.isoformat(),
+            "nights": nights,
+            "rooms": [[r["room_id"], r["type"], r["floor"], r["runs"]] for r in rows or []],
+        }
+    )
+
+
+def _suggest_rooms(check_in, check_out, count, room_type=None, min_capacity=None):
+    from assignment import suggest_rooms
+    from availability import get_index
+
+    return suggest_rooms(get_index(db), check_in, check_out, count, room_type=room_type, min_capacity=min_capacity)
+
+
+@app.route("/api/rooms/suggest")
+@login_required
+def api_suggest_rooms():
+    """Best-fit rooms for ?check_in=&check_out=[&count=&type=&capacity=] (fewest orphan nights left)."""
+    check_in = request.args.get("check_in")
+    check_out = request.args.get("check_out")
+    if not check_in or not check_out:
+        return jsonify({"error": "check_in and check_out are required"}), 400
+    count = min(max(request.args.get("count", 1, type=int), 1), 50)
+    try:
+        rooms = _suggest_rooms(
+            check_in,
+            check_out,
+            count,
+            room_type=(request.args.get("type") or "").strip() or None,
+            min_capacity=request.args.get("capacity", type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"check_in": check_in, "check_out": check_out, "rooms": rooms or []})
+
+
+@app.route("/api/assignment/optimize", methods=["POST"])
+@login_required
+def api_optimize_assignment():
+    """
+    Re-plan flexible future stays for ?days= nights from tomorrow; moves are
+    written only with ?apply=1. Returns the moves and orphan gaps before/after.
+    """
+    from assignment import apply_plan, plan_window
+
+    days = min(max(request.args.get("days", 7, type=int), 1), 60)
+    plan = plan_window(db, days=days)
+    moved = 0
+    if request.args.get("apply") == "1":
+        try:
+            moved = apply_plan(db, plan)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+    return jsonify(
+        {
+            "days": days,
+            "flexible_stays": plan["stays"],
+            "moves": [{"res_id": r, "from": a, "to": b} for r, a, b in plan["moves"]],
+            "orphans_before": plan["orphans_before"],
+            "orphans_after": plan["orphans_after"],
+            "moved": moved,
+        }
+    )
+
+
+CALENDAR_MAX_NIGHTS = 90
+
+
+@app.route("/calendar")
+@login_required
+def calendar():
+    from availability import get_index
+
+    start_str = (request.args.get("start") or "").strip()
+    try:
+        start = datetime.strptime(start_str, "%Y-%m-%d").date() if start_str else datetime.now().date()
+    except ValueError:
+        flash("تاریخ نامعتبر است.", "danger")
+        start = datetime.now().date()
+    nights = min(max(request.args.get("nights", 30, type=int), 1), CALENDAR_MAX_NIGHTS)
+    room_type = (request.args.get("type") or "").strip() or None
+    floor = request.args.get("floor", type=int)
+
+    grid = get_index(db).calendar(start, nights, room_type=room_type, floor=floor)
+    return render_template("calendar.html", start=start, nights=nights, room_type=room_type, floor=floor, grid=grid)
+
+
+@app.route("/api/availability")
+@login_required
+def api_availability():
+    """Free rooms for ?check_in=&check_out=[&type=&capacity=], answered from the in-memory index."""
+    from availability import get_index
+
+    index = get_index(db)
+    check_in = request.args.get("check_in")
+    check_out = request.args.get("check_out")
+    if not check_in or not check_out:
+        return jsonify({"index": index.memory_report()})
+    room_type = (request.args.get("type") or "").strip() or None
+    capacity = request.args.get("capacity", type=int)
+    try:
+        free = index.free_rooms(check_in, check_out, room_type=room_type, min_capacity=capacity)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(
+        {
+            "check_in": check_in,
+            "check_out": check_out,
+            "free_rooms": free,
+            "first_free_room": free[0] if free else None,
+            "version": index.version,
+        }
+    )
+
+
+@app.route("/reservations/<int:res_id>/check-in", methods=["POST"])
+@login_required
+def check_in_reservation(res_id):
+    try:
+        rooms = db.check_in_reservation(res_id)
+        flash(f"پذیرش رزرو {res_id} انجام شد. اتاق‌ها: {', '.join(str(r) for r in rooms)}", "success")
+    except ValueError as e:
+        flash(str(e), "warning")
+    except Exception as e:
+        flash(f"خطا در پذیرش: {str(e)}", "danger")
+    return redirect(request.referrer or url_for("day_operations"))
+
+
+@app.route("/operations/check-out", methods=["POST"])
+@login_required
+def bulk_check_out():
+    try:
+        res_ids = [int(x) for x in request.form.getlist("res_ids")]
+    except ValueError:
+        flash("شناسه رزروها باید عدد باشند.", "danger")
+        return redirect(url_for("day_operations"))
+
+    if not res_ids:
+        flash("هیچ رزروی انتخاب نشده.", "warning")
+        return redirect(url_for("day_operations", day=request.form.get("day")))
+
+    try:
+        done = db.check_out_reservations(res_ids)
+        flash(f"تسویه {len(done)} رزرو انجام شد.", "success")
+    except Exception as e:
+        flash(f"خطا در تسویه: {str(e)}", "danger")
+    return redirect(url_for("day_operations", day=request.form.get("day")))
+
+
 @app.route("/change-password", methods=["GET", "POST"])
 @login_required
 def change_password():
@@ -443,6 +942,9 @@ def page_500():
     return render_template("500.html"), 500
 
 
+IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
 
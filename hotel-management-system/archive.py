@@ -0,0 +1,482 @@
+"""
+Archival and retention for old reservations and guests.
+
+Finished/canceled reservations whose check_out is older than the horizon
+are moved, in small batches, from reservation/reservation_room/payment into
+the yearly partitions of reservation_history/reservation_room_history/
+payment_history. Their totals are added to reservation_rollup in the same
+transaction, so Database.get_stats() reports the same revenue before and after.
+Every payment posting is kept as it was; rehydration puts them back.
+
+A rehydrated reservation gets hold_until = now + REHYDRATE_HOLD_DAYS;
+archival leaves it alone until then, and it is not announced to the bot
+as a new booking.
+
+Guests with no live reservation or waitlist entry, whose last archived stay
+ended before the horizon, are moved to guest_history with their phones,
+addresses and employee links; their finished waitlist entries are dropped.
+get_stats() counts them, and rehydrating one of their reservations (or the
+guest alone) brings the guest back first.
+
+Whole years of history can be exported to gzip-compressed CSV on local
+disk (and the partition detached), and brought back for audits.
+
+Usage:
+    python archive.py                      # archive everything past the horizon
+    python archive.py --rehydrate RES_ID   # move one reservation back to the live tables
+    python archive.py --rehydrate-guest GUEST_ID  # move one archived guest back
+    python archive.py --export YEAR        # write ARCHIVE_DIR/<partition>.csv.gz files
+    python archive.py --restore YEAR       # load those files back into history
+"""
+import gzip
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from psycopg2 import Error
+
+from history import HISTORY_TABLES, create_history_partitions, detach_history_partition, partition_name
+
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("ARCHIVE_HORIZON_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "archive")
+REHYDRATE_HOLD_DAYS = int(os.environ.get("REHYDRATE_HOLD_DAYS", "30"))
+
+_RES_COLUMNS = (
+    "res_id, guest_id, emp_id, check_in, check_out, booking_date, "
+    "num_people, status, total_cost, payment, discount"
+)
+_PAYMENT_COLUMNS = "payment_id, res_id, amount, method, emp_id, reference, posted_at"
+_GUEST_COLUMNS = "guest_id, name, family, national_id, passport, birthdate, email"
+
+# a guest with any of these is still live; booked/canceled/expired waitlist rows go with the guest
+_GUEST_IS_IDLE = """
+    NOT EXISTS (SELECT 1 FROM reservation r WHERE r.guest_id = g.guest_id)
+    AND NOT EXISTS (SELECT 1 FROM waitlist w WHERE w.guest_id = g.guest_id
+                    AND w.status IN ('waiting', 'matched', 'booking'))
+"""
+
+# live reservations keep their paid total in reservation_balance (payment ledger)
+_RES_RETURNING = _RES_COLUMNS.replace(
+    "payment,",
+    "COALESCE((SELECT b.paid FROM reservation_balance b WHERE b.res_id = reservation.res_id), 0) AS payment,",
+)
+
+
+def archive_batch(database, before: date, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move up to batch_size finished/canceled reservations with check_out < before
+    into history. One short transaction; rows locked by others are skipped.
+    Returns the number of reservations moved.
+    """
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = '2s'")
+            cur.execute(
+                """
+                SELECT res_id, check_out
+                FROM reservation
+                WHERE status IN ('finished', 'canceled') AND check_out < %s
+                  AND (hold_until IS NULL OR hold_until < NOW())
+                ORDER BY res_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (before, batch_size),
+            )
+            picked = cur.fetchall()
+            if not picked:
+                conn.rollback()
+                return 0
+
+            res_ids = [r["res_id"] for r in picked]
+            for year in sorted({r["check_out"].year for r in picked}):
+                create_history_partitions(cur, year)
+
+            # reservation_room rows go first: deleting the reservation cascades to them
+            cur.execute(
+                """
+                INSERT INTO reservation_room_history (res_id, room_id, check_out)
+                SELECT rr.res_id, rr.room_id, r.check_out
+                FROM reservation_room rr
+                JOIN reservation r ON r.res_id = rr.res_id
+                WHERE rr.res_id = ANY(%s)
+                """,
+                (res_ids,),
+            )
+            # the ledger refuses deletes (migrations.py, version 16) except for archival;
+            # postings go first: they restrict deleting their reservation
+            cur.execute("SET LOCAL hotel.archiving = 'on'")
+            cur.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM payment p
+                    USING reservation r
+                    WHERE p.res_id = r.res_id AND p.res_id = ANY(%s)
+                    RETURNING {", ".join("p." + c for c in _PAYMENT_COLUMNS.split(", "))}, r.check_out
+                )
+                INSERT INTO payment_history ({_PAYMENT_COLUMNS}, check_out)
+                SELECT {_PAYMENT_COLUMNS}, check_out FROM moved
+                """,
+                (res_ids,),
+            )
+            cur.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM reservation
+                    WHERE res_id = ANY(%s)
+                    RETURNING {_RES_RETURNING}
+                ),
+                kept AS (
+                    INSERT INTO reservation_history ({_RES_COLUMNS})
+                    SELECT {_RES_COLUMNS} FROM moved
+                )
+                INSERT INTO reservation_rollup (month, reservations, total_cost, payment)
+                SELECT date_trunc('month', check_out)::date, COUNT(*), SUM(total_cost), SUM(payment)
+                FROM moved
+                GROUP BY 1
+                ON CONFLICT (month) DO UPDATE SET
+                    reservations = reservation_rollup.reservations + EXCLUDED.reservations,
+                    total_cost = reservation_rollup.total_cost + EXCLUDED.total_cost,
+                    payment = reservation_rollup.payment + EXCLUDED.payment
+                """,
+                (res_ids,),
+            )
+        conn.commit()
+        return len(res_ids)
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        database.put_connection(conn)
+
+
+def archive_guest_batch(database, before: date, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move up to batch_size guests with no live reservation or waitlist entry,
+    whose archived stays all ended before `before`, into guest_history.
+    Guests who never stayed are left alone. Returns the number moved.
+    """
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = '2s'")
+            cur.execute(
+                f"""
+                SELECT g.guest_id
+                FROM guest g
+                WHERE {_GUEST_IS_IDLE}
+                  AND EXISTS (SELECT 1 FROM reservation_history h WHERE h.guest_id = g.guest_id)
+                  AND NOT EXISTS (SELECT 1 FROM reservation_history h
+                                  WHERE h.guest_id = g.guest_id AND h.check_out >= %s)
+                ORDER BY g.guest_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (before, batch_size),
+            )
+            guest_ids = [r["guest_id"] for r in cur.fetchall()]
+            if not guest_ids:
+                conn.rollback()
+                return 0
+
+            # idleness is checked again: a booking may have committed while we waited for the lock.
+            # phones, addresses and employee links cascade away once the guest row is gone.
+            cur.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM guest g
+                    WHERE g.guest_id = ANY(%s) AND {_GUEST_IS_IDLE}
+                    RETURNING {", ".join("g." + c for c in _GUEST_COLUMNS.split(", "))}
+                )
+                INSERT INTO guest_history ({_GUEST_COLUMNS}, phones, addresses, emp_ids)
+                SELECT {", ".join("m." + c for c in _GUEST_COLUMNS.split(", "))},
+                       COALESCE((SELECT jsonb_agg(jsonb_build_object('phone_id', p.phone_id, 'phone', p.phone))
+                                 FROM guest_phone p WHERE p.guest_id = m.guest_id), '[]'),
+                       COALESCE((SELECT jsonb_agg(jsonb_build_object('address_id', a.address_id,
+                                                                     'province', a.province, 'city', a.city,
+                                                                     'street', a.street, 'plaque', a.plaque))
+                                 FROM guest_address a WHERE a.guest_id = m.guest_id), '[]'),
+                       ARRAY(SELECT eg.emp_id FROM employee_guest eg WHERE eg.guest_id = m.guest_id)
+                FROM moved m
+                """,
+                (guest_ids,),
+            )
+            moved = cur.rowcount
+        conn.commit()
+        return moved
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        database.put_connection(conn)
+
+
+def _in_batches(archive, database, before, batch_size, max_batches, pause):
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive(database, before, batch_size)
+        total += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        time.sleep(pause)
+    return total
+
+
+def run_archive(database, horizon_days: int = None, batch_size: int = None, max_batches: int = None, pause: float = 0.05):
+    """
+    Archive everything past the horizon in bounded batches, pausing between
+    batches so live traffic is never stuck behind a long lock. Reservations go
+    first, then the guests they leave with nothing live.
+    Returns {"reservations": n, "guests": n} moved.
+    """
+    horizon_days = ARCHIVE_HORIZON_DAYS if horizon_days is None else horizon_days
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    before = date.today() - timedelta(days=horizon_days)
+
+    return {
+        "reservations": _in_batches(archive_batch, database, before, batch_size, max_batches, pause),
+        "guests": _in_batches(archive_guest_batch, database, before, batch_size, max_batches, pause),
+    }
+
+
+def _restore_guest(cur, guest_id: int) -> bool:
+    """Move one guest (phones, addresses, employee links) from guest_history back to the live tables."""
+    cur.execute(
+        f"""
+        WITH back AS (
+            DELETE FROM guest_history
+            WHERE guest_id = %s
+            RETURNING {_GUEST_COLUMNS}, phones, addresses, emp_ids
+        ),
+        live AS (
+            INSERT INTO guest ({_GUEST_COLUMNS})
+            SELECT {_GUEST_COLUMNS} FROM back
+        ),
+        phones AS (
+            INSERT INTO guest_phone (phone_id, guest_id, phone)
+            SELECT (p->>'phone_id')::int, back.guest_id, p->>'phone'
+            FROM back, jsonb_array_elements(back.phones) p
+        ),
+        addresses AS (
+            INSERT INTO guest_address (address_id, guest_id, province, city, street, plaque)
+            SELECT (a->>'address_id')::int, back.guest_id, a->>'province', a->>'city', a->>'street', a->>'plaque'
+            FROM back, jsonb_array_elements(back.addresses) a
+        ),
+        links AS (
+            INSERT INTO employee_guest (emp_id, guest_id)
+            SELECT e.emp_id, back.guest_id
+            FROM back JOIN employee e ON e.emp_id = ANY(back.emp_ids)
+        )
+        SELECT guest_id FROM back
+        """,
+        (guest_id,),
+    )
+    return cur.fetchone() is not None
+
+
+def rehydrate_guest(database, guest_id: int) -> bool:
+    """
+    Move one archived guest back into the live tables. Archival takes them
+    again on its next run unless they get a reservation or waitlist entry.
+    Returns False if they are not in guest_history.
+    """
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            restored = _restore_guest(cur, guest_id)
+        conn.commit()
+        return restored
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        database.put_connection(conn)
+
+
+def rehydrate_reservation(database, res_id: int, hold_days: int = None) -> bool:
+    """
+    Move one archived reservation (with its rooms and payment postings) back
+    into the live tables for an audit, taking its totals back out of the rollup.
+    It stays live for hold_days (REHYDRATE_HOLD_DAYS) before archival takes it again.
+    An archived guest is brought back with it. Returns False if it is not in history.
+    """
+    hold_days = REHYDRATE_HOLD_DAYS if hold_days is None else hold_days
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT guest_id FROM reservation_history WHERE res_id = %s", (res_id,))
+            archived = cur.fetchone()
+            if archived:
+                _restore_guest(cur, archived["guest_id"])
+            cur.execute(
+                f"""
+                WITH back AS (
+                    DELETE FROM reservation_history
+                    WHERE res_id = %s
+                    RETURNING {_RES_COLUMNS}
+                ),
+                live AS (
+                    INSERT INTO reservation ({_RES_COLUMNS}, hold_until)
+                    SELECT {_RES_COLUMNS.replace("payment,", "0,")}, NOW() + make_interval(days => %s) FROM back
+                )
+                SELECT check_out, total_cost, payment FROM back
+                """,
+                (res_id, hold_days),
+            )
+            restored = cur.fetchone()
+            if not restored:
+                conn.rollback()
+                return False
+
+            cur.execute(
+                f"""
+                WITH back AS (
+                    DELETE FROM payment_history
+                    WHERE res_id = %s
+                    RETURNING {_PAYMENT_COLUMNS}
+                )
+                INSERT INTO payment ({_PAYMENT_COLUMNS})
+                SELECT {_PAYMENT_COLUMNS} FROM back
+                ORDER BY payment_id
+                """,
+                (res_id,),
+            )
+            # archived before payment_history existed (version 16): only the total was kept
+            cur.execute(
+                """
+                INSERT INTO payment (res_id, amount, method, reference)
+                SELECT %(res_id)s, %(paid)s::numeric - COALESCE(SUM(amount), 0), 'other', 'restored from archive'
+                FROM payment
+                WHERE res_id = %(res_id)s
+                HAVING %(paid)s::numeric - COALESCE(SUM(amount), 0) <> 0
+                """,
+                {"res_id": res_id, "paid": restored["payment"]},
+            )
+
+            cur.execute(
+                """
+                UPDATE reservation_rollup
+                SET reservations = reservations - 1,
+                    total_cost = total_cost - %s,
+                    payment = payment - %s
+                WHERE month = date_trunc('month', %s::date)::date
+                """,
+                (restored["total_cost"], restored["payment"], restored["check_out"]),
+            )
+            cur.execute(
+                """
+                WITH back AS (
+                    DELETE FROM reservation_room_history
+                    WHERE res_id = %s
+                    RETURNING res_id, room_id
+                )
+                INSERT INTO reservation_room (res_id, room_id)
+                SELECT res_id, room_id FROM back
+                """,
+                (res_id,),
+            )
+        conn.commit()
+        return True
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        database.put_connection(conn)
+
+
+def export_history_year(database, year: int, directory: str = ARCHIVE_DIR, detach: bool = True):
+    """
+    Dump one year of history to <directory>/<partition>.csv.gz. With detach=True
+    the partitions are then detached from the parents (the data stays in the
+    standalone tables until an operator drops them). Rollup totals are unaffected.
+    Returns the written file paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            for table in HISTORY_TABLES:
+                name = partition_name(table, year)
+                path = os.path.join(directory, f"{name}.csv.gz")
+                with gzip.open(path, "wb") as fh:
+                    cur.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", fh)
+                paths.append(path)
+        conn.rollback()
+    finally:
+        database.put_connection(conn)
+
+    if detach:
+        detach_history_partition(database, year)
+    return paths
+
+
+def restore_history_year(database, year: int, directory: str = ARCHIVE_DIR):
+    """Load exported <partition>.csv.gz files back into (re-created) history partitions."""
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            for table in HISTORY_TABLES:
+                name = partition_name(table, year)
+                cur.execute(
+                    """
+                    SELECT c.oid, i.inhparent
+                    FROM pg_class c
+                    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+                    WHERE c.relname = %s
+                    """,
+                    (name,),
+                )
+                existing = cur.fetchone()
+                if existing and existing["inhparent"] is None:
+                    raise ValueError(f"{name} still exists as a detached table; re-attach or drop it first")
+            create_history_partitions(cur, year)
+            for table in HISTORY_TABLES:
+                name = partition_name(table, year)
+                path = os.path.join(directory, f"{name}.csv.gz")
+                if table == "payment_history" and not os.path.exists(path):
+                    continue  # exported before payment_history existed
+                with gzip.open(path, "rb") as fh:
+                    cur.copy_expert(f"COPY {table} FROM STDIN WITH (FORMAT csv, HEADER true)", fh)
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        database.put_connection(conn)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from database import db
+
+    args = sys.argv[1:]
+    if args[:1] == ["--rehydrate"]:
+        ok = rehydrate_reservation(db, int(args[1]))
+        print(
+            f"Reservation {args[1]} restored for {REHYDRATE_HOLD_DAYS} days."
+            if ok
+            else f"Reservation {args[1]} is not archived."
+        )
+    elif args[:1] == ["--rehydrate-guest"]:
+        ok = rehydrate_guest(db, int(args[1]))
+        print(f"Guest {args[1]} restored." if ok else f"Guest {args[1]} is not archived.")
+    elif args[:1] == ["--export"]:
+        for p in export_history_year(db, int(args[1])):
+            print(f"Wrote {p}")
+    elif args[:1] == ["--restore"]:
+        restore_history_year(db, int(args[1]))
+        print(f"History for {args[1]} restored.")
+    else:
+        moved = run_archive(db)
+        print(
+            f"Archived {moved['reservations']} reservations and {moved['guests']} guests "
+            f"older than {ARCHIVE_HORIZON_DAYS} days."
+        )
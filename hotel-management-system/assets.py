@@ -0,0 +1,238 @@
+"""
+Static asset pipeline: fingerprinted files, precompressed variants and
+WebP/AVIF images.
+
+The build copies every file under static/ to static/dist/ with a content
+hash in its name (css/style.css -> dist/css/style.<hash>.css), writes .gz
+and .br next to text assets, and WebP/AVIF versions of PNG/JPEG images.
+url("/static/...") references in CSS are rewritten to the hashed files, and
+a background image with variants gets a second declaration using
+image-set(), which browsers without image-set() type() support ignore.
+static/dist/manifest.json maps source names to built ones.
+
+At runtime init_app() makes url_for('static', filename=...) return the
+hashed name and serves dist/ files with a one-year immutable Cache-Control,
+picking the .br or .gz variant the browser accepts. Without a manifest
+(development) static files are served as before.
+
+Pillow (images) and brotli (.br) are only needed for the build; without
+them those outputs are skipped.
+
+Usage:
+    python assets.py          # build static/dist and print page weight before/after
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+CACHE_SECONDS = 365 * 24 * 3600
+
+TEXT_SUFFIXES = (".css", ".js", ".svg", ".json", ".txt")
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg")
+# (format, suffix, Pillow save options), best first
+IMAGE_VARIANTS = (
+    ("AVIF", ".avif", {"quality": 60}),
+    ("WEBP", ".webp", {"quality": 80, "method": 6}),
+)
+# Content-Encoding -> file suffix, preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# not in every Python's mimetypes table yet
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("image/webp", ".webp")
+
+_URL_RE = re.compile(r"""url\(\s*(["']?)/static/([^"')\s]+)\1\s*\)""")
+_DECLARATION_RE = re.compile(r"([^{};]*url\([^{};]*);")
+
+
+def _hashed_name(path: str, data: bytes) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def _write(dist_dir: str, name: str, data: bytes):
+    path = os.path.join(dist_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(data)
+
+
+def _compress(data: bytes):
+    """{encoding: bytes} for the precompressed variants that come out smaller."""
+    out = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        out["br"] = brotli.compress(data, quality=11)
+    return {enc: body for enc, body in out.items() if len(body) < len(data)}
+
+
+def _image_variants(source_path: str):
+    """{suffix: bytes} of the IMAGE_VARIANTS Pillow can write here."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return {}
+    from io import BytesIO
+
+    variants = {}
+    with Image.open(source_path) as im:
+        im.load()
+        for fmt, suffix, options in IMAGE_VARIANTS:
+            buf = BytesIO()
+            try:
+                im.save(buf, fmt, **options)
+            except (KeyError, OSError, ValueError):
+                continue
+            variants[suffix] = buf.getvalue()
+    return variants
+
+
+def _rewrite_css(text: str, files: dict, images: dict) -> str:
+    """Point url("/static/...") at hashed files; add an image-set() copy of declarations with variants."""
+
+    def hashed(m):
+        return f'url("/static/{files.get(m.group(2), m.group(2))}")'
+
+    def image_set(m):
+        path = m.group(2)
+        if path not in images:
+            return hashed(m)
+        options = [f'url("/static/{name}") type("{mimetypes.guess_type(name)[0]}")' for name in images[path]]
+        options.append(f'{hashed(m)} type("{mimetypes.guess_type(path)[0]}")')
+        return f"image-set({', '.join(options)})"
+
+    def declaration(m):
+        text = m.group(1)
+        out = _URL_RE.sub(hashed, text) + ";"
+        if any(u.group(2) in images for u in _URL_RE.finditer(text)):
+            out += _URL_RE.sub(image_set, text) + ";"
+        return out
+
+    return _DECLARATION_RE.sub(declaration, text)
+
+
+def build_assets(static_dir: str):
+    """
+    Rebuild static_dir/dist and its manifest. Returns the manifest:
+    {"files": {source: built}, "images": {source: [variants, best first]},
+     "encodings": {built: [content-encodings]}} with names relative to static_dir.
+    """
+    dist_dir = os.path.join(static_dir, DIST)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+
+    sources = []
+    for root, dirs, names in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist_dir)
+        sources.extend(os.path.relpath(os.path.join(root, n), static_dir).replace(os.sep, "/") for n in sorted(names))
+    # CSS last: its hash covers the rewritten image URLs
+    sources.sort(key=lambda p: p.endswith(".css"))
+
+    files, images, encodings = {}, {}, {}
+    for path in sources:
+        source_path = os.path.join(static_dir, path)
+        with open(source_path, "rb") as fh:
+            data = fh.read()
+        if path.endswith(".css"):
+            data = _rewrite_css(data.decode("utf-8"), files, images).encode("utf-8")
+        name = _hashed_name(path, data)
+        _write(dist_dir, name, data)
+        files[path] = f"{DIST}/{name}"
+
+        if path.lower().endswith(IMAGE_SUFFIXES):
+            built = []
+            for suffix, body in _image_variants(source_path).items():
+                variant = _hashed_name(os.path.splitext(path)[0] + suffix, body)
+                _write(dist_dir, variant, body)
+                built.append(f"{DIST}/{variant}")
+            if built:
+                images[path] = built
+        if path.endswith(TEXT_SUFFIXES):
+            compressed = _compress(data)
+            for encoding, suffix in ENCODINGS:
+                if encoding in compressed:
+                    _write(dist_dir, name + suffix, compressed[encoding])
+            if compressed:
+                encodings[files[path]] = [e for e, _ in ENCODINGS if e in compressed]
+
+    manifest = {"files": files, "images": images, "encodings": encodings}
+    with open(os.path.join(dist_dir, MANIFEST), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+def page_weight(static_dir: str, manifest: dict):
+    """[(source, bytes before, bytes served after)], best encoding / image variant."""
+    rows = []
+    for path, built in sorted(manifest["files"].items()):
+        before = os.path.getsize(os.path.join(static_dir, path))
+        candidates = [built] + manifest["images"].get(path, [])
+        suffixes = dict(ENCODINGS)
+        candidates += [built + suffixes[e] for e in manifest["encodings"].get(built, [])]
+        after = min(os.path.getsize(os.path.join(static_dir, c)) for c in candidates)
+        rows.append((path, before, after))
+    return rows
+
+
+def load_manifest(static_dir: str):
+    try:
+        with open(os.path.join(static_dir, DIST, MANIFEST), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def init_app(app):
+    """Serve the built assets of app.static_folder, if there is a manifest."""
+    from flask import request, send_from_directory
+
+    manifest = load_manifest(app.static_folder)
+    if not manifest:
+        return
+    files = manifest["files"]
+    encodings = manifest["encodings"]
+    app.extensions["assets"] = manifest
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == "static" and values.get("filename") in files:
+            values["filename"] = files[values["filename"]]
+
+    def static(filename):
+        if not filename.startswith(DIST + "/"):
+            return app.send_static_file(filename)
+        served, content_encoding = filename, None
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings.get(filename, ()) and request.accept_encodings[encoding]:
+                served, content_encoding = filename + suffix, encoding
+                break
+        response = send_from_directory(
+            app.static_folder, served, mimetype=mimetypes.guess_type(filename)[0], max_age=CACHE_SECONDS
+        )
+        response.cache_control.immutable = True
+        if filename in encodings:
+            response.vary.add("Accept-Encoding")
+        if content_encoding:
+            response.headers["Content-Encoding"] = content_encoding
+        return response
+
+    app.view_functions["static"] = static
+
+
+if __name__ == "__main__":
+    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    built = build_assets(static_dir)
+    print(f"Wrote {len(built['files'])} assets to {os.path.join(static_dir, DIST)}")
+    rows = page_weight(static_dir, built)
+    for path, before, after in rows:
+        print(f"{path:<24s} {before:>12,d} B -> {after:>10,d} B")
+    before, after = sum(r[1] for r in rows), sum(r[2] for r in rows)
+    print(f"{'page weight':<24s} {before:>12,d} B -> {after:>10,d} B ({after / before:.1%})")
@@ -0,0 +1,267 @@
+"""
+Room assignment that avoids unsellable gaps.
+
+A gap of ORPHAN_GAP_NIGHTS nights or fewer between two stays in the same
+room can hardly be sold, so rooms are chosen by best fit: a stay prefers
+the room where it ends exactly when the next booking starts and starts
+exactly when the previous one ends, and avoids rooms where it would leave
+a one-night hole.
+
+  incremental  suggest_rooms(): rooms for one new booking, from the
+               in-memory availability index (availability.py)
+  batch        plan_window() / apply_plan(): re-assign every flexible
+               future stay in a window (interval partitioning in check-in
+               order, best-fit per stay, a cost per room move)
+
+A stay is flexible when its reservation is active, has not started yet and
+is not room_locked; it may only move to a room of the same type, bed type
+and smoking flag with at least the same capacity.
+
+    python assignment.py                 # plan the next 7 nights, print the moves
+    python assignment.py --days 14 --apply
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+ORPHAN_GAP_NIGHTS = int(os.environ.get("ASSIGN_ORPHAN_GAP_NIGHTS", "1"))
+
+ORPHAN_COST = 100.0  # leaving a gap nobody can book
+OPEN_COST = 1.0  # nothing booked on that side within the window
+MOVE_COST = 5.0  # moving an existing stay to another room (batch only)
+GAP_COST_PER_NIGHT = 0.1
+
+
+def _gap_cost(gaps):
+    """Cost of leaving `gaps` free nights on one side of a stay (-1 = open)."""
+    return np.select(
+        [gaps == 0, (gaps > 0) & (gaps <= ORPHAN_GAP_NIGHTS), gaps < 0],
+        [0.0, ORPHAN_COST, OPEN_COST],
+        np.minimum(gaps * GAP_COST_PER_NIGHT, OPEN_COST),
+    )
+
+
+def _side_gaps(taken, a, b):
+    """Free nights between [a, b) and the nearest taken night on each side, per row (-1 = none)."""
+    n, width = taken.shape
+    if a > 0:
+        before = taken[:, :a]
+        last = a - 1 - np.argmax(before[:, ::-1], axis=1)
+        gap_before = np.where(before.any(axis=1), a - 1 - last, -1)
+    else:
+        gap_before = np.full(n, -1)
+    if b < width:
+        after = taken[:, b:]
+        gap_after = np.where(after.any(axis=1), np.argmax(after, axis=1), -1)
+    else:
+        gap_after = np.full(n, -1)
+    return gap_before, gap_after
+
+
+def best_row(taken, candidates, a, b, current=None):
+    """
+    Index into `candidates` (row numbers of `taken`) of the cheapest room
+    free for nights [a, b), or None when none is free. Ties go to the
+    first candidate, i.e. the lowest room_id.
+    """
+    if len(candidates) == 0:
+        return None
+    rows = taken[candidates]
+    free = ~rows[:, a:b].any(axis=1)
+    if not free.any():
+        return None
+    gap_before, gap_after = _side_gaps(rows, a, b)
+    cost = _gap_cost(gap_before) + _gap_cost(gap_after)
+    if current is not None:
+        cost = cost + np.where(candidates == current, 0.0, MOVE_COST)
+    cost[~free] = np.inf
+    return int(np.argmin(cost))
+
+
+def orphan_gaps(taken):
+    """Number of free runs of at most ORPHAN_GAP_NIGHTS nights with a taken night on both sides."""
+    width = taken.shape[1]
+    count = 0
+    for g in range(1, ORPHAN_GAP_NIGHTS + 1):
+        n = width - g - 1  # columns where a run of g free nights can start after a taken one
+        if n <= 0:
+            break
+        hit = taken[:, :n] & taken[:, g + 1:]
+        for j in range(1, g + 1):
+            hit &= ~taken[:, j:j + n]
+        count += int(hit.sum())
+    return count
+
+
+class Hotel:
+    """Rooms as parallel arrays plus their 'kind' (type, bed_type, smoking) groups."""
+
+    def __init__(self, rooms):
+        self.rooms = list(rooms)
+        self.room_ids = np.array([r["room_id"] for r in self.rooms], dtype=np.int32)
+        self.capacity = np.array([r["capacity"] or 0 for r in self.rooms], dtype=np.int16)
+        self.row_of = {int(rid): i for i, rid in enumerate(self.room_ids)}
+        self.kind = [(r["type"], r["bed_type"], bool(r["smoking"])) for r in self.rooms]
+        self._type = np.array([k[0] for k in self.kind], dtype=object)
+        self._bed = np.array([k[1] for k in self.kind], dtype=object)
+        self._smoking = np.array([k[2] for k in self.kind], dtype=bool)
+        self._by_kind = {}
+        for i, k in enumerate(self.kind):
+            self._by_kind.setdefault(k, []).append(i)
+        self._by_kind = {k: np.array(v, dtype=np.int64) for k, v in self._by_kind.items()}
+
+    def candidates(self, room_type=None, min_capacity=None, smoking=None, bed_type=None, like_row=None):
+        """Row numbers of rooms matching the filters (or interchangeable with row `like_row`)."""
+        if like_row is not None:
+            rows = self._by_kind[self.kind[like_row]]
+            return rows[self.capacity[rows] >= self.capacity[like_row]]
+        mask = np.ones(len(self.rooms), dtype=bool)
+        if room_type:
+            mask &= self._type == room_type
+        if bed_type:
+            mask &= self._bed == bed_type
+        if smoking is not None:
+            mask &= self._smoking == bool(smoking)
+        if min_capacity:
+            mask &= self.capacity >= int(min_capacity)
+        return np.flatnonzero(mask)
+
+
+def assign(hotel, taken, a, b, count=1, **filters):
+    """
+    Pick `count` rooms for nights [a, b) on `taken` (marking them taken).
+    Returns room ids, or None if there are not enough free rooms.
+    """
+    candidates = hotel.candidates(**filters)
+    chosen = []
+    for _ in range(count):
+        i = best_row(taken, candidates, a, b)
+        if i is None:
+            for room_id in chosen:
+                taken[hotel.row_of[room_id], a:b] = False
+            return None
+        row = candidates[i]
+        taken[row, a:b] = True
+        chosen.append(int(hotel.room_ids[row]))
+        candidates = np.delete(candidates, i)
+    return chosen
+
+
+def suggest_rooms(index, check_in, check_out, count=1, room_type=None, min_capacity=None, smoking=None, bed_type=None):
+    """Incremental mode: best-fit rooms for one new booking, from the availability index."""
+    start, rooms, taken = index.snapshot()
+    a = (date.fromisoformat(str(check_in)) - start).days
+    b = (date.fromisoformat(str(check_out)) - start).days
+    if a < 0 or b > taken.shape[1] or b <= a:
+        raise ValueError(f"range {check_in}..{check_out} is outside the availability horizon")
+    return assign(
+        Hotel(rooms), taken, a, b, count,
+        room_type=room_type, min_capacity=min_capacity, smoking=smoking, bed_type=bed_type,
+    )
+
+
+def optimize(hotel, fixed, stays):
+    """
+    Batch mode. `fixed` is the rooms x nights matrix of stays that must not
+    move; `stays` are (key, current_row, a, b) flexible stays. Returns
+    ({key: new_row}, taken) or (None, None) if the greedy pass cannot place
+    every stay (the current assignment is then kept).
+    """
+    taken = fixed.copy()
+    placed = {}
+    # interval partitioning: earliest check-in first, longer stays first on ties
+    for key, current, a, b in sorted(stays, key=lambda s: (s[2], s[2] - s[3])):
+        candidates = hotel.candidates(like_row=current)
+        i = best_row(taken, candidates, a, b, current=current)
+        if i is None:
+            return None, None
+        row = int(candidates[i])
+        taken[row, a:b] = True
+        placed[key] = row
+    return placed, taken
+
+
+def plan_window(database, start=None, days=7):
+    """
+    Load [start, start + days) plus a margin, re-optimize its flexible stays
+    and return {"moves": [(res_id, old_room, new_room)], "orphans_before", "orphans_after"}.
+    """
+    start = start or date.today() + timedelta(days=1)
+    margin = 14  # see neighbouring stays so the gaps at the window edges count
+    lo = start - timedelta(days=margin)
+    hi = start + timedelta(days=days + margin)
+    width = (hi - lo).days
+
+    rooms = database.execute(
+        "SELECT room_id, type, capacity, bed_type, smoking FROM room ORDER BY room_id",
+        fetch=True,
+        readonly=True,
+    )
+    nights = database.execute(
+        """
+        SELECT n.room_id, n.res_id, MIN(n.night) AS first, MAX(n.night) AS last,
+               r.status = 'active' AND r.check_in > CURRENT_DATE AND NOT r.room_locked
+                   AND r.check_in >= %(start)s AND r.check_out <= %(end)s AS flexible
+        FROM room_night n
+        JOIN reservation r ON r.res_id = n.res_id
+        WHERE n.night >= %(lo)s AND n.night < %(hi)s
+        GROUP BY n.room_id, n.res_id, r.status, r.check_in, r.check_out, r.room_locked
+        """,
+        {"start": start, "end": start + timedelta(days=days), "lo": lo, "hi": hi},
+        fetch=True,
+    )
+    hotel = Hotel(rooms)
+    fixed = np.zeros((len(hotel.rooms), width), dtype=bool)
+    current = fixed.copy()
+    stays = []
+    for n in nights:
+        row = hotel.row_of[n["room_id"]]
+        a = (n["first"] - lo).days
+        b = (n["last"] - lo).days + 1
+        current[row, a:b] = True
+        if n["flexible"]:
+            stays.append(((n["res_id"], n["room_id"]), row, a, b))
+        else:
+            fixed[row, a:b] = True
+
+    placed, taken = optimize(hotel, fixed, stays)
+    before = orphan_gaps(current)
+    if placed is None:
+        return {"moves": [], "orphans_before": before, "orphans_after": before, "stays": len(stays)}
+    moves = [
+        (res_id, room_id, int(hotel.room_ids[row]))
+        for (res_id, room_id), row in placed.items()
+        if int(hotel.room_ids[row]) != room_id
+    ]
+    after = orphan_gaps(taken)
+    if after > before:
+        # greedy made it worse (possible with many fixed stays): keep what we have
+        return {"moves": [], "orphans_before": before, "orphans_after": before, "stays": len(stays)}
+    return {"moves": moves, "orphans_before": before, "orphans_after": after, "stays": len(stays)}
+
+
+def apply_plan(database, plan):
+    """Write a plan's moves in one transaction. Returns how many stays moved."""
+    if not plan["moves"]:
+        return 0
+    return database.reassign_rooms(plan["moves"])
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from database import db
+
+    days = int(sys.argv[sys.argv.index("--days") + 1]) if "--days" in sys.argv else 7
+    plan = plan_window(db, days=days)
+    for res_id, old, new in plan["moves"]:
+        print(f"reservation {res_id}: room {old} -> {new}")
+    print(
+        f"{plan['stays']} flexible stays, {len(plan['moves'])} moves, "
+        f"orphan gaps {plan['orphans_before']} -> {plan['orphans_after']}"
+    )
+    if "--apply" in sys.argv:
+        print(f"moved {apply_plan(db, plan)} stays")
@@ -0,0 +1,249 @@
+"""
+In-process availability index: a NumPy matrix of rooms x nights
+(True = night taken) for the next AVAILABILITY_HORIZON_DAYS nights,
+built from room_night.
+
+Range checks, "first free room of type X" and the calendar grid are
+answered from memory. The index follows this process's own bookings,
+cancellations and check-outs incrementally (Database inventory listeners);
+anything else - other workers, archive, SQL by hand - bumps
+inventory_version, which is compared at most every
+AVAILABILITY_CHECK_SECONDS and triggers a rebuild.
+
+It is a read model for display and search only: double bookings are still
+prevented by room_night's primary key when a reservation is written.
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import psycopg2.extensions
+
+HORIZON_DAYS = int(os.environ.get("AVAILABILITY_HORIZON_DAYS", "365"))
+CHECK_SECONDS = float(os.environ.get("AVAILABILITY_CHECK_SECONDS", "2"))
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+class AvailabilityIndex:
+    def __init__(self, database, horizon_days=HORIZON_DAYS, check_seconds=CHECK_SECONDS):
+        self.database = database
+        self.horizon_days = horizon_days
+        self.check_seconds = check_seconds
+        self._lock = threading.RLock()
+        self.version = None
+        self.start = None
+        self._built_on = None
+        self.built_ms = None
+        self.taken = np.zeros((0, horizon_days), dtype=bool)
+        self.room_ids = np.zeros(0, dtype=np.int32)
+        self.rooms = []
+        self._row_of = {}
+        self._checked_at = 0.0
+        self._stale = True
+        self.metrics = {"rebuilds": 0, "incremental": 0, "mismatches": 0}
+        database.add_inventory_listener(self.on_inventory_change)
+
+    def rebuild(self):
+        """Reload rooms and booked nights in one consistent snapshot."""
+        started = time.perf_counter()
+        conn = self.database.get_connection()
+        try:
+            # tuples instead of dicts: this reads one row per booked room-night
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute("SELECT version, CURRENT_DATE FROM inventory_version WHERE id = 1")
+                version, start = cur.fetchone()
+                cur.execute(
+                    """
+                    SELECT room_id, type, capacity, floor, bed_type, smoking, price
+                    FROM room
+                    ORDER BY room_id
+                    """
+                )
+                rooms = cur.fetchall()
+                cur.execute(
+                    """
+                    SELECT room_id, night - CURRENT_DATE
+                    FROM room_night
+                    WHERE night >= CURRENT_DATE AND night < CURRENT_DATE + %s
+                    """,
+                    (self.horizon_days,),
+                )
+                nights = cur.fetchall()
+            conn.commit()
+        finally:
+            self.database.put_connection(conn)
+
+        room_ids = np.array([r[0] for r in rooms], dtype=np.int32)
+        row_of = {int(rid): i for i, rid in enumerate(room_ids)}
+        taken = np.zeros((len(rooms), self.horizon_days), dtype=bool)
+        if nights:
+            pairs = np.array(nights, dtype=np.int64)
+            rows = np.searchsorted(room_ids, pairs[:, 0])
+            taken[rows, pairs[:, 1]] = True
+
+        with self._lock:
+            self.version = version
+            self.start = start
+            self._built_on = date.today()
+            self.room_ids = room_ids
+            self._row_of = row_of
+            self.rooms = [
+                {"room_id": r[0], "type": r[1], "capacity": r[2], "floor": r[3], "bed_type": r[4], "smoking": r[5], "price": r[6]}
+                for r in rooms
+            ]
+            self._types = np.array([r[1] for r in rooms], dtype=object)
+            self._capacity = np.array([r[2] for r in rooms], dtype=np.int16)
+            self._floor = np.array([r[3] for r in rooms], dtype=np.int16)
+            self.taken = taken
+            self._stale = False
+            self._checked_at = time.monotonic()
+            self.built_ms = (time.perf_counter() - started) * 1000
+            self.metrics["rebuilds"] += 1
+
+    def on_inventory_change(self, change):
+        """Inventory listener: apply our own committed change, or mark the index stale."""
+        with self._lock:
+            if self._stale or change["before"] is None or change["before"] != self.version:
+                self._stale = True
+                self.metrics["mismatches"] += 1
+                return
+            for pairs, value in ((change["claimed"], True), (change["released"], False)):
+                for room_id, night in pairs:
+                    row = self._row_of.get(room_id)
+                    col = (_as_date(night) - self.start).days
+                    if row is not None and 0 <= col < self.horizon_days:
+                        self.taken[row, col] = value
+            self.version = change["after"]
+            self.metrics["incremental"] += 1
+
+    def _fresh(self):
+        with self._lock:
+            now = time.monotonic()
+            # new day: the window starts at the database's CURRENT_DATE again
+            stale = self._stale or self._built_on != date.today()
+            if not stale and now - self._checked_at >= self.check_seconds:
+                self._checked_at = now
+                stale = self.database.get_inventory_version() != self.version
+            if stale:
+                self.rebuild()
+
+    def _cols(self, check_in, check_out):
+        a = (_as_date(check_in) - self.start).days
+        b = (_as_date(check_out) - self.start).days
+        if a < 0 or b > self.horizon_days or b <= a:
+            raise ValueError(f"range {check_in}..{check_out} is outside the availability horizon")
+        return a, b
+
+    def refresh(self):
+        """Rebuild now if stale, so the next read does not pay for it (scheduler warm-up)."""
+        self._fresh()
+        return self.version
+
+    def covers(self, check_in, check_out):
+        self._fresh()
+        try:
+            self._cols(check_in, check_out)
+            return True
+        except ValueError:
+            return False
+
+    def _room_mask(self, room_type=None, min_capacity=None, floor=None):
+        mask = np.ones(len(self.room_ids), dtype=bool)
+        if room_type:
+            mask &= self._types == room_type
+        if min_capacity:
+            mask &= self._capacity >= int(min_capacity)
+        if floor is not None:
+            mask &= self._floor == int(floor)
+        return mask
+
+    def is_free(self, room_id: int, check_in, check_out):
+        self._fresh()
+        with self._lock:
+            a, b = self._cols(check_in, check_out)
+            row = self._row_of.get(room_id)
+            return row is not None and not self.taken[row, a:b].any()
+
+    def free_rooms(self, check_in, check_out, room_type=None, min_capacity=None):
+        """room_ids free for every night in [check_in, check_out), in room_id order."""
+        self._fresh()
+        with self._lock:
+            a, b = self._cols(check_in, check_out)
+            mask = self._room_mask(room_type, min_capacity) & ~self.taken[:, a:b].any(axis=1)
+            return self.room_ids[mask].tolist()
+
+    def first_free_room(self, room_type, check_in, check_out, min_capacity=None):
+        self._fresh()
+        with self._lock:
+            a, b = self._cols(check_in, check_out)
+            mask = self._room_mask(room_type, min_capacity) & ~self.taken[:, a:b].any(axis=1)
+            i = int(np.argmax(mask))
+            return int(self.room_ids[i]) if mask.size and mask[i] else None
+
+    def free_count_by_night(self, start, end, room_type=None):
+        """[(night, free rooms)] for [start, end)."""
+        self._fresh()
+        with self._lock:
+            a, b = self._cols(start, end)
+            counts = (~self.taken[self._room_mask(room_type), a:b]).sum(axis=0)
+            return [(self.start + timedelta(days=a + i), int(c)) for i, c in enumerate(counts)]
+
+    def calendar(self, start, nights, room_type=None, floor=None):
+        """
+        Grid for the front-desk calendar: {"nights": [date], "rooms": [room
+        dict + "taken": [bool per night]]}. The window is clamped to the horizon.
+        """
+        self._fresh()
+        with self._lock:
+            a = max(0, (_as_date(start) - self.start).days)
+            b = min(self.horizon_days, a + max(1, int(nights)))
+            rows = np.flatnonzero(self._room_mask(room_type, floor=floor))
+            grid = self.taken[rows, a:b]
+            return {
+                "nights": [self.start + timedelta(days=d) for d in range(a, b)],
+                "rooms": [dict(self.rooms[r], taken=grid[i].tolist()) for i, r in enumerate(rows)],
+            }
+
+    def snapshot(self):
+        """(first night, room dicts, copy of the taken matrix) for callers that plan on it."""
+        self._fresh()
+        with self._lock:
+            return self.start, list(self.rooms), self.taken.copy()
+
+    def memory_report(self):
+        with self._lock:
+            rooms, nights = self.taken.shape
+            packed = np.packbits(self.taken, axis=1).nbytes
+            scale = (1000 / rooms) * (365 / nights) if rooms else 0
+            return {
+                "rooms": rooms,
+                "nights": nights,
+                "bool_bytes": int(self.taken.nbytes),
+                "packed_bytes": int(packed),
+                "bool_bytes_per_1k_rooms_year": int(self.taken.nbytes * scale),
+                "packed_bytes_per_1k_rooms_year": int(packed * scale),
+                "version": self.version,
+                "built_ms": self.built_ms,
+                **self.metrics,
+            }
+
+
+_index = None
+_index_pid = None
+_index_lock = threading.Lock()
+
+
+def get_index(database):
+    """This process's AvailabilityIndex (built on first use, rebuilt after fork)."""
+    global _index, _index_pid
+    with _index_lock:
+        if _index is None or _index_pid != os.getpid():
+            _index = AvailabilityIndex(database)
+            _index_pid = os.getpid()
+        return _index
@@ -0,0 +1,116 @@
+"""
+Shared helpers for the write-heavy benchmarks.
+
+These scripts TRUNCATE and bulk-insert data, so they only run against the
+database named by BENCH_DATABASE_URL (never DATABASE_URL):
+
+    BENCH_DATABASE_URL=postgresql://localhost/hotel_bench python benchmarks/<script>.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def bench_db():
+    """Point database.db at BENCH_DATABASE_URL, ensure the schema and return it."""
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        raise SystemExit("BENCH_DATABASE_URL is not set (benchmarks truncate tables; use a scratch DB)")
+    os.environ["DATABASE_URL"] = url
+
+    from database import db
+
+    db.init_db()
+    return db
+
+
+def reset(cur):
+    cur.execute(
+        """
+        TRUNCATE reservation_room, reservation, guest_phone, guest_address,
+                 employee_guest, guest, room RESTART IDENTITY CASCADE
+        """
+    )
+
+
+def seed_base(cur, rooms=500, guests=1000):
+    """Rooms 1..rooms on 10-per-floor, `guests` guests and one bench employee. Returns emp_id."""
+    cur.execute(
+        """
+        INSERT INTO room (room_id, type, capacity, price, features, floor, bed_type, smoking, status)
+        SELECT g,
+               (ARRAY['single','double','suite'])[1 + g % 3],
+               1 + g % 3,
+               100 + (g % 3) * 50,
+               NULL,
+               1 + g / 10,
+               (ARRAY['single','double','king'])[1 + g % 3],
+               g % 7 = 0,
+               'available'
+        FROM generate_series(1, %s) g
+        ON CONFLICT (room_id) DO NOTHING
+        """,
+        (rooms,),
+    )
+    cur.execute(
+        """
+        INSERT INTO guest (name, family, national_id, passport, birthdate, email)
+        SELECT 'Guest' || g, 'Bench' || (g % 97), 'N' || g, NULL, DATE '1980-01-01' + g % 9000,
+               'bench' || g || '@example.com'
+        FROM generate_series(1, %s) g
+        ON CONFLICT (email) DO NOTHING
+        """,
+        (guests,),
+    )
+    cur.execute(
+        """
+        INSERT INTO employee (name, family, national_id, birthdate, position, username, password, access_level)
+        VALUES ('Bench','Runner','EMPBENCH0001','1990-01-01','Bench','bench','x',1)
+        ON CONFLICT (username) DO UPDATE SET username = EXCLUDED.username
+        RETURNING emp_id
+        """
+    )
+    return cur.fetchone()["emp_id"]
+
+
+def seed_reservations(cur, emp_id, n, status="active", start_offset=-3, spread_days=30, rooms_per_res=1):
+    """
+    Insert n reservations (2-night stays, check_in spread over `spread_days`
+    days from CURRENT_DATE + start_offset) and link rooms round-robin.
+    Returns the number of rows inserted.
+    """
+    cur.execute(
+        """
+        WITH g AS (SELECT ARRAY(SELECT guest_id FROM guest ORDER BY guest_id) AS ids),
+             rm AS (SELECT ARRAY(SELECT room_id FROM room ORDER BY room_id) AS ids),
+             ins AS (
+                 INSERT INTO reservation (guest_id, emp_id, check_in, check_out, num_people,
+                                          status, total_cost, payment, discount)
+                 SELECT g.ids[1 + s % cardinality(g.ids)], %s,
+                        CURRENT_DATE + %s + s % %s, CURRENT_DATE + %s + s % %s + 2,
+                        1, %s, 200, 100, 0
+                 FROM generate_series(1, %s) s, g
+                 RETURNING res_id
+             )
+        INSERT INTO reservation_room (res_id, room_id)
+        SELECT ins.res_id, rm.ids[1 + (ins.res_id * %s + k) % cardinality(rm.ids)]
+        FROM ins, rm, generate_series(0, %s - 1) k
+        ON CONFLICT DO NOTHING
+        """,
+        (emp_id, start_offset, spread_days, start_offset, spread_days, status, n, rooms_per_res, rooms_per_res),
+    )
+    return n
+
+
+def timed(fn, repeat=20):
+    """Median wall time of fn() in milliseconds."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
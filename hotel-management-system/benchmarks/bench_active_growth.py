@@ -0,0 +1,60 @@
+"""
+Active-path latency as finished/canceled history grows 1x -> 100x.
+
+Keeps 1,000 active reservations fixed and grows the finished/canceled rows
+in the live reservation table, timing the reads that filter
+status = 'active'. With the partial indexes from migration 2 the active
+timings should stay flat.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_active_growth.py
+"""
+from _seed import bench_db, reset, seed_base, seed_reservations, timed
+
+ACTIVE = 1_000
+HISTORY_STEPS = (1_000, 10_000, 100_000)
+
+
+def main():
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur)
+            seed_reservations(cur, emp_id, ACTIVE, status="active")
+        conn.commit()
+
+        print(f"{'history rows':>12s} {'list_active ms':>15s} {'count_active ms':>16s} {'occupied ms':>12s}")
+        loaded = 0
+        for target in HISTORY_STEPS:
+            with conn.cursor() as cur:
+                seed_reservations(cur, emp_id, (target - loaded) // 2, status="finished", start_offset=-1500, spread_days=1400)
+                seed_reservations(cur, emp_id, (target - loaded) // 2, status="canceled", start_offset=-1500, spread_days=1400)
+                cur.execute("ANALYZE reservation")
+                cur.execute("ANALYZE reservation_room")
+            conn.commit()
+            loaded = target
+
+            list_ms = timed(lambda: db.list_active_reservations(limit=200))
+
+            def count_active():
+                db.execute("SELECT COUNT(*) AS c FROM reservation WHERE status = 'active'", fetchone=True)
+
+            def occupied():
+                db.execute(
+                    """
+                    SELECT COUNT(DISTINCT rr.room_id) AS c
+                    FROM reservation_room rr
+                    JOIN reservation r ON r.res_id = rr.res_id
+                    WHERE r.status = 'active'
+                    """,
+                    fetchone=True,
+                )
+
+            print(f"{loaded:12,d} {list_ms:15.2f} {timed(count_active):16.2f} {timed(occupied):12.2f}")
+    finally:
+        db.put_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
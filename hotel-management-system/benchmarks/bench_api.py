@@ -0,0 +1,147 @@
+"""
+/api/v1 throughput.
+
+Without a database: encoding 1,000 reservation rows (Decimal/date values as
+RealDictCursor returns them) the old way (float()/isoformat() per value,
+then Flask's default provider) vs api.JSONProvider on stdlib json vs orjson.
+
+    python benchmarks/bench_api.py
+    BENCH_DATABASE_URL=... python benchmarks/bench_api.py --db   # requests/s per endpoint
+
+--db seeds 1,000 rooms, 10,000 guests and 30,000 reservations and drives
+the endpoints through the Flask test client (no network, login disabled).
+"""
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ.setdefault("DATABASE_URL", os.environ.get("BENCH_DATABASE_URL", "postgresql://localhost/unused"))
+
+ROWS = 1_000
+BULK = 1_000
+
+
+def _rows():
+    today = date.today()
+    return [
+        {
+            "res_id": i, "guest_id": 1 + i % 500, "emp_id": 1,
+            "check_in": today + timedelta(days=i % 30), "check_out": today + timedelta(days=i % 30 + 2),
+            "booking_date": datetime(2026, 1, 1, 12, 30), "num_people": 2, "status": "active",
+            "total_cost": Decimal("300.00"), "payment": Decimal("150.50"), "discount": Decimal("0.00"),
+            "room_locked": False,
+        }
+        for i in range(ROWS)
+    ]
+
+
+def _old_style(rows):
+    return [
+        {k: (v.isoformat() if hasattr(v, "isoformat") else float(v) if isinstance(v, Decimal) else v) for k, v in r.items()}
+        for r in rows
+    ]
+
+
+def _per_call(fn, repeat=50):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def encoders():
+    from flask import Flask
+
+    import api
+
+    rows = _rows()
+    old = Flask("old")
+    new = Flask("new")
+    new.json = api.JSONProvider(new)
+
+    with old.app_context():
+        old_ms = _per_call(lambda: old.json.response({"data": _old_style(rows)}))
+        size = len(old.json.response({"data": _old_style(rows)}).get_data())
+    print(f"{'encoder':<34s} {'ms / 1k rows':>12s} {'bytes':>9s}")
+    print(f"{'float()/isoformat + Flask default':<34s} {old_ms:12.2f} {size:9,d}")
+
+    orjson = api.orjson
+    for name, module in (("JSONProvider, stdlib json", None), ("JSONProvider, orjson", orjson)):
+        if name.endswith("orjson") and orjson is None:
+            print(f"{name:<34s} {'(orjson not installed)':>22s}")
+            continue
+        api.orjson = module
+        with new.app_context():
+            ms = _per_call(lambda: new.json.response({"data": rows}))
+            size = len(new.json.response({"data": rows}).get_data())
+        print(f"{name:<34s} {ms:12.2f} {size:9,d}")
+    api.orjson = orjson
+
+
+def endpoints():
+    from _seed import bench_db, reset, seed_base, seed_reservations
+
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=1_000, guests=10_000)
+            seed_reservations(cur, emp_id, 30_000, status="active", start_offset=0, spread_days=365)
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+    db.backfill_room_nights()
+
+    from app import app
+
+    app.config["LOGIN_DISABLED"] = True
+    client = app.test_client()
+    run = int(time.time())
+    batch = iter(range(10**6))
+
+    def guests_bulk():
+        n = next(batch)
+        body = [
+            {"name": "Bench", "family": f"G{i}", "national_id": f"{run}{n}{i}", "birthdate": "1990-01-01",
+             "email": f"api{run}-{n}-{i}@bench.local"}
+            for i in range(BULK)
+        ]
+        assert client.post("/api/v1/guests", json=body).status_code == 201
+
+    cases = [
+        ("GET /guests?limit=1000", lambda: client.get("/api/v1/guests?limit=1000"), ROWS),
+        ("GET /guests?limit=1000&fields=email", lambda: client.get("/api/v1/guests?limit=1000&fields=email"), ROWS),
+        ("GET /rooms?limit=1000", lambda: client.get("/api/v1/rooms?limit=1000"), ROWS),
+        ("GET /reservations?limit=1000", lambda: client.get("/api/v1/reservations?limit=1000"), ROWS),
+        ("GET /reservations?...&fields=..,rooms",
+         lambda: client.get("/api/v1/reservations?limit=1000&fields=check_in,check_out,rooms"), ROWS),
+        ("GET /payments?limit=1000", lambda: client.get("/api/v1/payments?limit=1000"), ROWS),
+        ("GET /reservations/<id>", lambda: client.get("/api/v1/reservations/5000"), 1),
+        ("POST /guests (1000)", guests_bulk, BULK),
+        ("PATCH /rooms (1000)",
+         lambda: client.patch("/api/v1/rooms", json=[{"room_id": r, "price": "120.00"} for r in range(1, BULK + 1)]), BULK),
+        ("POST /payments (1000)",
+         lambda: client.post("/api/v1/payments", json=[{"res_id": r, "amount": "1.00"} for r in range(1, BULK + 1)]), BULK),
+    ]
+    print(f"{'endpoint':<40s} {'ms / request':>12s} {'requests/s':>11s} {'rows/s':>10s}")
+    for name, fn, rows in cases:
+        ms = _per_call(fn, repeat=20)
+        print(f"{name:<40s} {ms:12.2f} {1000 / ms:11.1f} {rows * 1000 / ms:10,.0f}")
+
+
+def main():
+    encoders()
+    if "--db" in sys.argv:
+        print()
+        endpoints()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Orphan gaps left by room assignment, in memory (no database).
+
+A synthetic hotel gets four weeks of random bookings, each placed as it
+arrives either in the first free room (what picking from the list does) or
+by best fit (assignment.assign). Then the batch optimizer re-plans the
+first-free assignment of one week. Reports orphan gaps (free runs of at
+most ORPHAN_GAP_NIGHTS nights between two stays) and timings.
+
+    python benchmarks/bench_assignment.py
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from assignment import Hotel, assign, optimize, orphan_gaps  # noqa: E402
+
+HOTELS = (500, 1_000, 5_000)
+NIGHTS = 28
+WEEK = (7, 14)  # columns re-planned by the batch run
+OCCUPANCY = 0.8
+KINDS = (("single", "single", False), ("double", "double", False), ("double", "twin", False), ("suite", "king", True))
+
+
+def _hotel(rooms):
+    rng = random.Random(rooms)
+    rows = []
+    for room_id in range(1, rooms + 1):
+        room_type, bed_type, smoking = KINDS[rng.randrange(len(KINDS))]
+        rows.append({"room_id": room_id, "type": room_type, "capacity": 1 if room_type == "single" else 2,
+                     "bed_type": bed_type, "smoking": smoking})
+    return Hotel(rows)
+
+
+def _bookings(hotel, seed):
+    """Random (check-in column, nights, kind index) in booking order, about OCCUPANCY of room-nights."""
+    rng = random.Random(seed)
+    target = int(len(hotel.rooms) * NIGHTS * OCCUPANCY)
+    out, nights = [], 0
+    while nights < target:
+        stay = min(rng.choice((1, 1, 2, 2, 3, 4, 7)), NIGHTS)
+        a = rng.randrange(0, NIGHTS - stay + 1)
+        out.append((a, stay, rng.randrange(len(KINDS))))
+        nights += stay
+    return out
+
+
+def _place(hotel, bookings, best_fit):
+    taken = np.zeros((len(hotel.rooms), NIGHTS), dtype=bool)
+    stays = []  # (row, a, b)
+    timings = []
+    for a, stay, k in bookings:
+        b = a + stay
+        room_type, bed_type, smoking = KINDS[k]
+        started = time.perf_counter()
+        if best_fit:
+            picked = assign(hotel, taken, a, b, 1, room_type=room_type, bed_type=bed_type, smoking=smoking)
+        else:
+            rows = hotel.candidates(room_type=room_type, bed_type=bed_type, smoking=smoking)
+            free = rows[~taken[rows, a:b].any(axis=1)]
+            picked = None
+            if free.size:
+                taken[free[0], a:b] = True
+                picked = [int(hotel.room_ids[free[0]])]
+        timings.append(time.perf_counter() - started)
+        if picked:
+            stays.append((hotel.row_of[picked[0]], a, b))
+    return taken, stays, timings
+
+
+def main():
+    print(f"{'rooms':>6s} {'mode':<12s} {'placed':>7s} {'orphans':>8s} {'us/booking':>11s} {'batch ms':>9s} {'moves':>6s}")
+    for rooms in HOTELS:
+        hotel = _hotel(rooms)
+        bookings = _bookings(hotel, rooms)
+        for mode, best_fit in (("first-free", False), ("best-fit", True)):
+            taken, stays, timings = _place(hotel, bookings, best_fit)
+            print(f"{rooms:6d} {mode:<12s} {len(stays):7d} {orphan_gaps(taken):8d} "
+                  f"{np.median(timings) * 1e6:11.0f} {'':>9s} {'':>6s}")
+            if best_fit:
+                continue
+            # batch: stays entirely inside the week move, everything else stays put
+            lo, hi = WEEK
+            fixed = np.zeros_like(taken)
+            flexible = []
+            for i, (row, a, b) in enumerate(stays):
+                if lo <= a and b <= hi:
+                    flexible.append((i, row, a, b))
+                else:
+                    fixed[row, a:b] = True
+            started = time.perf_counter()
+            placed, planned = optimize(hotel, fixed, flexible)
+            batch_ms = (time.perf_counter() - started) * 1000
+            if placed is None:
+                print(f"{rooms:6d} {'batch week':<12s} {'(no feasible greedy plan, kept)':>30s}")
+                continue
+            moves = sum(1 for i, row, _, _ in flexible if placed[i] != row)
+            print(f"{rooms:6d} {'batch week':<12s} {len(flexible):7d} {orphan_gaps(planned):8d} "
+                  f"{'':>11s} {batch_ms:9.0f} {moves:6d}")
+
+
+if __name__ == "__main__":
+    main()
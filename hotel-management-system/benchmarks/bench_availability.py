@@ -0,0 +1,90 @@
+"""
+Availability questions answered from the in-memory index (availability.py)
+vs. SQL, plus index build time, incremental updates and memory per
+1k rooms x 1 year.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_availability.py
+"""
+from datetime import date, timedelta
+
+from _seed import bench_db, reset, seed_base, seed_reservations, timed
+
+from availability import AvailabilityIndex
+
+HOTELS = (1_000, 5_000)
+CALENDAR_NIGHTS = 90
+
+PER_ROOM_OVERLAP = """
+    SELECT r.check_in, r.check_out
+    FROM reservation r
+    JOIN reservation_room rr ON rr.res_id = r.res_id
+    WHERE rr.room_id = %s AND r.status = 'active' AND r.check_in < %s AND r.check_out > %s
+"""
+
+
+def _seed(db, rooms):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=rooms, guests=5_000)
+            seed_reservations(cur, emp_id, rooms * 40, status="active", start_offset=0, spread_days=365)
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+    db.backfill_room_nights()
+    return emp_id
+
+
+def main():
+    db = bench_db()
+    today = date.today()
+    ci, co = today + timedelta(days=30), today + timedelta(days=33)
+    print(
+        f"{'rooms':>6s} {'build ms':>9s} {'query':<18s} {'index us':>10s} {'sql us':>12s}"
+    )
+    for rooms in HOTELS:
+        emp_id = _seed(db, rooms)
+        index = AvailabilityIndex(db, check_seconds=3600)
+        index.rebuild()
+
+        def sql_calendar():
+            # the old way: one overlap query per room
+            for room_id in range(1, rooms + 1):
+                db.execute(PER_ROOM_OVERLAP, (room_id, today + timedelta(days=CALENDAR_NIGHTS), today), fetch=True)
+
+        cases = (
+            ("is_free", lambda: index.is_free(7, ci, co),
+             lambda: db.execute(PER_ROOM_OVERLAP, (7, co, ci), fetch=True), 20),
+            ("free_rooms", lambda: index.free_rooms(ci, co),
+             lambda: db.get_available_rooms(ci, co, limit=rooms), 10),
+            ("first_free double", lambda: index.first_free_room("double", ci, co),
+             lambda: db.count_available_rooms(ci, co, "double"), 10),
+            ("calendar 90n", lambda: index.calendar(today, CALENDAR_NIGHTS),
+             sql_calendar, 1),
+        )
+        for i, (name, from_index, from_sql, repeat) in enumerate(cases):
+            index_us = timed(from_index, 50) * 1000
+            sql_us = timed(from_sql, repeat) * 1000
+            build = f"{index.built_ms:9.1f}" if i == 0 else " " * 9
+            print(f"{rooms if i == 0 else '':>6} {build} {name:<18s} {index_us:10.1f} {sql_us:12.1f}")
+
+        # our own booking is applied in place, no rebuild
+        free = index.free_rooms(today + timedelta(days=300), today + timedelta(days=302))
+        guest = db.execute("SELECT MIN(guest_id) AS g FROM guest", fetchone=True)["g"]
+        db.create_reservation(guest, emp_id, today + timedelta(days=300), today + timedelta(days=302), 1, "active", 200, free[:2])
+        report = index.memory_report()
+        print(
+            f"       incremental={report['incremental']} rebuilds={report['rebuilds']} "
+            f"free_after={not index.is_free(free[0], today + timedelta(days=300), today + timedelta(days=302))}"
+        )
+        print(
+            f"       memory: {report['bool_bytes'] / 1024:.0f} KiB bool, {report['packed_bytes'] / 1024:.0f} KiB packed; "
+            f"per 1k rooms/year {report['bool_bytes_per_1k_rooms_year'] / 1024:.0f} KiB bool, "
+            f"{report['packed_bytes_per_1k_rooms_year'] / 1024:.0f} KiB packed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Session lookup cost per bot message (every handler behind login_required
+does one lookup), at 10k live sessions.
+
+  dict      the old module-level user_sessions dict
+  memory    sessions.MemorySessionStore (TTL + eviction)
+  postgres  sessions.PostgresSessionStore (bot_session primary-key read)
+  refresh   postgres lookup that also slides the expiry (once per half TTL)
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_bot_sessions.py
+"""
+import random
+
+from _seed import bench_db, reset, seed_base, timed
+
+from sessions import MemorySessionStore, PostgresSessionStore
+
+SESSIONS = 10_000
+LOOKUPS = 1_000
+
+
+def main():
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=10, guests=10)
+            cur.execute("DELETE FROM bot_session")
+            cur.execute(
+                """
+                INSERT INTO bot_session (chat_id, emp_id, data, expires_at)
+                SELECT c, %s, '{"username": "bench"}', NOW() + INTERVAL '12 hours'
+                FROM generate_series(1, %s) c
+                """,
+                (emp_id, SESSIONS),
+            )
+            cur.execute("ANALYZE bot_session")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+
+    chats = [random.randint(1, SESSIONS) for _ in range(LOOKUPS)]
+
+    plain = {c: True for c in range(1, SESSIONS + 1)}
+    memory = MemorySessionStore()
+    for c in range(1, SESSIONS + 1):
+        memory.set(c, {"emp_id": emp_id})
+    postgres = PostgresSessionStore(db)
+    # ttl larger than twice what is left -> every lookup also refreshes expiry
+    refreshing = PostgresSessionStore(db, ttl_seconds=48 * 3600)
+
+    def run(store_get):
+        def fn():
+            for c in chats:
+                store_get(c)
+
+        return fn
+
+    print(f"{'store':10s} {'us / lookup':>12s}")
+    for name, get, repeat in (
+        ("dict", plain.get, 20),
+        ("memory", memory.get, 20),
+        ("postgres", postgres.get, 3),
+        ("refresh", refreshing.get, 3),
+    ):
+        print(f"{name:10s} {timed(run(get), repeat) * 1000 / LOOKUPS:12.1f}")
+    print(f"connections opened: {db.metrics['connections_opened']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Bot taps before and after moving bot_app onto database.db: per-tap latency
+and how many server connections each side opens.
+
+  old  fresh psycopg2.connect() per tap, six COUNT(*) queries for quick status
+  new  database.db: the bot_session login check every tap makes, then a pooled
+       connection, one FILTER query, cached for STATS_CACHE_SECONDS (the session
+       read must not invalidate that cache)
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_bot_taps.py
+"""
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from _seed import bench_db, reset, seed_base, seed_reservations
+from sessions import PostgresSessionStore
+
+TAPS = 200
+CHAT_ID = 1
+
+OLD_STATUS_QUERIES = (
+    "SELECT COUNT(*) AS c FROM room",
+    "SELECT COUNT(*) AS c FROM room WHERE status='available'",
+    "SELECT COUNT(*) AS c FROM room WHERE status='cleaning'",
+    "SELECT COUNT(*) AS c FROM room WHERE status='reserved'",
+    "SELECT COUNT(*) AS c FROM room WHERE status='occupied'",
+    "SELECT COUNT(*) AS c FROM reservation WHERE status='active'",
+)
+
+OLD_ROOM_LIST = """
+    SELECT room_id, type, floor, bed_type, capacity, price
+    FROM room
+    WHERE status=%s
+    ORDER BY floor, room_id
+    LIMIT 40
+"""
+
+
+def _old_tap(url, kind):
+    conn = psycopg2.connect(url, cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cur:
+            if kind == "status":
+                for q in OLD_STATUS_QUERIES:
+                    cur.execute(q)
+                    cur.fetchone()
+            else:
+                cur.execute(OLD_ROOM_LIST, (kind,))
+                cur.fetchall()
+    finally:
+        conn.close()
+
+
+def _new_tap(db, sessions, kind):
+    # bot_app.check_login() runs before every handler
+    assert sessions.get(CHAT_ID)["emp_id"]
+    if kind == "status":
+        db.get_room_status_counts()
+    elif kind == "cleaning":
+        db.get_cleaning_rooms(limit=40)
+    else:
+        db.get_available_rooms(limit=40)
+
+
+def _run(label, tap, kinds, connections):
+    per_kind = {}
+    for i in range(TAPS):
+        kind = kinds[i % len(kinds)]
+        started = time.perf_counter()
+        tap(kind)
+        per_kind.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+    for kind, samples in per_kind.items():
+        samples.sort()
+        print(
+            f"{label:4s} {kind:10s} p50 {samples[len(samples) // 2]:7.2f} ms  "
+            f"p95 {samples[int(len(samples) * 0.95)]:7.2f} ms"
+        )
+    print(f"{label:4s} connections opened: {connections()}")
+
+
+def main():
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=2_000, guests=5_000)
+            seed_reservations(cur, emp_id, 20_000, status="active", spread_days=365)
+            cur.execute("UPDATE room SET status = 'cleaning' WHERE room_id % 9 = 0")
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+    sessions = PostgresSessionStore(db)
+    sessions.set(CHAT_ID, {"emp_id": emp_id})
+    db.invalidate_cache()
+
+    kinds = ("status", "cleaning", "available")
+    _run("old", lambda kind: _old_tap(db.db_url, kind), kinds, lambda: TAPS)
+
+    opened_before = db.metrics["connections_opened"]
+    _run("new", lambda kind: _new_tap(db, sessions, kind), kinds, lambda: db.metrics["connections_opened"] - opened_before)
+    print(f"new  stats cache hits/misses: {db.metrics['cache_hits']}/{db.metrics['cache_misses']}")
+
+
+if __name__ == "__main__":
+    main()
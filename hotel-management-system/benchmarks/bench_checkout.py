@@ -0,0 +1,52 @@
+"""
+Peak-morning departures: load today's departure queue and check everyone
+out, one reservation at a time vs. one bulk statement.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_checkout.py
+"""
+import time
+
+from _seed import bench_db, reset, seed_base, seed_reservations
+
+DEPARTURES = (1_000, 2_500)
+
+
+def _seed_departures(db, n):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=max(3_000, n * 2), guests=5_000)
+            # 2-night stays that started two days ago -> all check out today
+            seed_reservations(cur, emp_id, n, status="active", start_offset=-2, spread_days=1, rooms_per_res=2)
+            seed_reservations(cur, emp_id, 20_000, status="active", start_offset=1, spread_days=120)
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+
+
+def main():
+    db = bench_db()
+    print(f"{'departures':>10s} {'queue ms':>9s} {'one-by-one ms':>14s} {'bulk ms':>9s}")
+    for n in DEPARTURES:
+        _seed_departures(db, n)
+        started = time.perf_counter()
+        queue = db.get_departures(limit=n)
+        queue_ms = (time.perf_counter() - started) * 1000
+
+        half = len(queue) // 2
+        started = time.perf_counter()
+        for r in queue[:half]:
+            db.finish_reservation(r["res_id"])
+        single_ms = (time.perf_counter() - started) * 1000 * 2  # extrapolated to the full queue
+
+        started = time.perf_counter()
+        db.check_out_reservations([r["res_id"] for r in queue[half:]])
+        bulk_ms = (time.perf_counter() - started) * 1000 * 2
+
+        print(f"{len(queue):10,d} {queue_ms:9.1f} {single_ms:14.1f} {bulk_ms:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
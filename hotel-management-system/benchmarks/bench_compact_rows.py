@@ -0,0 +1,111 @@
+"""
+100,000-row result sets: RealDictCursor dicts vs CompactCursor rows vs plain tuples.
+
+Without a database: the row objects are built from 100,000 guest-shaped
+tuples the way each cursor builds them (RealDictRow per row, namedtuple
+_make per row), so only the Python side is measured; the values are shared,
+so the memory column is the row containers alone.
+
+    python benchmarks/bench_compact_rows.py
+    BENCH_DATABASE_URL=... python benchmarks/bench_compact_rows.py --db   # real fetchall()
+
+Memory is what the list of rows holds once fetched (tracemalloc), time is
+the median of a few runs.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ.setdefault("DATABASE_URL", os.environ.get("BENCH_DATABASE_URL", "postgresql://localhost/unused"))
+
+ROWS = 100_000
+COLUMNS = ("guest_id", "name", "family", "national_id", "passport", "birthdate", "email")
+QUERY = f"SELECT {', '.join(COLUMNS)} FROM guest ORDER BY guest_id LIMIT %s"
+
+
+def _measure(label, build, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    tracemalloc.start()
+    rows = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<16s} {samples[len(samples) // 2]:10.1f} {held / 1024 / 1024:10.1f} {held / len(rows):10.0f}")
+    return rows
+
+
+def _header():
+    print(f"{'rows':<16s} {'ms':>10s} {'MiB':>10s} {'B/row':>10s}")
+
+
+def offline():
+    from psycopg2.extras import RealDictRow
+
+    from database import CompactCursor
+
+    born = date(1990, 1, 1)
+    tuples = [
+        (i, f"name{i}", f"family{i}", f"{i:010d}", None, born + timedelta(days=i % 10_000), f"g{i}@example.com")
+        for i in range(ROWS)
+    ]
+    Row = CompactCursor._cached_make_nt(COLUMNS)
+
+    print(f"{ROWS:,} rows built in Python")
+    _header()
+    dicts = _measure("RealDictCursor", lambda: [RealDictRow(zip(COLUMNS, t)) for t in tuples])
+    compact = _measure("CompactCursor", lambda: [Row._make(t) for t in tuples])
+    _measure("tuple", lambda: [(*t,) for t in tuples])
+    assert all(d["email"] == c["email"] == c.email for d, c in zip(dicts, compact))
+
+
+def fetched():
+    import psycopg2.extensions
+    from psycopg2.extras import RealDictCursor
+
+    from _seed import bench_db, reset, seed_base
+    from database import CompactCursor
+
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            seed_base(cur, rooms=100, guests=ROWS)
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+
+    def fetch(factory):
+        conn = db.get_connection(readonly=True)
+        try:
+            with conn.cursor(cursor_factory=factory) as cur:
+                cur.execute(QUERY, (ROWS,))
+                return cur.fetchall()
+        finally:
+            db.put_connection(conn)
+
+    print(f"{ROWS:,} guest rows fetched")
+    _header()
+    _measure("RealDictCursor", lambda: fetch(RealDictCursor))
+    _measure("CompactCursor", lambda: fetch(CompactCursor))
+    _measure("tuple", lambda: fetch(psycopg2.extensions.cursor))
+
+
+def main():
+    offline()
+    if "--db" in sys.argv:
+        print()
+        fetched()
+
+
+if __name__ == "__main__":
+    main()
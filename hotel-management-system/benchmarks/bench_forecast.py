@@ -0,0 +1,95 @@
+"""
+Forecast refit time on 10 years of history, in memory (no database).
+
+Builds what forecast.load() would return for a 1,000-room hotel with
+seasonal, weekday and booking-pace patterns, times forecast.fit() and
+checks the forecast against the pattern it was generated from.
+
+    python benchmarks/bench_forecast.py
+    BENCH_DATABASE_URL=... python benchmarks/bench_forecast.py --db   # load + fit + store on a seeded DB
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import forecast  # noqa: E402
+
+TYPES = (("double", 500, 150.0), ("single", 300, 100.0), ("suite", 200, 250.0))
+YEARS = 10
+HORIZON = 365
+
+
+def _pattern(dates):
+    """True occupancy for dates: summer peak, busier weekends."""
+    d = np.asarray(dates, dtype="datetime64[D]")
+    doy = (d - d.astype("datetime64[Y]").astype("datetime64[D]")).astype(np.int64)
+    weekday = (d.astype(np.int64) + 3) % 7
+    return np.clip(0.6 + 0.25 * np.sin(2 * np.pi * (doy - 100) / 365) + np.where(weekday >= 4, 0.08, -0.03), 0, 1)
+
+
+def _history(today):
+    rng = np.random.default_rng(1)
+    since = today - timedelta(days=365 * YEARS)
+    days = (today - since).days
+    occ = _pattern(np.datetime64(since) + np.arange(days))
+    # share of a night's rooms booked in each lead bucket (most 7-60 days ahead)
+    share = np.array([2, 2, 2, 3, 4, 5, 7, 10, 13, 14, 12, 10, 7, 5, 3, 1, 0], dtype=float)
+    share /= share.sum()
+    nights = []
+    for name, rooms, price in TYPES:
+        sold = rng.binomial(rooms, occ)
+        split = np.floor(sold[:, None] * share[None, :]).astype(int)
+        split[:, 9] += sold - split.sum(axis=1)
+        day, bucket = np.nonzero(split)
+        counts = split[day, bucket]
+        nights.extend(zip([name] * len(day), day.tolist(), bucket.tolist(), counts.tolist(), (counts * price).tolist()))
+    future = np.datetime64(today) + np.arange(HORIZON)
+    ahead = np.searchsorted(forecast.LEAD_BUCKETS, np.arange(HORIZON), side="right") - 1
+    on_books_share = share[::-1].cumsum()[::-1][ahead]
+    on_books = []
+    for name, rooms, _ in TYPES:
+        booked = rng.binomial(rooms, _pattern(future) * on_books_share)
+        on_books.extend((name, i, int(c)) for i, c in enumerate(booked) if c)
+    return {
+        "today": today,
+        "since": since,
+        "rooms": [(name, rooms, price) for name, rooms, price in TYPES],
+        "nights": nights,
+        "on_books": on_books,
+        "revenue_years": {False: 1.0, True: 1.0},
+    }
+
+
+def main():
+    if "--db" in sys.argv:
+        from _seed import bench_db
+
+        db = bench_db()
+        print(forecast.refit(db))
+        return
+
+    today = date.today()
+    history = _history(today)
+    print(f"history rows: {len(history['nights']):,} (types x nights x lead buckets)")
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        result = forecast.fit(history, HORIZON)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"fit: median {sorted(timings)[2]:.0f} ms for {YEARS} years, {HORIZON} nights")
+
+    truth = _pattern(np.datetime64(today) + np.arange(HORIZON))
+    capacity = result["capacity"][:, None]
+    error = np.abs(result["rooms"] / capacity - truth[None, :])
+    for i, name in enumerate(result["types"]):
+        print(f"{name:<8s} mean abs occupancy error: 0-30 nights {error[i, :30].mean():.3f}, "
+              f"31-365 nights {error[i, 30:].mean():.3f}")
+
+
+if __name__ == "__main__":
+    main()
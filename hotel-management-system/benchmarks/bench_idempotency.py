@@ -0,0 +1,86 @@
+"""
+Cost of idempotency keys on the write paths, with 1,000,000 live keys.
+
+Compares create_reservation / add_payment without a key, with a fresh key,
+and a replay of a used key (which must not write), plus the bare lookup
+that app.py and api.py do before any work.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_idempotency.py
+"""
+import uuid
+from datetime import date, timedelta
+
+from _seed import bench_db, reset, seed_base, timed
+
+ROOMS = 2_000
+KEYS = 1_000_000
+
+
+def _seed(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            cur.execute("TRUNCATE idempotency_key")
+            emp_id = seed_base(cur, rooms=ROOMS, guests=1_000)
+            cur.execute(
+                """
+                INSERT INTO idempotency_key (scope, key, request_hash, result, expires_at)
+                SELECT (ARRAY['reservation', 'payment'])[1 + s % 2], md5(s::text), md5(s::text) || md5(s::text),
+                       jsonb_build_object('res_id', s), NOW() + interval '1 day'
+                FROM generate_series(1, %s) s
+                """,
+                (KEYS,),
+            )
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+    return emp_id
+
+
+def main():
+    db = bench_db()
+    emp_id = _seed(db)
+    rooms = iter(range(1, ROOMS + 1))
+    check_in = date.today() + timedelta(days=30)
+    check_out = check_in + timedelta(days=2)
+
+    def book(key=None):
+        return db.create_reservation(
+            guest_id=1, emp_id=emp_id, check_in=check_in, check_out=check_out, num_people=1,
+            status="active", total_cost=100, room_ids=[next(rooms)], idempotency_key=key,
+        )
+
+    replay_key = uuid.uuid4().hex
+    res_id = db.create_reservation(
+        guest_id=1, emp_id=emp_id, check_in=check_in, check_out=check_out, num_people=1,
+        status="active", total_cost=100, room_ids=[next(rooms)], idempotency_key=replay_key,
+    )
+    replay_room = db.get_idempotent_result("reservation", replay_key)["rooms"]
+    payment_key = uuid.uuid4().hex
+    db.add_payment(res_id, 10, idempotency_key=payment_key)
+
+    cases = [
+        ("lookup (hit)", lambda: db.get_idempotent_result("reservation", replay_key)),
+        ("lookup (miss)", lambda: db.get_idempotent_result("reservation", uuid.uuid4().hex)),
+        ("create_reservation, no key", lambda: book()),
+        ("create_reservation, new key", lambda: book(uuid.uuid4().hex)),
+        ("create_reservation, replay", lambda: db.create_reservation(
+            guest_id=1, emp_id=emp_id, check_in=check_in, check_out=check_out, num_people=1,
+            status="active", total_cost=100, room_ids=replay_room, idempotency_key=replay_key)),
+        ("add_payment, no key", lambda: db.add_payment(res_id, 1)),
+        ("add_payment, new key", lambda: db.add_payment(res_id, 1, idempotency_key=uuid.uuid4().hex)),
+        ("add_payment, replay", lambda: db.add_payment(res_id, 10, idempotency_key=payment_key)),
+    ]
+    print(f"{KEYS:,} keys in idempotency_key")
+    print(f"{'operation':<30s} {'median ms':>10s}")
+    for name, fn in cases:
+        print(f"{name:<30s} {timed(fn, repeat=200):10.3f}")
+
+    replayed = db.execute("SELECT COUNT(*) AS n FROM reservation_room WHERE room_id = %s", (replay_room[0],), fetchone=True)
+    print(f"reservations on the replayed room: {replayed['n']} (expected 1)")
+
+
+if __name__ == "__main__":
+    main()
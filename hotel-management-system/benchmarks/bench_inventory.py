@@ -0,0 +1,48 @@
+"""
+Availability queries against the per-night inventory (room_night) over a
+365-night horizon: 500 rooms, 40k active reservations.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_inventory.py
+"""
+import time
+from datetime import date, timedelta
+
+from _seed import bench_db, reset, seed_base, seed_reservations, timed
+
+ROOMS = 500
+RESERVATIONS = 40_000
+
+
+def main():
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            cur.execute("TRUNCATE room_night")
+            emp_id = seed_base(cur, rooms=ROOMS, guests=10_000)
+            seed_reservations(cur, emp_id, RESERVATIONS, status="active", start_offset=0, spread_days=365)
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+
+    started = time.perf_counter()
+    inserted, conflicts = db.backfill_room_nights()
+    print(f"backfill: {inserted:,d} room-nights in {(time.perf_counter() - started):.2f} s ({conflicts:,d} overlapping)")
+    db.execute("ANALYZE room_night")
+
+    today = date.today()
+    cases = {
+        "count 1 night": lambda: db.count_available_rooms(today, today + timedelta(days=1)),
+        "count 7 nights": lambda: db.count_available_rooms(today + timedelta(days=30), today + timedelta(days=37)),
+        "count 7 nights, suite": lambda: db.count_available_rooms(today, today + timedelta(days=7), "suite"),
+        "rooms free 7 nights": lambda: db.get_available_rooms(today, today + timedelta(days=7), limit=500),
+        "by-night 90": lambda: db.get_availability_by_night(today, today + timedelta(days=90)),
+        "by-night 365": lambda: db.get_availability_by_night(today, today + timedelta(days=365)),
+    }
+    for name, fn in cases.items():
+        print(f"{name:24s} {timed(fn):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
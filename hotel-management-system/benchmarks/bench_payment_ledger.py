@@ -0,0 +1,112 @@
+"""
+100,000 payment postings over 20,000 reservations.
+
+"in place" is the old add_payment (UPDATE reservation SET payment = payment + x,
+one transaction each); "ledger, one by one" is add_payment on the ledger;
+the batched rows post with add_payments in settlement-sized batches, where the
+statement trigger folds each batch into reservation_balance. Single-posting
+paths are timed on the first 10,000 postings and scaled to 100,000.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_payment_ledger.py
+"""
+import random
+import time
+from decimal import Decimal
+
+from _seed import bench_db, reset, seed_base, seed_reservations
+
+RESERVATIONS = 20_000
+POSTINGS = 100_000
+SAMPLE = 10_000
+BATCH_SIZES = (1_000, 10_000)
+
+
+def _seed(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=1_000, guests=5_000)
+            seed_reservations(cur, emp_id, RESERVATIONS, status="active", start_offset=-3, spread_days=365)
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+    return emp_id
+
+
+def _postings(res_ids):
+    rng = random.Random(7)
+    return [
+        (rng.choice(res_ids), Decimal(rng.randrange(100, 50_000)) / 100, rng.choice(("cash", "card", "card", "transfer")), None)
+        for _ in range(POSTINGS)
+    ]
+
+
+def _in_place(db, postings):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            for res_id, amount, _, _ in postings:
+                cur.execute("UPDATE reservation SET payment = payment + %s WHERE res_id = %s", (amount, res_id))
+                conn.commit()
+    finally:
+        db.put_connection(conn)
+
+
+def _check(db, postings):
+    """Every posted amount is in the ledger and in reservation_balance."""
+    row = db.execute(
+        """
+        SELECT (SELECT COALESCE(SUM(amount), 0) FROM payment) AS ledger,
+               (SELECT COALESCE(SUM(paid), 0) FROM reservation_balance) AS balance,
+               (SELECT COUNT(*) FROM payment) AS rows
+        """,
+        fetchone=True,
+    )
+    expected = sum(p[1] for p in postings)
+    return row["ledger"] == expected and row["balance"] == expected and row["rows"] == len(postings)
+
+
+def _timed(label, fn, scale=1):
+    started = time.perf_counter()
+    fn()
+    seconds = (time.perf_counter() - started) * scale
+    print(f"{label:<28s} {seconds:9.2f} {POSTINGS / seconds:12,.0f}")
+
+
+def main():
+    db = bench_db()
+    emp_id = _seed(db)
+    postings = _postings([r["res_id"] for r in db.execute("SELECT res_id FROM reservation", fetch=True)])
+    sample = postings[:SAMPLE]
+    scale = POSTINGS / SAMPLE
+
+    print(f"{POSTINGS:,} postings, {RESERVATIONS:,} reservations")
+    print(f"{'path':<28s} {'seconds':>9s} {'postings/s':>12s}")
+
+    _timed("in place, one by one", lambda: _in_place(db, sample), scale)
+
+    db.execute("TRUNCATE payment, reservation_balance")
+    _timed(
+        "ledger, one by one",
+        lambda: [db.add_payment(r, a, method=m, emp_id=emp_id) for r, a, m, _ in sample],
+        scale,
+    )
+
+    for size in BATCH_SIZES:
+        db.execute("TRUNCATE payment, reservation_balance")
+        _timed(
+            f"ledger, batches of {size:,}",
+            lambda: [db.add_payments(postings[i:i + size], emp_id=emp_id) for i in range(0, POSTINGS, size)],
+        )
+        print(f"{'':<28s} totals match: {_check(db, postings)}")
+
+    started = time.perf_counter()
+    for i in range(1_000):
+        db.get_balances(list(range(1 + i * 20, 21 + i * 20)))
+    print(f"paid totals for a page of 20 reservations: {(time.perf_counter() - started):.3f} ms per page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Reservation listing at 50k active reservations: three ways to get one page
+with its rooms.
+
+  group_by_all  old bot query: GROUP BY + ARRAY_AGG over every active row, then LIMIT
+  n_plus_one    page query + get_reservation_rooms() per row (one connection each)
+  page_batch    queries.py: page first, then rooms for that page with = ANY(%s)
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_reservation_listing.py
+"""
+from _seed import bench_db, reset, seed_base, seed_reservations, timed
+
+ACTIVE = 50_000
+PAGE_SIZES = (10, 50, 200)
+
+GROUP_BY_ALL = """
+    SELECT r.res_id, r.check_in, r.check_out, g.name, g.family,
+           COALESCE(ARRAY_AGG(rr.room_id ORDER BY rr.room_id), '{}') AS rooms
+    FROM reservation r
+    JOIN guest g ON g.guest_id = r.guest_id
+    LEFT JOIN reservation_room rr ON rr.res_id = r.res_id
+    WHERE r.status='active'
+    GROUP BY r.res_id, r.check_in, r.check_out, g.name, g.family
+    ORDER BY r.res_id DESC
+    LIMIT %s
+"""
+
+
+def main():
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=2_000, guests=20_000)
+            seed_reservations(cur, emp_id, ACTIVE, status="active", spread_days=365, rooms_per_res=2)
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+
+    print(f"{'page':>5s} {'group_by_all ms':>16s} {'n_plus_one ms':>14s} {'page_batch ms':>14s}")
+    for size in PAGE_SIZES:
+        def group_by_all():
+            db.execute(GROUP_BY_ALL, (size,), fetch=True)
+
+        def n_plus_one():
+            for r in db.list_active_reservations(limit=size):
+                db.get_reservation_rooms(r["res_id"])
+
+        def page_batch():
+            db.list_active_reservations(limit=size, with_rooms=True)
+
+        print(f"{size:5d} {timed(group_by_all, 10):16.2f} {timed(n_plus_one, 5):14.2f} {timed(page_batch, 10):14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+/api/timeline payload for a 1,000-room x 60-night window: query time,
+serialization time and payload size (raw and gzip). Target: under 200 ms.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_timeline.py
+"""
+import gzip
+import json
+import time
+from datetime import date, timedelta
+
+from _seed import bench_db, reset, seed_base, seed_reservations
+
+ROOMS = 1_000
+NIGHTS = 60
+
+
+def main():
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=ROOMS, guests=10_000)
+            # ~2-night stays over the next 90 days, ~60% occupancy
+            seed_reservations(cur, emp_id, ROOMS * 27, status="active", start_offset=-5, spread_days=90)
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+    db.backfill_room_nights()
+
+    start = date.today()
+    end = start + timedelta(days=NIGHTS)
+    samples = []
+    for _ in range(10):
+        started = time.perf_counter()
+        rows = db.get_room_timeline(start, end)
+        query_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        body = json.dumps(
+            {
+                "start": start.isoformat(),
+                "nights": NIGHTS,
+                "rooms": [[r["room_id"], r["type"], r["floor"], r["runs"]] for r in rows],
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        samples.append((query_ms, (time.perf_counter() - started) * 1000))
+    samples.sort(key=lambda s: s[0] + s[1])
+    query_ms, json_ms = samples[len(samples) // 2]
+    runs = sum(len(r["runs"]) for r in rows)
+    print(f"rooms={len(rows)} nights={NIGHTS} runs={runs}")
+    print(f"query {query_ms:.1f} ms + json {json_ms:.1f} ms = {query_ms + json_ms:.1f} ms")
+    print(f"payload {len(body) / 1024:.0f} KiB, gzip {len(gzip.compress(body)) / 1024:.0f} KiB")
+    print(f"(cell-per-night grid would be {len(rows) * NIGHTS:,} cells)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Waitlist matching cost when a stay is canceled, with a long waitlist.
+
+Matching only reads waiting entries whose dates overlap the freed nights
+(partial GiST index on daterange(check_in, check_out)); the "scan" column
+forces a sequential scan of the waitlist for comparison.
+
+    BENCH_DATABASE_URL=... python benchmarks/bench_waitlist.py
+"""
+from datetime import date, timedelta
+
+from _seed import bench_db, reset, seed_base, seed_reservations, timed
+
+ROOMS = 1_000
+WAITLIST_SIZES = (10_000, 100_000)
+
+CANDIDATES = """
+    SELECT wait_id
+    FROM waitlist
+    WHERE status = 'waiting'
+      AND daterange(check_in, check_out) && daterange(%s, %s)
+      AND check_in >= CURRENT_DATE
+    ORDER BY created_at, wait_id
+    LIMIT 50
+"""
+
+
+def _seed(db, entries):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            emp_id = seed_base(cur, rooms=ROOMS, guests=5_000)
+            # fully booked for the next year, so entries stay waiting
+            seed_reservations(cur, emp_id, ROOMS * 182, status="active", start_offset=0, spread_days=365)
+            cur.execute(
+                """
+                INSERT INTO waitlist (guest_id, emp_id, check_in, check_out, room_type, rooms, num_people)
+                SELECT 1 + s % 5000, %s, CURRENT_DATE + 1 + s % 360, CURRENT_DATE + 3 + s % 360,
+                       (ARRAY['single','double','suite'])[1 + s % 3], 1, 1
+                FROM generate_series(1, %s) s
+                """,
+                (emp_id, entries),
+            )
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+    db.backfill_room_nights()
+
+
+def _plan(db, sql, params, seqscan=False):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            if seqscan:
+                cur.execute("SET LOCAL enable_indexscan = off; SET LOCAL enable_bitmapscan = off")
+            cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()["QUERY PLAN"][0]
+        conn.rollback()
+    finally:
+        db.put_connection(conn)
+    return plan["Execution Time"], plan["Plan"]
+
+
+def _node_types(node):
+    yield node["Node Type"]
+    for child in node.get("Plans", []):
+        yield from _node_types(child)
+
+
+def main():
+    db = bench_db()
+    window = (date.today() + timedelta(days=100), date.today() + timedelta(days=102))
+    print(f"{'waitlist':>9s} {'candidates ms':>14s} {'scan ms':>9s} {'match on cancel ms':>19s}  plan")
+    for entries in WAITLIST_SIZES:
+        _seed(db, entries)
+        indexed_ms, plan = _plan(db, CANDIDATES, window)
+        scan_ms, _ = _plan(db, CANDIDATES, window, seqscan=True)
+        match_ms = timed(lambda: db.match_waitlist(*window, room_ids=[7]), repeat=10)
+        nodes = ", ".join(dict.fromkeys(_node_types(plan)))
+        print(f"{entries:9d} {indexed_ms:14.2f} {scan_ms:9.2f} {match_ms:19.2f}  {nodes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Before/after EXPLAIN ANALYZE for the hot query paths.
+
+Runs every query below with EXPLAIN (ANALYZE, BUFFERS), applies pending
+migrations (python migrations.py), then runs them again and prints the
+plan root, scanned relations and execution time side by side.
+
+Usage:
+    DATABASE_URL=... python benchmarks/explain_hot_queries.py
+    DATABASE_URL=... python benchmarks/explain_hot_queries.py --no-apply   # current plans only
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import db
+from migrations import run_migrations
+
+HOT_QUERIES = {
+    "list_active_reservations": (
+        """
+        SELECT r.res_id, r.guest_id, g.name, g.family, r.emp_id, e.username,
+               r.check_in, r.check_out, r.num_people, r.status, r.total_cost, r.payment, r.discount
+        FROM reservation r
+        JOIN guest g ON g.guest_id = r.guest_id
+        JOIN employee e ON e.emp_id = r.emp_id
+        WHERE r.status = 'active'
+        ORDER BY r.res_id DESC
+        LIMIT %s
+        """,
+        (200,),
+    ),
+    "get_cleaning_rooms": (
+        """
+        SELECT room_id, type, floor, bed_type, capacity, price, features
+        FROM room
+        WHERE status = 'cleaning'
+        ORDER BY floor, room_id
+        LIMIT %s
+        """,
+        (50,),
+    ),
+    "get_available_rooms": (
+        """
+        SELECT room_id, type, capacity, price, floor, bed_type, smoking, status
+        FROM room
+        WHERE status = 'available'
+        ORDER BY room_id
+        LIMIT %s
+        """,
+        (200,),
+    ),
+    "stats_active_reservations": (
+        "SELECT COUNT(*) AS c FROM reservation WHERE status = 'active'",
+        None,
+    ),
+    "stats_occupied_rooms": (
+        """
+        SELECT COUNT(DISTINCT rr.room_id) AS c
+        FROM reservation_room rr
+        JOIN reservation r ON r.res_id = rr.res_id
+        WHERE r.status = 'active'
+        """,
+        None,
+    ),
+    "guest_reservations": (
+        "SELECT res_id FROM reservation WHERE guest_id = %s",
+        (1,),
+    ),
+    "room_reservations": (
+        "SELECT res_id FROM reservation_room WHERE room_id = %s",
+        (101,),
+    ),
+    "guest_by_family": (
+        "SELECT guest_id FROM guest WHERE family = %s AND name = %s",
+        ("Ahmadi", "Ali"),
+    ),
+}
+
+
+def _relations(plan, out):
+    if "Relation Name" in plan or "Index Name" in plan:
+        out.append(f"{plan['Node Type']}({plan.get('Index Name') or plan.get('Relation Name')})")
+    for child in plan.get("Plans", []):
+        _relations(child, out)
+    return out
+
+
+def explain_all():
+    results = {}
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            for name, (sql, params) in HOT_QUERIES.items():
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+                row = cur.fetchone()
+                doc = row["QUERY PLAN"][0] if isinstance(row["QUERY PLAN"], list) else json.loads(row["QUERY PLAN"])[0]
+                results[name] = {
+                    "ms": doc["Execution Time"],
+                    "scans": ", ".join(_relations(doc["Plan"], [])),
+                }
+        conn.rollback()
+    finally:
+        db.put_connection(conn)
+    return results
+
+
+def main():
+    before = explain_all()
+    if "--no-apply" in sys.argv:
+        for name, r in before.items():
+            print(f"{name:28s} {r['ms']:9.3f} ms  {r['scans']}")
+        return
+
+    run_migrations(db)
+    after = explain_all()
+
+    print(f"{'query':28s} {'before ms':>10s} {'after ms':>10s}  plan after")
+    for name in HOT_QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name:28s} {b['ms']:10.3f} {a['ms']:10.3f}  {a['scans']}")
+        print(f"{'':28s} {'':>10s} {'':>10s}  (before: {b['scans']})")
+
+
+if __name__ == "__main__":
+    main()
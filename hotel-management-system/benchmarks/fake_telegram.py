@@ -0,0 +1,185 @@
+"""
+Fake Telegram Bot API for exercising notifier.py offline.
+
+The server answers sendMessage like Telegram does, including its limits:
+429 with retry_after when a chat gets more than one message per second or
+the bot more than 30 per second, and 403 for chat ids listed as blocked.
+
+    python benchmarks/fake_telegram.py            # SendQueue only, no database
+    BENCH_DATABASE_URL=... python benchmarks/fake_telegram.py --db
+                                                  # triggers -> LISTEN -> queue -> fake API
+
+Point a real bot at it with TELEGRAM_API_URL=http://127.0.0.1:8081.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+PORT = int(os.environ.get("FAKE_TELEGRAM_PORT", "8081"))
+BLOCKED_CHATS = {403}
+
+
+class FakeTelegram(ThreadingHTTPServer):
+    def __init__(self, port=PORT):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.lock = threading.Lock()
+        self.delivered = []  # (monotonic, chat_id, text)
+        self.rejected_429 = 0
+        self.rejected_403 = 0
+        self._last_per_chat = {}
+        self._recent = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def accept(self, chat_id, text):
+        """(status, body) for one sendMessage."""
+        now = time.monotonic()
+        with self.lock:
+            if chat_id in BLOCKED_CHATS:
+                self.rejected_403 += 1
+                return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            if len(self._recent) >= 30 or now - self._last_per_chat.get(chat_id, -10.0) < 1.0:
+                self.rejected_429 += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                }
+            self._recent.append(now)
+            self._last_per_chat[chat_id] = now
+            self.delivered.append((now, chat_id, text))
+            return 200, {
+                "ok": True,
+                "result": {"message_id": len(self.delivered), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}, "text": text},
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update({k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()})
+        if url.path.endswith("/sendMessage"):
+            status, body = self.server.accept(int(params["chat_id"]), params.get("text", ""))
+        else:
+            status, body = 200, {"ok": True, "result": True}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _report(server, queue, started):
+    elapsed = time.monotonic() - started
+    per_chat_gap = {}
+    last = {}
+    for t, chat_id, _ in server.delivered:
+        if chat_id in last:
+            per_chat_gap[chat_id] = min(per_chat_gap.get(chat_id, 99.0), t - last[chat_id])
+        last[chat_id] = t
+    print(f"delivered {len(server.delivered)} in {elapsed:.1f}s, 429s {server.rejected_429}, 403s {server.rejected_403}")
+    print(f"min gap between messages to one chat: {min(per_chat_gap.values(), default=0):.2f}s")
+    print(f"queue metrics: {queue.metrics}")
+
+
+def _wait_drained(queue, timeout=120):
+    deadline = time.monotonic() + timeout
+    while queue.pending() and time.monotonic() < deadline:
+        time.sleep(0.2)
+    time.sleep(0.5)
+
+
+def run_queue_only(server, bot):
+    from notifier import SendQueue
+
+    blocked = []
+    queue = SendQueue(lambda chat_id, text: bot.send_message(chat_id, text), on_blocked=blocked.append)
+    started = time.monotonic()
+    # 40 chats x 5 messages + one blocked chat
+    for i in range(5):
+        for chat_id in range(1000, 1040):
+            queue.put(chat_id, f"message {i}")
+    queue.put(403, "to a blocked chat")
+    queue.start_in_background()
+    _wait_drained(queue)
+    queue.stop()
+    _report(server, queue, started)
+    print(f"blocked chats reported: {blocked}")
+
+
+def run_with_database(server, bot):
+    from _seed import bench_db, reset, seed_base
+
+    from notifier import Notifier
+
+    db = bench_db()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+            seed_base(cur, rooms=200, guests=10)
+            cur.execute("DELETE FROM bot_subscription")
+            cur.execute(
+                """
+                INSERT INTO bot_subscription (chat_id, event)
+                SELECT c, 'room_cleaning' FROM generate_series(2000, 2019) c
+                """
+            )
+        conn.commit()
+    finally:
+        db.put_connection(conn)
+
+    notifier = Notifier(db, lambda chat_id, text: bot.send_message(chat_id, text), coalesce_seconds=0.5)
+    notifier.start_in_background()
+    time.sleep(1.0)  # let LISTEN start
+    started = time.monotonic()
+    # three bursts of rooms going to cleaning -> a few coalesced messages per chat
+    for burst in range(3):
+        db.execute(
+            "UPDATE room SET status = 'cleaning' WHERE room_id BETWEEN %s AND %s",
+            (burst * 50 + 1, burst * 50 + 50),
+        )
+        time.sleep(0.7)
+    time.sleep(1.0)
+    _wait_drained(notifier.queue)
+    notifier.stop()
+    print(f"notifier metrics: {notifier.metrics}")
+    _report(server, notifier.queue, started)
+
+
+def main():
+    import telebot
+    from telebot import apihelper
+
+    server = FakeTelegram()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    apihelper.API_URL = server.url + "/bot{0}/{1}"
+    bot = telebot.TeleBot("123:fake")
+    try:
+        if "--db" in sys.argv:
+            run_with_database(server, bot)
+        else:
+            run_queue_only(server, bot)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Check read-replica routing against two local PostgreSQL instances.
+
+Start a second server (a streaming standby of the first, or for a quick
+smoke test any server with the same schema), then:
+
+    DATABASE_URL=postgresql://localhost:5432/hotel \\
+    DATABASE_REPLICA_URLS=postgresql://localhost:5433/hotel \\
+    python benchmarks/replica_routing.py
+
+Prints which server (port) answered each kind of call and how long reads
+took on each.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from _seed import timed
+from database import db
+
+WHO = "SELECT inet_server_port() AS port, pg_is_in_recovery() AS standby"
+
+
+def who(readonly):
+    r = db.execute(WHO, fetchone=True, readonly=readonly)
+    return f"port {r['port']} ({'standby' if r['standby'] else 'primary'})"
+
+
+def main():
+    if not db.replica_urls:
+        raise SystemExit("DATABASE_REPLICA_URLS is not set")
+
+    print(f"write path             -> {who(readonly=False)}")
+    print(f"read path              -> {who(readonly=True)}")
+    with db.pinned_to_primary():
+        print(f"read, pinned           -> {who(readonly=True)}")
+
+    max_lag = db.replica_max_lag
+    db.replica_max_lag = -1  # every replica now counts as lagging
+    for state in db._replica_state.values():
+        state["checked"] = 0.0
+    print(f"read, replica lagging  -> {who(readonly=True)}")
+    db.replica_max_lag = max_lag
+    for state in db._replica_state.values():
+        state["checked"] = 0.0
+
+    print(f"get_stats on replica   {timed(db.get_stats):8.2f} ms")
+    with db.pinned_to_primary():
+        print(f"get_stats on primary   {timed(db.get_stats):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,82 @@
 import os
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-import psycopg2
 from psycopg2 import Error
-from psycopg2.extras import RealDictCursor
 import telebot
-from telebot import types
+from telebot import apihelper, types
+from telebot.apihelper import ApiTelegramException
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from database import db
+from notifier import EVENTS, Notifier
+from profiling import profiled
+from sessions import LOGIN_STEP_TTL_SECONDS, make_session_store
+
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
-DB_URI = os.environ.get("DB_URI")
 
 
-ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
-ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin123")
+DASHBOARD_URL = os.environ.get("DASHBOARD_URL", "").strip()
 
+# how long a rendered listing page is reused when paging back and forth
+PAGE_CACHE_SECONDS = int(os.environ.get("BOT_PAGE_CACHE_SECONDS", "30"))
 
-DASHBOARD_URL = os.environ.get("DASHBOARD_URL", "").strip()
+TELEGRAM_TEXT_LIMIT = 4096
+
+NOTIFICATIONS_ENABLED = os.environ.get("NOTIFICATIONS_ENABLED", "1") == "1"
+
+# log "[tap] ..." timings for every handler call (benchmarks, debugging)
+TAP_TIMING = os.environ.get("BOT_TAP_TIMING", "0") == "1"
+
+# e.g. http://localhost:8081 for benchmarks/fake_telegram.py
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "").strip()
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL.rstrip("/") + "/bot{0}/{1}"
 
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN is not set in .env")
-if not DB_URI:
-    raise ValueError("DB_URI is not set in .env")
 
 bot = telebot.TeleBot(BOT_TOKEN, parse_mode=None)
 
+# chat_id -> session, shared across bot processes (see sessions.py)
+sessions = make_session_store(db)
 
-user_sessions = {}
-_temp = {} =
 
-def get_db_connection():
-    try:
-        return psycopg2.connect(DB_URI, cursor_factory=RealDictCursor)
-    except Error as e:
-        print(f"DB connection error: {e}")
-        return None
+def timed_tap(func):
+    """
+    Profile sampled taps; with BOT_TAP_TIMING=1 also log DB time and connection
+    borrows of every handler call (one tap).
+    """
+    handler = profiled(func, database=db)
+    if not TAP_TIMING:
+        return handler
+
+    @wraps(func)
+    def wrapper(message, *args, **kwargs):
+        db.take_thread_metrics()
+        started = time.perf_counter()
+        try:
+            return handler(message, *args, **kwargs)
+        finally:
+            total_ms = (time.perf_counter() - started) * 1000
+            db_ms, borrows = db.take_thread_metrics()
+            print(
+                f"[tap] {func.__name__}: {total_ms:.1f} ms total, {db_ms:.1f} ms db, "
+                f"{borrows} borrows, {db.metrics['connections_opened']} connections opened so far"
+            )
+
+    return wrapper
 
 def check_login(chat_id: int) -> bool:
-    return bool(user_sessions.get(chat_id, False))
+    try:
+        session = sessions.get(chat_id)
+    except Error as e:
+        print(f"session error: {e}")
+        return False
+    return bool(session and session.get("emp_id"))
 
 def login_required(func):
     @wraps(func)
@@ -64,6 +102,7 @@ def main_menu():
         types.KeyboardButton("🧹 اتاق‌های Cleaning"),
         types.KeyboardButton("🧾 رزروهای Active"),
         types.KeyboardButton("🚪 اتاق‌های Available"),
+        types.KeyboardButton("🔔 اعلان‌ها"),
     )
     if DASHBOARD_URL:
         markup.add(types.KeyboardButton("🔗 لینک داشبورد"))
@@ -80,122 +119,35 @@ def db_get_stats():
       occupied_rooms (status='occupied')
       active_reservations (reservation.status='active')
     """
-    conn = get_db_connection()
-    if not conn:
-        return None
-
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) AS c FROM room")
-            total_rooms = cur.fetchone()["c"]
-
-            cur.execute("SELECT COUNT(*) AS c FROM room WHERE status='available'")
-            available_rooms = cur.fetchone()["c"]
-
-            cur.execute("SELECT COUNT(*) AS c FROM room WHERE status='cleaning'")
-            cleaning_rooms = cur.fetchone()["c"]
-
-            cur.execute("SELECT COUNT(*) AS c FROM room WHERE status='reserved'")
-            reserved_rooms = cur.fetchone()["c"]
-
-            cur.execute("SELECT COUNT(*) AS c FROM room WHERE status='occupied'")
-            occupied_rooms = cur.fetchone()["c"]
-
-            cur.execute("SELECT COUNT(*) AS c FROM reservation WHERE status='active'")
-            active_reservations = cur.fetchone()["c"]
-
-        return {
-            "total_rooms": total_rooms,
-            "available_rooms": available_rooms,
-            "cleaning_rooms": cleaning_rooms,
-            "reserved_rooms": reserved_rooms,
-            "occupied_rooms": occupied_rooms,
-            "active_reservations": active_reservations,
-        }
-
+        return db.get_room_status_counts()
     except Error as e:
         print(f"stats error: {e}")
         return None
-    finally:
-        conn.close()
 
 
-def db_get_cleaning_rooms(limit=30):
-    conn = get_db_connection()
-    if not conn:
-        return None
+def db_get_cleaning_rooms(limit=30, after=None):
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT room_id, type, floor, bed_type, capacity
-                FROM room
-                WHERE status='cleaning'
-                ORDER BY floor, room_id
-                LIMIT %s
-                """,
-                (limit,),
-            )
-            return cur.fetchall()
+        return db.get_cleaning_rooms(limit=limit, after=after)
     except Error as e:
         print(f"cleaning rooms error: {e}")
         return None
-    finally:
-        conn.close()
 
 
-def db_get_available_rooms(limit=30):
-    conn = get_db_connection()
-    if not conn:
-        return None
+def db_get_available_rooms(limit=30, after_room_id=None):
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT room_id, type, floor, bed_type, capacity, price
-                FROM room
-                WHERE status='available'
-                ORDER BY floor, room_id
-                LIMIT %s
-                """,
-                (limit,),
-            )
-            return cur.fetchall()
+        return db.get_available_rooms(limit=limit, after_room_id=after_room_id)
     except Error as e:
         print(f"available rooms error: {e}")
         return None
-    finally:
-        conn.close()
 
 
-def db_get_active_reservations(limit=10):
-    conn = get_db_connection()
-    if not conn:
-        return None
+def db_get_active_reservations(limit=10, before_res_id=None):
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT r.res_id,
-                       r.check_in, r.check_out,
-                       g.name, g.family,
-                       COALESCE(ARRAY_AGG(rr.room_id ORDER BY rr.room_id), '{}') AS rooms
-                FROM reservation r
-                JOIN guest g ON g.guest_id = r.guest_id
-                LEFT JOIN reservation_room rr ON rr.res_id = r.res_id
-                WHERE r.status='active'
-                GROUP BY r.res_id, r.check_in, r.check_out, g.name, g.family
-                ORDER BY r.res_id DESC
-                LIMIT %s
-                """,
-                (limit,),
-            )
-            return cur.fetchall()
+        return db.list_active_reservations(limit=limit, before_res_id=before_res_id, with_rooms=True)
     except Error as e:
         print(f"active reservations error: {e}")
         return None
-    finally:
-        conn.close()
 
 @bot.message_handler(commands=["start", "login"])
 def start_command(message):
@@ -221,7 +173,7 @@ def ask_for_username(message):
 def process_username(message):
     chat_id = message.chat.id
     username = (message.text or "").strip()
-    _temp[chat_id] = {"username": username}
+    sessions.set(chat_id, {"pending_username": username}, ttl_seconds=LOGIN_STEP_TTL_SECONDS)
     msg = bot.send_message(chat_id, "رمز عبور را وارد کنید:")
     bot.register_next_step_handler(msg, process_password)
 
@@ -229,12 +181,27 @@ def process_username(message):
 def process_password(message):
     chat_id = message.chat.id
     password = (message.text or "").strip()
-    username = _temp.get(chat_id, {}).get("username", "")
-
-    if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
-        user_sessions[chat_id] = True
-        _temp.pop(chat_id, None)
-        bot.send_message(chat_id, "✅ ورود موفقیت‌آمیز بود.", reply_markup=main_menu())
+    try:
+        # keep the password out of the chat history
+        bot.delete_message(chat_id, message.message_id)
+    except Exception:
+        pass
+    pending = sessions.get(chat_id) or {}
+    username = pending.get("pending_username", "")
+
+    emp = db.authenticate_employee(username, password) if username and password else None
+    if emp:
+        sessions.set(
+            chat_id,
+            {
+                "emp_id": emp["emp_id"],
+                "username": emp["username"],
+                "name": emp.get("name"),
+                "family": emp.get("family"),
+                "access_level": emp.get("access_level", 1),
+            },
+        )
+        bot.send_message(chat_id, f"✅ ورود موفقیت‌آمیز بود. خوش آمدید {emp.get('name') or emp['username']}.", reply_markup=main_menu())
         send_welcome(message)
     else:
         bot.send_message(chat_id, "❌ نام کاربری یا رمز عبور اشتباه است.")
@@ -245,8 +212,9 @@ def process_password(message):
 @login_required
 def logout_command(message):
     chat_id = message.chat.id
-    user_sessions.pop(chat_id, None)
-    _temp.pop(chat_id, None)
+    sessions.delete(chat_id)
+    # no pushes to a chat nobody is logged in on
+    db.remove_subscriber(chat_id)
     bot.send_message(chat_id, "✅ با موفقیت خارج شدید.", reply_markup=login_menu())
 
 
@@ -261,6 +229,7 @@ def send_welcome(message):
 
 @bot.message_handler(func=lambda m: m.text == "📊 وضعیت سریع")
 @login_required
+@timed_tap
 def quick_status(message):
     stats = db_get_stats()
     if not stats:
@@ -279,65 +248,262 @@ def quick_status(message):
     bot.send_message(message.chat.id, text)
 
 
+class PageCache:
+    """
+    Per-chat cache of rendered listing pages (short TTL) plus the keyset
+    cursor each page number started at, so "previous" works without
+    re-walking the list. In-process only; a miss just re-queries.
+    """
+
+    def __init__(self, ttl_seconds=PAGE_CACHE_SECONDS, max_chats=2_000, pages_per_chat=30):
+        self.ttl_seconds = ttl_seconds
+        self.max_chats = max_chats
+        self.pages_per_chat = pages_per_chat
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _chat(self, chat_id):
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = self._chats[chat_id] = {"pages": OrderedDict(), "cursors": {}}
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        self._chats.move_to_end(chat_id)
+        return entry
+
+    def get(self, chat_id, key):
+        with self._lock:
+            hit = self._chat(chat_id)["pages"].get(key)
+            if hit is None or hit[0] <= time.monotonic():
+                return None
+            return hit[1]
+
+    def put(self, chat_id, key, value):
+        with self._lock:
+            pages = self._chat(chat_id)["pages"]
+            pages[key] = (time.monotonic() + self.ttl_seconds, value)
+            pages.move_to_end(key)
+            while len(pages) > self.pages_per_chat:
+                pages.popitem(last=False)
+
+    def remember_cursor(self, chat_id, kind, page, cursor):
+        with self._lock:
+            self._chat(chat_id)["cursors"][(kind, page)] = cursor
+
+    def cursor_for(self, chat_id, kind, page):
+        with self._lock:
+            return self._chat(chat_id)["cursors"].get((kind, page))
+
+
+page_cache = PageCache()
+
+
+def _cleaning_line(r):
+    return f"• اتاق {r['room_id']} | طبقه {r['floor']} | {r['type']} | تخت: {r['bed_type']} | ظرفیت: {r['capacity']}"
+
+
+def _available_line(r):
+    return (
+        f"• اتاق {r['room_id']} | طبقه {r['floor']} | {r['type']} | تخت: {r['bed_type']} | ظرفیت: {r['capacity']} | قیمت: {r['price']}"
+    )
+
+
+def _reservation_line(r):
+    rooms = r["rooms"] or []
+    rooms_txt = ", ".join(str(x) for x in rooms[:20]) if rooms else "-"
+    if len(rooms) > 20:
+        rooms_txt += f" (+{len(rooms) - 20})"
+    return (
+        f"• کد رزرو: {r['res_id']}\n"
+        f"  مهمان: {r['name']} {r['family']}\n"
+        f"  ورود: {r['check_in']} | خروج: {r['check_out']}\n"
+        f"  اتاق‌ها: {rooms_txt}\n"
+        f"  ─────────────"
+    )
+
+
+# kind (short, it goes into callback_data) -> how to fetch and render one page.
+# cursor: the keyset position after a row, as text; parse: text -> db argument
+LISTINGS = {
+    "cl": {
+        "title": "🧹 اتاق‌های در حال نظافت:",
+        "empty": "✅ هیچ اتاقی در حال نظافت نیست.",
+        "error": "⚠️ خطا در دریافت لیست از دیتابیس.",
+        "size": 15,
+        "fetch": lambda limit, after: db_get_cleaning_rooms(limit=limit, after=after),
+        "cursor": lambda r: f"{r['floor']}.{r['room_id']}",
+        "parse": lambda c: tuple(int(x) for x in c.split(".")),
+        "line": _cleaning_line,
+    },
+    "av": {
+        "title": "🚪 اتاق‌های available:",
+        "empty": "❌ هیچ اتاق available نیست.",
+        "error": "⚠️ خطا در دریافت اتاق‌ها از دیتابیس.",
+        "size": 15,
+        "fetch": lambda limit, after: db_get_available_rooms(limit=limit, after_room_id=after),
+        "cursor": lambda r: str(r["room_id"]),
+        "parse": int,
+        "line": _available_line,
+    },
+    "ar": {
+        "title": "🧾 رزروهای فعال:",
+        "empty": "✅ رزرو فعال نداریم.",
+        "error": "⚠️ خطا در دریافت رزروها از دیتابیس.",
+        "size": 5,
+        "fetch": lambda limit, after: db_get_active_reservations(limit=limit, before_res_id=after),
+        "cursor": lambda r: str(r["res_id"]),
+        "parse": int,
+        "line": _reservation_line,
+    },
+}
+
+
+def render_page(chat_id: int, kind: str, page: int, cursor: str):
+    """
+    (text, markup) for page `page` of a listing starting after `cursor`
+    ("" = from the start), or None on a database error.
+    """
+    spec = LISTINGS[kind]
+    cached = page_cache.get(chat_id, (kind, cursor))
+    if cached is None:
+        rows = spec["fetch"](spec["size"] + 1, spec["parse"](cursor) if cursor else None)
+        if rows is None:
+            return None
+        has_next = len(rows) > spec["size"]
+        rows = rows[: spec["size"]]
+        if not rows:
+            text = spec["empty"] if page == 0 else "— پایان لیست —"
+        else:
+            lines = [f"{spec['title']} (صفحه {page + 1})\n"] + [spec["line"](r) for r in rows]
+            # keep under Telegram's message limit; dropped rows move to the next page
+            while len("\n".join(lines)) > TELEGRAM_TEXT_LIMIT and len(rows) > 1:
+                rows.pop()
+                lines.pop()
+                has_next = True
+            text = "\n".join(lines)
+        cached = (text, spec["cursor"](rows[-1]) if has_next else None)
+        page_cache.put(chat_id, (kind, cursor), cached)
+    page_cache.remember_cursor(chat_id, kind, page, cursor)
+
+    text, next_cursor = cached
+    buttons = []
+    if page > 0:
+        prev_cursor = page_cache.cursor_for(chat_id, kind, page - 1)
+        if prev_cursor is None:
+            # trail forgotten (restart / other process): go back to the start
+            buttons.append(types.InlineKeyboardButton("▶️ ابتدا", callback_data=f"pg:{kind}:0:"))
+        else:
+            buttons.append(types.InlineKeyboardButton("▶️ قبلی", callback_data=f"pg:{kind}:{page - 1}:{prev_cursor}"))
+    if next_cursor is not None:
+        buttons.append(types.InlineKeyboardButton("بعدی ◀️", callback_data=f"pg:{kind}:{page + 1}:{next_cursor}"))
+    markup = None
+    if buttons:
+        markup = types.InlineKeyboardMarkup()
+        markup.row(*buttons)
+    return text, markup
+
+
+def send_listing(message, kind: str):
+    result = render_page(message.chat.id, kind, 0, "")
+    if result is None:
+        bot.send_message(message.chat.id, LISTINGS[kind]["error"])
+        return
+    text, markup = result
+    bot.send_message(message.chat.id, text, reply_markup=markup)
+
+
 @bot.message_handler(func=lambda m: m.text == "🧹 اتاق‌های Cleaning")
 @login_required
+@timed_tap
 def cleaning_rooms(message):
-    rows = db_get_cleaning_rooms(limit=40)
-    if rows is None:
-        bot.send_message(message.chat.id, "⚠️ خطا در دریافت لیست از دیتابیس.")
-        return
-    if not rows:
-        bot.send_message(message.chat.id, "✅ هیچ اتاقی در حال نظافت نیست.")
-        return
-
-    lines = ["🧹 اتاق‌های در حال نظافت:\n"]
-    for r in rows:
-        lines.append(f"• اتاق {r['room_id']} | طبقه {r['floor']} | {r['type']} | تخت: {r['bed_type']} | ظرفیت: {r['capacity']}")
-    bot.send_message(message.chat.id, "\n".join(lines))
+    send_listing(message, "cl")
 
 
 @bot.message_handler(func=lambda m: m.text == "🧾 رزروهای Active")
 @login_required
+@timed_tap
 def active_reservations(message):
-    rows = db_get_active_reservations(limit=10)
-    if rows is None:
-        bot.send_message(message.chat.id, "⚠️ خطا در دریافت رزروها از دیتابیس.")
-        return
-    if not rows:
-        bot.send_message(message.chat.id, "✅ رزرو فعال نداریم.")
-        return
-
-    lines = ["🧾 رزروهای فعال:\n"]
-    for r in rows:
-        rooms = r["rooms"] or []
-        rooms_txt = ", ".join(str(x) for x in rooms) if rooms else "-"
-        lines.append(
-            f"• کد رزرو: {r['res_id']}\n"
-            f"  مهمان: {r['name']} {r['family']}\n"
-            f"  ورود: {r['check_in']} | خروج: {r['check_out']}\n"
-            f"  اتاق‌ها: {rooms_txt}\n"
-            f"  ─────────────"
-        )
-    bot.send_message(message.chat.id, "\n".join(lines))
+    send_listing(message, "ar")
 
 
 @bot.message_handler(func=lambda m: m.text == "🚪 اتاق‌های Available")
 @login_required
+@timed_tap
 def available_rooms(message):
-    rows = db_get_available_rooms(limit=40)
-    if rows is None:
-        bot.send_message(message.chat.id, "⚠️ خطا در دریافت اتاق‌ها از دیتابیس.")
+    send_listing(message, "av")
+
+
+@bot.callback_query_handler(func=lambda c: (c.data or "").startswith("pg:"))
+@timed_tap
+def page_callback(call):
+    chat_id = call.message.chat.id
+    if not check_login(chat_id):
+        bot.answer_callback_query(call.id, "🔒 لطفاً ابتدا وارد سیستم شوید.")
         return
-    if not rows:
-        bot.send_message(message.chat.id, "❌ هیچ اتاق available نیست.")
+    try:
+        _, kind, page, cursor = call.data.split(":", 3)
+        page = int(page)
+        if kind not in LISTINGS or (cursor and LISTINGS[kind]["parse"](cursor) is None):
+            raise ValueError(call.data)
+    except ValueError:
+        bot.answer_callback_query(call.id)
         return
 
-    lines = ["🚪 اتاق‌های available:\n"]
-    for r in rows:
-        lines.append(
-            f"• اتاق {r['room_id']} | طبقه {r['floor']} | {r['type']} | تخت: {r['bed_type']} | ظرفیت: {r['capacity']} | قیمت: {r['price']}"
-        )
-    bot.send_message(message.chat.id, "\n".join(lines))
+    result = render_page(chat_id, kind, page, cursor)
+    if result is None:
+        bot.answer_callback_query(call.id, LISTINGS[kind]["error"])
+        return
+    text, markup = result
+    try:
+        bot.edit_message_text(text, chat_id, call.message.message_id, reply_markup=markup)
+    except ApiTelegramException as e:
+        # same page tapped twice
+        if "message is not modified" not in e.description:
+            raise
+    bot.answer_callback_query(call.id)
+
+
+def subscriptions_markup(chat_id: int):
+    subscribed = db.get_subscriptions(chat_id)
+    markup = types.InlineKeyboardMarkup(row_width=1)
+    for event, title in EVENTS.items():
+        mark = "✅" if event in subscribed else "⬜"
+        markup.add(types.InlineKeyboardButton(f"{mark} {title}", callback_data=f"sub:{event}"))
+    return markup
+
+
+@bot.message_handler(commands=["subscribe"])
+@bot.message_handler(func=lambda m: m.text == "🔔 اعلان‌ها")
+@login_required
+def subscriptions(message):
+    try:
+        markup = subscriptions_markup(message.chat.id)
+    except Error as e:
+        print(f"subscriptions error: {e}")
+        bot.send_message(message.chat.id, "⚠️ خطا در اتصال به دیتابیس.")
+        return
+    bot.send_message(message.chat.id, "🔔 برای کدام رویدادها پیام بگیرید؟", reply_markup=markup)
+
+
+@bot.callback_query_handler(func=lambda c: (c.data or "").startswith("sub:"))
+def toggle_subscription(call):
+    chat_id = call.message.chat.id
+    if not check_login(chat_id):
+        bot.answer_callback_query(call.id, "🔒 لطفاً ابتدا وارد سیستم شوید.")
+        return
+    event = call.data.split(":", 1)[1]
+    if event not in EVENTS:
+        bot.answer_callback_query(call.id)
+        return
+    try:
+        enabled = event not in db.get_subscriptions(chat_id)
+        db.set_subscription(chat_id, event, enabled)
+        bot.edit_message_reply_markup(chat_id, call.message.message_id, reply_markup=subscriptions_markup(chat_id))
+    except Error as e:
+        print(f"subscription toggle error: {e}")
+        bot.answer_callback_query(call.id, "⚠️ خطا در اتصال به دیتابیس.")
+        return
+    bot.answer_callback_query(call.id, "✅ فعال شد" if enabled else "⛔ غیرفعال شد")
 
 
 @bot.message_handler(func=lambda m: m.text == "🔗 لینک داشبورد")
@@ -351,6 +517,8 @@ def dashboard_link(message):
 
 def run_bot():
     print("Saba Hotel bot is running ...")
+    if NOTIFICATIONS_ENABLED:
+        Notifier(db, lambda chat_id, text: bot.send_message(chat_id, text)).start_in_background()
     bot.infinity_polling()
 
 
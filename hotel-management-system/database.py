@@ -1,11 +1,116 @@
 import os
+import threading
+from contextlib import contextmanager
 import psycopg2
-from psycopg2 import Error
-from psycopg2.extras import RealDictCursor
-from datetime import date
+from psycopg2 import Error, sql
+from psycopg2.extras import Json, NamedTupleCursor, RealDictCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from datetime import date, timedelta
+from decimal import Decimal
 import hashlib
+import re
+import time
 import binascii
 
+from queries import active_reservations_page, attach_reservation_rooms
+
+# column -> SQL array type for the bulk (unnest) writes below
+GUEST_COLUMNS = {
+    "name": "varchar", "family": "varchar", "national_id": "varchar",
+    "passport": "varchar", "birthdate": "date", "email": "varchar",
+}
+ROOM_COLUMNS = {
+    "type": "varchar", "capacity": "int", "price": "numeric", "features": "varchar",
+    "floor": "int", "bed_type": "varchar", "smoking": "boolean", "status": "varchar",
+}
+
+
+# statements that change rows; a SELECT without them leaves the cache alone
+_WRITE_RE = re.compile(rb"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE)\b", re.IGNORECASE)
+
+
+class _RowAccess:
+    """
+    Mapping-style reads on top of a namedtuple row, so row["name"], row.get(),
+    "name" in row and row.keys() keep working where templates and handlers
+    expect a dict. Only column names count as keys, never tuple methods.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return tuple.__getitem__(self, self._fields.index(key))
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key not in self._fields:
+            return default
+        return tuple.__getitem__(self, self._fields.index(key))
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def keys(self):
+        return self._fields
+
+    def items(self):
+        return zip(self._fields, self)
+
+
+class CompactCursor(NamedTupleCursor):
+    """
+    Rows as tuples with one class per query shape (cached by psycopg2 on the
+    column names) instead of one dict per row. Rows are read-only.
+    """
+
+    @classmethod
+    def _do_make_nt(cls, key):
+        nt = super()._do_make_nt(key)
+        return type("Row", (_RowAccess, nt), {"__slots__": ()})
+
+
+class IdempotencyKeyReused(ValueError):
+    """An idempotency key came back with a different request than the one it was first used for."""
+
+
+class _CountingPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that reports every new server connection it opens.
+    When all maxconn connections are out, getconn() waits up to `timeout`
+    seconds for one to come back instead of raising PoolError at once.
+    """
+
+    def __init__(self, *args, on_connect=None, timeout=30.0, **kwargs):
+        self._on_connect = on_connect
+        self._timeout = timeout
+        self._returned = threading.Condition()
+        super().__init__(*args, **kwargs)
+
+    def _connect(self, key=None):
+        if self._on_connect:
+            self._on_connect()
+        return super()._connect(key)
+
+    def getconn(self, key=None):
+        deadline = time.monotonic() + self._timeout
+        with self._returned:
+            while True:
+                try:
+                    return super().getconn(key)
+                except PoolError:
+                    remaining = deadline - time.monotonic()
+                    if self.closed or remaining <= 0:
+                        raise
+                    self._returned.wait(remaining)
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        with self._returned:
+            self._returned.notify()
+
 
 class Database:
     """
@@ -18,18 +123,325 @@ class Database:
     """
 
     def __init__(self):
-        self.db_url = os.environ.get("DATABASE_URL")
+        # DB_URI is the bot's old name for the same setting
+        self.db_url = os.environ.get("DATABASE_URL") or os.environ.get("DB_URI")
         if not self.db_url:
             raise ValueError("DATABASE_URL environment variable is not set")
+        self.pool_min = int(os.environ.get("DB_POOL_MIN", "1"))
+        self.pool_max = int(os.environ.get("DB_POOL_MAX", "10"))
+        # seconds a borrow waits for a free connection once DB_POOL_MAX are out
+        self.pool_timeout = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", "30"))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+        # read replicas: read-only methods go here when lag allows
+        self.replica_urls = [u.strip() for u in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+        self.replica_max_lag = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "5"))
+        self.replica_check_interval = float(os.environ.get("REPLICA_CHECK_SECONDS", "2"))
+        self._replica_pools = {}
+        self._replica_state = {url: {"lag": None, "checked": 0.0, "down_until": 0.0} for url in self.replica_urls}
+        self._replica_rr = 0
+        self._owners = {}
+        self._local = threading.local()
+
+        # short-lived cache for dashboard/bot aggregates, cleared on every write
+        self.cache_ttl = float(os.environ.get("STATS_CACHE_SECONDS", "5"))
+        self._cache = {}
+
+        # how long a retried write with the same idempotency key replays its first result
+        self.idempotency_ttl_hours = float(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+
+        # fn(change) called after room_night changes commit (availability.py);
+        # freed nights are offered to the waitlist first
+        self._inventory_listeners = [self._match_waitlist_on_release]
+
+        # process-wide counters; per-thread DB time is in take_thread_metrics()
+        self.metrics = {"connections_opened": 0, "borrows": 0, "db_ms": 0.0, "cache_hits": 0, "cache_misses": 0}
+
+    def _new_pool(self, url):
+        return _CountingPool(
+            self.pool_min,
+            self.pool_max,
+            url,
+            cursor_factory=RealDictCursor,
+            on_connect=self._count_connect,
+            timeout=self.pool_timeout,
+        )
 
-    def get_connection(self):
-        """Create a DB connection (dict rows)."""
+    def _count_connect(self):
+        self.metrics["connections_opened"] += 1
+
+    def _get_pool(self):
+        """Open the connection pool on first use (never at import time)."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = self._new_pool(self.db_url)
+        return self._pool
+
+    def _get_replica_pool(self, url):
+        pool = self._replica_pools.get(url)
+        if pool is None:
+            with self._pool_lock:
+                pool = self._replica_pools.get(url)
+                if pool is None:
+                    pool = self._replica_pools[url] = self._new_pool(url)
+        return pool
+
+    @contextmanager
+    def pinned_to_primary(self):
+        """Send every read in this thread to the primary while the block runs (read-your-writes)."""
+        self._local.pin_depth = getattr(self._local, "pin_depth", 0) + 1
         try:
-            return psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
+            yield self
+        finally:
+            self._local.pin_depth -= 1
+
+    def _reads_pinned(self) -> bool:
+        return getattr(self._local, "pin_depth", 0) > 0
+
+    def _replica_lag(self, url, conn) -> float:
+        """Seconds behind the primary (0 for a caught-up or non-standby server), cached briefly."""
+        state = self._replica_state[url]
+        now = time.monotonic()
+        if state["lag"] is None or now - state["checked"] > self.replica_check_interval:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT CASE
+                             WHEN NOT pg_is_in_recovery() THEN 0
+                             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                           END AS lag
+                    """
+                )
+                state["lag"] = float(cur.fetchone()["lag"])
+            conn.rollback()
+            state["checked"] = now
+        return state["lag"]
+
+    def _get_replica_connection(self):
+        """A connection to a healthy, caught-up replica, or None to fall back to the primary."""
+        n = len(self.replica_urls)
+        for i in range(n):
+            url = self.replica_urls[(self._replica_rr + i) % n]
+            state = self._replica_state[url]
+            if state["down_until"] > time.monotonic():
+                continue
+            pool = None
+            conn = None
+            try:
+                pool = self._get_replica_pool(url)
+                conn = pool.getconn()
+                if conn.closed:
+                    pool.putconn(conn, close=True)
+                    conn = pool.getconn()
+                if self._replica_lag(url, conn) > self.replica_max_lag:
+                    pool.putconn(conn)
+                    continue
+            except Error as e:
+                print(f"Replica unavailable, using primary: {e}")
+                state["down_until"] = time.monotonic() + 30
+                if conn is not None:
+                    pool.putconn(conn, close=True)
+                continue
+            self._replica_rr = (self._replica_rr + i + 1) % n
+            self._owners[id(conn)] = pool
+            return self._borrowed(conn)
+        return None
+
+    def _borrowed(self, conn):
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = {}
+        held[id(conn)] = time.perf_counter()
+        self.metrics["borrows"] += 1
+        self._local.borrows = getattr(self._local, "borrows", 0) + 1
+        return conn
+
+    def thread_metrics(self):
+        """(db_ms, borrows) for the calling thread since its last take_thread_metrics(), without a reset."""
+        return getattr(self._local, "db_ms", 0.0), getattr(self._local, "borrows", 0)
+
+    def take_thread_metrics(self):
+        """
+        (db_ms, borrows) for the calling thread since its previous call, then reset.
+        db_ms is time connections were held, i.e. DB round trips plus row building.
+        """
+        ms, borrows = self.thread_metrics()
+        self._local.db_ms = 0.0
+        self._local.borrows = 0
+        return ms, borrows
+
+    def get_connection(self, readonly=False):
+        """
+        Borrow a pooled DB connection (dict rows). Give it back with put_connection().
+        readonly=True may be served by a replica unless reads are pinned to the primary.
+        """
+        if readonly and self.replica_urls and not self._reads_pinned():
+            conn = self._get_replica_connection()
+            if conn is not None:
+                return conn
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            if conn.closed:
+                # server dropped it while idle in the pool
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            return self._borrowed(conn)
         except Error as e:
             print(f"Error connecting to database: {e}")
             raise
 
+    def put_connection(self, conn):
+        """Return a connection borrowed with get_connection() to its pool."""
+        started = getattr(self._local, "held", {}).pop(id(conn), None)
+        if started is not None:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._local.db_ms = getattr(self._local, "db_ms", 0.0) + elapsed_ms
+            self.metrics["db_ms"] += elapsed_ms
+        pool = self._owners.pop(id(conn), None) or self._pool
+        if pool is None:
+            conn.close()
+            return
+        pool.putconn(conn, close=bool(conn.closed))
+
+    def close(self):
+        """Close every pooled connection (used on shutdown)."""
+        for pool in [self._pool, *self._replica_pools.values()]:
+            if pool is not None:
+                pool.closeall()
+        self._pool = None
+        self._replica_pools = {}
+
+    def _cached(self, key, load):
+        if self.cache_ttl <= 0:
+            return load()
+        now = time.monotonic()
+        hit = self._cache.get(key)
+        if hit is not None and hit[0] > now:
+            self.metrics["cache_hits"] += 1
+            return hit[1]
+        self.metrics["cache_misses"] += 1
+        value = load()
+        if value is not None:
+            self._cache[key] = (now + self.cache_ttl, value)
+        return value
+
+    def invalidate_cache(self):
+        self._cache.clear()
+
+    def add_inventory_listener(self, fn):
+        """
+        Call fn(change) after this process commits a room_night change, where
+        change = {"before": version, "after": version, "claimed": [(room_id, night)],
+        "released": [(room_id, night)]} and versions are inventory_version values.
+        """
+        self._inventory_listeners.append(fn)
+
+    def _lock_inventory_version(self, cur):
+        """Serialize with other inventory writers; returns the version before our change."""
+        cur.execute("SELECT version FROM inventory_version WHERE id = 1 FOR UPDATE")
+        row = cur.fetchone()
+        return row["version"] if row else None
+
+    def _inventory_changed(self, cur, before, claimed=(), released=()):
+        """Read the version our statements produced; returns the change to publish after commit."""
+        cur.execute("SELECT version FROM inventory_version WHERE id = 1")
+        row = cur.fetchone()
+        return {
+            "before": before,
+            "after": row["version"] if row else None,
+            "claimed": list(claimed),
+            "released": list(released),
+        }
+
+    def _publish_inventory_change(self, change):
+        for fn in list(self._inventory_listeners):
+            try:
+                fn(change)
+            except Exception as e:
+                print(f"inventory listener error: {e}")
+
+    def get_inventory_version(self):
+        # from the primary: a lagging replica would hide a change from availability.py
+        with self.pinned_to_primary():
+            row = self.execute("SELECT version FROM inventory_version WHERE id = 1", fetchone=True, readonly=True)
+        return row["version"] if row else None
+
+    @staticmethod
+    def request_hash(*parts) -> str:
+        """Fingerprint of a write request, kept with its idempotency key."""
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+    def get_idempotent_result(self, scope: str, key: str, request_hash=None):
+        """
+        Result stored by an earlier write with this key, or None (one primary
+        key lookup). Lets callers answer a replay before doing any work.
+        """
+        row = self.execute(
+            """
+            SELECT request_hash, result
+            FROM idempotency_key
+            WHERE scope = %s AND key = %s AND expires_at > NOW()
+            """,
+            (scope, key),
+            fetchone=True,
+            readonly=True,
+        )
+        if not row:
+            return None
+        if request_hash and row["request_hash"] != request_hash:
+            raise IdempotencyKeyReused(f"idempotency key {key} was used for a different request")
+        return row["result"]
+
+    def _claim_idempotency_key(self, cur, scope: str, key: str, request_hash):
+        """
+        First statement of a write transaction that carries an idempotency key.
+        Returns None when the key is new (the write goes ahead and
+        _store_idempotent_result saves its result before the commit), else the
+        stored row of the earlier write. A concurrent write with the same key
+        waits on the insert until that one commits or rolls back, so the key
+        exists exactly when its write committed.
+        """
+        cur.execute(
+            """
+            INSERT INTO idempotency_key (scope, key, request_hash, expires_at)
+            VALUES (%s, %s, %s, NOW() + %s * interval '1 hour')
+            ON CONFLICT (scope, key) DO UPDATE
+            SET request_hash = EXCLUDED.request_hash, result = NULL,
+                created_at = NOW(), expires_at = EXCLUDED.expires_at
+            WHERE idempotency_key.expires_at <= NOW()
+            RETURNING key
+            """,
+            (scope, key, request_hash, self.idempotency_ttl_hours),
+        )
+        if cur.fetchone():
+            return None
+        cur.execute(
+            "SELECT request_hash, result FROM idempotency_key WHERE scope = %s AND key = %s",
+            (scope, key),
+        )
+        row = cur.fetchone()
+        if request_hash and row["request_hash"] != request_hash:
+            raise IdempotencyKeyReused(f"idempotency key {key} was used for a different request")
+        return row
+
+    def _store_idempotent_result(self, cur, scope: str, key: str, result):
+        cur.execute(
+            "UPDATE idempotency_key SET result = %s WHERE scope = %s AND key = %s",
+            (Json(result), scope, key),
+        )
+
+    def purge_idempotency_keys(self):
+        """Delete expired idempotency keys. Returns how many."""
+        rows = self.execute(
+            "DELETE FROM idempotency_key WHERE expires_at <= NOW() RETURNING key",
+            fetch=True,
+        )
+        return len(rows or [])
+
     def _hash_password(self, password: str) -> str:
         """Hash password with PBKDF2-HMAC-SHA512. Output format: salt(64hex) + hash(hex)."""
         salt = hashlib.sha256(os.urandom(60)).hexdigest().encode("ascii")  # 64 hex chars
@@ -64,10 +476,16 @@ class Database:
 
         return stored_password == provided_password
 
-    def execute(self, query: str, params=None, fetch=False, fetchone=False):
-        conn = self.get_connection()
+    def execute(self, query: str, params=None, fetch=False, fetchone=False, readonly=False, compact=False, invalidate=None):
+        """
+        Run one statement and commit. compact=True returns CompactCursor rows
+        (tuples, read-only) instead of dicts: use it for large listings.
+        The counter cache is dropped only after a statement that wrote rows;
+        invalidate=False skips that for tables it never reads (bot sessions).
+        """
+        conn = self.get_connection(readonly=readonly)
         try:
-            with conn.cursor() as cur:
+            with conn.cursor(cursor_factory=CompactCursor if compact else None) as cur:
                 cur.execute(query, params)
                 result = None
                 if fetchone:
@@ -75,16 +493,89 @@ class Database:
                 elif fetch:
                     result = cur.fetchall()
                 conn.commit()
+                if invalidate is None:
+                    invalidate = not readonly and self._wrote(cur)
+                if invalidate:
+                    self.invalidate_cache()
                 return result
         except Error:
             conn.rollback()
             raise
         finally:
-            conn.close()
+            self.put_connection(conn)
+
+    @staticmethod
+    def _wrote(cur) -> bool:
+        """True unless the statement just run was a plain SELECT (no data-modifying CTE)."""
+        command = (cur.statusmessage or "").split(" ", 1)[0]
+        if command not in ("SELECT", "SHOW"):
+            return True
+        return bool(_WRITE_RE.search(cur.query or b""))
+
+    def get_page(self, table: str, key: str, columns, after=None, limit=100, filters=None):
+        """
+        One page of rows ordered by key, after the key of the previous page
+        (keyset paging). Names are quoted as identifiers and should come from
+        a whitelist (api.py); filter values are equality parameters.
+        """
+        where = []
+        params = []
+        if after is not None:
+            where.append(sql.SQL("{} > %s").format(sql.Identifier(key)))
+            params.append(after)
+        for name, value in (filters or {}).items():
+            where.append(sql.SQL("{} = %s").format(sql.Identifier(name)))
+            params.append(value)
+        params.append(limit)
+        query = sql.SQL("SELECT {columns} FROM {table} {where} ORDER BY {key} LIMIT %s").format(
+            columns=sql.SQL(", ").join(sql.Identifier(c) for c in columns),
+            table=sql.Identifier(table),
+            where=sql.SQL("WHERE ") + sql.SQL(" AND ").join(where) if where else sql.SQL(""),
+            key=sql.Identifier(key),
+        )
+        return self.execute(query, params, fetch=True, readonly=True)
+
+    def _bulk_update(self, table: str, key: str, types: dict, changes):
+        """
+        Apply [{key: ..., column: value, ...}] in one UPDATE ... FROM unnest();
+        columns missing from a change (or None) keep their value.
+        Returns the keys that exist.
+        """
+        if not changes:
+            return []
+        keys = [c[key] for c in changes]
+        if len(set(keys)) != len(keys):
+            raise ValueError(f"duplicate {key} in bulk update")
+        columns = [c for c in types if any(c in change for change in changes)]
+        if not columns:
+            return [r[key] for r in self.execute(
+                sql.SQL("SELECT {key} FROM {table} WHERE {key} = ANY(%s)").format(
+                    key=sql.Identifier(key), table=sql.Identifier(table)),
+                (keys,), fetch=True, readonly=True)]
+        query = sql.SQL(
+            """
+            UPDATE {table} t
+            SET {assignments}
+            FROM unnest(%s::int[], {arrays}) AS c({key}, {columns})
+            WHERE t.{key} = c.{key}
+            RETURNING t.{key}
+            """
+        ).format(
+            table=sql.Identifier(table),
+            key=sql.Identifier(key),
+            assignments=sql.SQL(", ").join(
+                sql.SQL("{col} = COALESCE(c.{col}, t.{col})").format(col=sql.Identifier(c)) for c in columns
+            ),
+            arrays=sql.SQL(", ").join(sql.SQL("%s::" + types[c] + "[]") for c in columns),
+            columns=sql.SQL(", ").join(sql.Identifier(c) for c in columns),
+        )
+        params = [keys] + [[change.get(c) for change in changes] for c in columns]
+        return [r[key] for r in self.execute(query, params, fetch=True)]
 
     def init_db(self):
         """
-        Create hotel tables if they do not exist (safe for fresh DB).
+        Create hotel tables if they do not exist (safe for fresh DB),
+        then apply pending migrations (indexes etc.) from migrations.py.
         If your Neon already has tables/data, calling this won't destroy anything.
         """
         conn = self.get_connection()
@@ -247,15 +738,20 @@ class Database:
 
                 conn.commit()
 
-            self.create_default_admin_employee()
-            print("Hotel database schema ensured successfully.")
-
         except Error as e:
             print(f"Error initializing database: {e}")
             conn.rollback()
             raise
         finally:
-            conn.close()
+            self.put_connection(conn)
+
+        # both borrow their own connection
+        self.create_default_admin_employee()
+
+        from migrations import run_migrations
+
+        run_migrations(self)
+        print("Hotel database schema ensured successfully.")
 
     def create_default_admin_employee(self):
         """
@@ -310,7 +806,7 @@ class Database:
             print(f"Error creating default admin employee: {e}")
            
         finally:
-            conn.close()
+            self.put_connection(conn)
 
     def authenticate_employee(self, username: str, password: str):
         """
@@ -361,12 +857,12 @@ class Database:
             print(f"Error authenticating employee: {e}")
             return None
         finally:
-            conn.close()
+            self.put_connection(conn)
 
     def get_all_guests(self, limit=200):
-        conn = self.get_connection()
+        conn = self.get_connection(readonly=True)
         try:
-            with conn.cursor() as cur:
+            with conn.cursor(cursor_factory=CompactCursor) as cur:
                 cur.execute(
                     """
                     SELECT guest_id, name, family, national_id, passport, birthdate, email
@@ -378,7 +874,7 @@ class Database:
                 )
                 return cur.fetchall()
         finally:
-            conn.close()
+            self.put_connection(conn)
 
     def get_guest_by_id(self, guest_id: int):
         return self.execute(
@@ -389,6 +885,7 @@ class Database:
             """,
             (guest_id,),
             fetchone=True,
+            readonly=True,
         )
 
     def add_guest(self, name, family, national_id, passport, birthdate, email):
@@ -413,6 +910,34 @@ class Database:
     def delete_guest(self, guest_id: int):
         self.execute("DELETE FROM guest WHERE guest_id = %s", (guest_id,))
 
+    def add_guests(self, guests):
+        """
+        Insert many guests (dicts with GUEST_COLUMNS) in one statement, all or
+        nothing. Returns the new guest_ids in input order.
+        """
+        if not guests:
+            return []
+        missing = [i for i, g in enumerate(guests) if not (g.get("national_id") or g.get("passport"))]
+        if missing:
+            raise ValueError(f"Either national_id or passport must be provided (rows {missing})")
+        rows = self.execute(
+            """
+            INSERT INTO guest (name, family, national_id, passport, birthdate, email)
+            SELECT name, family, national_id, passport, birthdate, email
+            FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::date[], %s::varchar[])
+                 WITH ORDINALITY AS g(name, family, national_id, passport, birthdate, email, ord)
+            ORDER BY ord
+            RETURNING guest_id
+            """,
+            [[g.get(c) for g in guests] for c in GUEST_COLUMNS],
+            fetch=True,
+        )
+        return [r["guest_id"] for r in rows]
+
+    def update_guests(self, changes):
+        """Bulk edit: [{"guest_id": 1, "email": ...}, ...] in one statement. Returns the guest_ids found."""
+        return self._bulk_update("guest", "guest_id", GUEST_COLUMNS, changes)
+
 
     def get_guest_phones(self, guest_id: int):
         return self.execute(
@@ -466,6 +991,92 @@ class Database:
     def delete_guest_address(self, address_id: int):
         self.execute("DELETE FROM guest_address WHERE address_id = %s", (address_id,))
 
+    def _guest_profile_sql(self, where: str, with_history: bool) -> str:
+        """
+        One statement per page of guests: phones, addresses and (optionally)
+        reservation history come back as JSON columns, so showing N guests is a
+        single round trip instead of 1 + 3N.
+        """
+        history = (
+            """
+            COALESCE((
+                SELECT json_agg(x ORDER BY x.check_in DESC)
+                FROM (
+                    SELECT r.res_id, r.check_in, r.check_out, r.status, r.num_people,
+                           r.total_cost, COALESCE(b.paid, 0) AS payment, FALSE AS archived,
+                           ARRAY(SELECT rr.room_id FROM reservation_room rr
+                                 WHERE rr.res_id = r.res_id ORDER BY rr.room_id) AS rooms
+                    FROM reservation r
+                    LEFT JOIN reservation_balance b ON b.res_id = r.res_id
+                    WHERE r.guest_id = g.guest_id
+                    UNION ALL
+                    SELECT h.res_id, h.check_in, h.check_out, h.status, h.num_people,
+                           h.total_cost, h.payment, TRUE AS archived,
+                           ARRAY(SELECT hr.room_id FROM reservation_room_history hr
+                                 WHERE hr.res_id = h.res_id ORDER BY hr.room_id) AS rooms
+                    FROM reservation_history h
+                    WHERE h.guest_id = g.guest_id
+                ) x
+            ), '[]'::json)
+            """
+            if with_history
+            else "NULL::json"
+        )
+        return f"""
+            SELECT g.guest_id, g.name, g.family, g.national_id, g.passport, g.birthdate, g.email,
+                   COALESCE((
+                       SELECT json_agg(json_build_object('phone_id', p.phone_id, 'phone', p.phone)
+                                       ORDER BY p.phone_id DESC)
+                       FROM guest_phone p
+                       WHERE p.guest_id = g.guest_id
+                   ), '[]'::json) AS phones,
+                   COALESCE((
+                       SELECT json_agg(json_build_object('address_id', a.address_id, 'province', a.province,
+                                                         'city', a.city, 'street', a.street, 'plaque', a.plaque)
+                                       ORDER BY a.address_id DESC)
+                       FROM guest_address a
+                       WHERE a.guest_id = g.guest_id
+                   ), '[]'::json) AS addresses,
+                   {history} AS reservations,
+                   (SELECT COUNT(*) FROM reservation r WHERE r.guest_id = g.guest_id)
+                   + (SELECT COUNT(*) FROM reservation_history h WHERE h.guest_id = g.guest_id) AS reservation_count,
+                   (SELECT COALESCE(SUM(b.paid), 0) FROM reservation r
+                    JOIN reservation_balance b ON b.res_id = r.res_id WHERE r.guest_id = g.guest_id)
+                   + (SELECT COALESCE(SUM(h.payment), 0) FROM reservation_history h WHERE h.guest_id = g.guest_id)
+                   AS lifetime_spend
+            FROM guest g
+            {where}
+        """
+
+    def get_guest_profile(self, guest_id: int):
+        """Guest + phones + addresses + reservation history + lifetime spend, one query."""
+        return self.execute(
+            self._guest_profile_sql("WHERE g.guest_id = %s", with_history=True),
+            (guest_id,),
+            fetchone=True,
+        )
+
+    def get_guest_profiles(self, guest_ids: list[int], with_history=False):
+        """Batched get_guest_profile for N guests (history off by default for list pages)."""
+        if not guest_ids:
+            return []
+        return self.execute(
+            self._guest_profile_sql("WHERE g.guest_id = ANY(%s) ORDER BY g.guest_id DESC", with_history),
+            (list(guest_ids),),
+            fetch=True,
+            readonly=True,
+        )
+
+    def list_guest_profiles(self, limit=200):
+        """Newest guests with their phones and totals (no history), one query."""
+        return self.execute(
+            self._guest_profile_sql("ORDER BY g.guest_id DESC LIMIT %s", with_history=False),
+            (limit,),
+            fetch=True,
+            compact=True,
+            readonly=True,
+        )
+
     def get_all_rooms(self, limit=200):
         return self.execute(
             """
@@ -476,6 +1087,8 @@ class Database:
             """,
             (limit,),
             fetch=True,
+            compact=True,
+            readonly=True,
         )
 
     def get_room_by_id(self, room_id: int):
@@ -487,6 +1100,7 @@ class Database:
             """,
             (room_id,),
             fetchone=True,
+            readonly=True,
         )
 
     def add_room(self, room_id: int, room_type: str, capacity: int, price, features: str, floor: int, bed_type: str, smoking: bool, status: str):
@@ -503,27 +1117,88 @@ class Database:
             "UPDATE room SET status = %s WHERE room_id = %s",
             (status, room_id),
         )
+        if status == "available":
+            # back from cleaning/maintenance: usable for stays starting today
+            try:
+                self.match_waitlist(date.today(), date.today() + timedelta(days=1), room_ids=[room_id])
+            except Error as e:
+                print(f"waitlist match error: {e}")
 
     def delete_room(self, room_id: int):
         self.execute("DELETE FROM room WHERE room_id = %s", (room_id,))
 
-    def get_available_rooms(self, check_in: str = None, check_out: str = None, limit=200):
+    def add_rooms(self, rooms):
+        """Insert many rooms (dicts with room_id + ROOM_COLUMNS) in one statement, all or nothing."""
+        if not rooms:
+            return []
+        rows = self.execute(
+            """
+            INSERT INTO room (room_id, type, capacity, price, features, floor, bed_type, smoking, status)
+            SELECT room_id, type, capacity, price, features, floor, bed_type, COALESCE(smoking, false), status
+            FROM unnest(%s::int[], %s::varchar[], %s::int[], %s::numeric[], %s::varchar[],
+                        %s::int[], %s::varchar[], %s::boolean[], %s::varchar[])
+                 AS r(room_id, type, capacity, price, features, floor, bed_type, smoking, status)
+            RETURNING room_id
+            """,
+            [[r.get("room_id") for r in rooms]] + [[r.get(c) for r in rooms] for c in ROOM_COLUMNS],
+            fetch=True,
+        )
+        return [r["room_id"] for r in rows]
+
+    def update_rooms(self, changes):
+        """
+        Bulk edit: [{"room_id": 101, "status": "available", "price": ...}, ...]
+        in one statement. Rooms made available are offered to the waitlist,
+        as in update_room_status. Returns the room_ids found.
+        """
+        updated = self._bulk_update("room", "room_id", ROOM_COLUMNS, changes)
+        available = [c["room_id"] for c in changes if c.get("status") == "available"]
+        if available:
+            try:
+                self.match_waitlist(date.today(), date.today() + timedelta(days=1), room_ids=available)
+            except Error as e:
+                print(f"waitlist match error: {e}")
+        return updated
+
+    def get_available_rooms(self, check_in: str = None, check_out: str = None, limit=200, after_room_id=None):
         """
-        Simple availability:
-          - returns rooms with status='available'
-        If you want date-based availability (not in reserved date range),
-        we can extend later using reservation + reservation_room overlap logic.
+        Without dates: rooms with status='available' right now.
+        With check_in/check_out: rooms with no claimed room_night in
+        [check_in, check_out), whatever their current status.
+        Ordered by room_id; pass the last room_id seen as after_room_id for the next page.
         """
+        after = "" if after_room_id is None else "AND r.room_id > %s"
+        after_params = () if after_room_id is None else (after_room_id,)
+        if check_in and check_out:
+            return self.execute(
+                f"""
+                SELECT room_id, type, capacity, price, floor, bed_type, smoking, status
+                FROM room r
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM room_night n
+                    WHERE n.room_id = r.room_id AND n.night >= %s AND n.night < %s
+                )
+                {after}
+                ORDER BY room_id
+                LIMIT %s
+                """,
+                (check_in, check_out) + after_params + (limit,),
+                fetch=True,
+                compact=True,
+                readonly=True,
+            )
         return self.execute(
-            """
+            f"""
             SELECT room_id, type, capacity, price, floor, bed_type, smoking, status
-            FROM room
-            WHERE status = 'available'
+            FROM room r
+            WHERE status = 'available' {after}
             ORDER BY room_id
             LIMIT %s
             """,
-            (limit,),
+            after_params + (limit,),
             fetch=True,
+            compact=True,
+            readonly=True,
         )
 
     def get_all_employees(self, limit=200):
@@ -536,6 +1211,7 @@ class Database:
             """,
             (limit,),
             fetch=True,
+            readonly=True,
         )
 
     def add_employee(
@@ -612,10 +1288,18 @@ class Database:
         room_ids: list[int],
         payment=0,
         discount=0,
+        room_locked=False,
+        idempotency_key=None,
+        request_hash=None,
+        payment_method="cash",
     ):
         """
         Create reservation + link rooms in reservation_room
         AND set room.status to 'reserved' when reservation is active.
+        room_locked keeps the assignment optimizer from moving it to another room.
+        A payment taken at booking is posted to the ledger (payment_method).
+        With idempotency_key, a repeat of the same request returns the first
+        res_id without touching reservation (request_hash defaults to the stay).
         """
 
         if not room_ids:
@@ -625,10 +1309,21 @@ class Database:
         if status not in ("active", "canceled", "finished"):
             status = "active"
 
+        if idempotency_key and not request_hash:
+            request_hash = self.request_hash(guest_id, str(check_in), str(check_out), sorted(room_ids), num_people, str(total_cost))
+
+        change = None
         conn = self.get_connection()
         try:
             with conn.cursor() as cur:
-    
+                if idempotency_key:
+                    done = self._claim_idempotency_key(cur, "reservation", idempotency_key, request_hash)
+                    if done:
+                        conn.rollback()
+                        return done["result"]["res_id"]
+
+                before = self._lock_inventory_version(cur) if status == "active" else None
+
                 cur.execute(
                     """
                     SELECT room_id, status
@@ -643,24 +1338,34 @@ class Database:
                 if missing:
                     raise ValueError(f"اتاق(ها) پیدا نشدند: {missing}")
 
+                # room.status only describes tonight; future stays are checked
+                # against the per-night inventory below instead
+                starts_now = date.fromisoformat(str(check_in)) <= date.today()
                 not_available = [r["room_id"] for r in rows if r["status"] != "available"]
-                if status == "active" and not_available:
+                if status == "active" and starts_now and not_available:
                     raise ValueError(f"این اتاق‌ها available نیستند: {not_available}")
 
-                
                 cur.execute(
                     """
                     INSERT INTO reservation
-                    (guest_id, emp_id, check_in, check_out, num_people, status, total_cost, payment, discount)
+                    (guest_id, emp_id, check_in, check_out, num_people, status, total_cost, discount, room_locked)
                     VALUES
                     (%s,%s,%s,%s,%s,%s,%s,%s,%s)
                     RETURNING res_id
                     """,
-                    (guest_id, emp_id, check_in, check_out, num_people, status, total_cost, payment, discount),
+                    (guest_id, emp_id, check_in, check_out, num_people, status, total_cost, discount, bool(room_locked)),
                 )
                 res_id = cur.fetchone()["res_id"]
 
-              
+                if payment and Decimal(str(payment)) != 0:
+                    cur.execute(
+                        """
+                        INSERT INTO payment (res_id, amount, method, emp_id, reference)
+                        VALUES (%s, %s, %s, %s, 'at booking')
+                        """,
+                        (res_id, payment, payment_method, emp_id),
+                    )
+
                 cur.executemany(
                     """
                     INSERT INTO reservation_room (res_id, room_id)
@@ -669,38 +1374,196 @@ class Database:
                     [(res_id, rid) for rid in room_ids],
                 )
 
-              
                 if status == "active":
-                    cur.execute(
-                        """
-                        UPDATE room
-                        SET status = 'reserved'
-                        WHERE room_id = ANY(%s)
-                        """,
-                        (room_ids,),
-                    )
+                    nights = self._claim_room_nights(cur, res_id, room_ids, check_in, check_out)
+                    change = self._inventory_changed(cur, before, claimed=nights)
+                    if starts_now:
+                        cur.execute(
+                            """
+                            UPDATE room
+                            SET status = 'reserved'
+                            WHERE room_id = ANY(%s)
+                            """,
+                            (room_ids,),
+                        )
+
+                if idempotency_key:
+                    self._store_idempotent_result(cur, "reservation", idempotency_key, {"res_id": res_id, "rooms": list(room_ids)})
 
                 conn.commit()
-                return res_id
 
         except Error:
             conn.rollback()
             raise
         finally:
-            conn.close()
+            self.put_connection(conn)
 
+        # listeners borrow connections of their own; ours is back in the pool
+        self.invalidate_cache()
+        if change:
+            self._publish_inventory_change(change)
+        return res_id
 
+    def _claim_room_nights(self, cur, res_id: int, room_ids: list[int], check_in, check_out):
+        """
+        Claim one room_night row per room per night. The (room_id, night) primary
+        key makes a double booking impossible, even for concurrent requests.
+        Returns the claimed [(room_id, night)].
+        """
+        cur.execute(
+            """
+            INSERT INTO room_night (room_id, night, res_id)
+            SELECT rid, d::date, %s
+            FROM unnest(%s::int[]) rid,
+                 generate_series(%s::date, %s::date - 1, INTERVAL '1 day') d
+            ON CONFLICT (room_id, night) DO NOTHING
+            """,
+            (res_id, room_ids, check_in, check_out),
+        )
+        first = date.fromisoformat(str(check_in))
+        days = (date.fromisoformat(str(check_out)) - first).days
+        expected = len(set(room_ids)) * days
+        if cur.rowcount != expected:
+            cur.execute(
+                """
+                SELECT DISTINCT room_id
+                FROM room_night
+                WHERE room_id = ANY(%s) AND night >= %s AND night < %s AND res_id <> %s
+                ORDER BY room_id
+                """,
+                (room_ids, check_in, check_out, res_id),
+            )
+            taken = [r["room_id"] for r in cur.fetchall()]
+            raise ValueError(f"این اتاق‌ها در این بازه رزرو شده‌اند: {taken}")
+        return [(rid, first + timedelta(days=i)) for rid in set(room_ids) for i in range(days)]
+
+    def backfill_room_nights(self):
+        """
+        Fill room_night from existing active reservations (run once after
+        migration 7). Returns (inserted, conflicting_nights); conflicts are
+        pre-existing double bookings that the inventory could not record.
+        """
+        row = self.execute(
+            """
+            WITH wanted AS (
+                SELECT rr.room_id, d::date AS night, r.res_id
+                FROM reservation r
+                JOIN reservation_room rr ON rr.res_id = r.res_id
+                CROSS JOIN LATERAL generate_series(r.check_in, r.check_out - 1, INTERVAL '1 day') d
+                WHERE r.status = 'active'
+            ),
+            ins AS (
+                INSERT INTO room_night (room_id, night, res_id)
+                SELECT DISTINCT ON (room_id, night) room_id, night, res_id
+                FROM wanted
+                ORDER BY room_id, night, res_id
+                ON CONFLICT (room_id, night) DO NOTHING
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM ins) AS inserted,
+                   (SELECT COUNT(*) FROM wanted) AS wanted
+            """,
+            fetchone=True,
+        )
+        return row["inserted"], row["wanted"] - row["inserted"]
+
+    def count_available_rooms(self, check_in, check_out, room_type: str = None):
+        """Rooms (optionally of one type) free for every night in [check_in, check_out)."""
+        row = self.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM room WHERE %(type)s::text IS NULL OR type = %(type)s)
+                 - (SELECT COUNT(DISTINCT n.room_id)
+                    FROM room_night n
+                    JOIN room r ON r.room_id = n.room_id
+                    WHERE n.night >= %(ci)s AND n.night < %(co)s
+                      AND (%(type)s::text IS NULL OR r.type = %(type)s)) AS c
+            """,
+            {"ci": check_in, "co": check_out, "type": room_type},
+            fetchone=True,
+            readonly=True,
+        )
+        return row["c"]
+
+    def get_availability_by_night(self, start, end, room_type: str = None):
+        """
+        Free room count per night for [start, end), e.g. a 365-night horizon.
+        Returns [{night, available}] with one row per night.
+        """
+        return self.execute(
+            """
+            WITH rooms AS (
+                SELECT COUNT(*) AS total FROM room WHERE %(type)s::text IS NULL OR type = %(type)s
+            ),
+            booked AS (
+                SELECT n.night, COUNT(*) AS c
+                FROM room_night n
+                JOIN room r ON r.room_id = n.room_id
+                WHERE n.night >= %(start)s AND n.night < %(end)s
+                  AND (%(type)s::text IS NULL OR r.type = %(type)s)
+                GROUP BY n.night
+            )
+            SELECT d::date AS night, rooms.total - COALESCE(booked.c, 0) AS available
+            FROM generate_series(%(start)s::date, %(end)s::date - 1, INTERVAL '1 day') d
+            CROSS JOIN rooms
+            LEFT JOIN booked ON booked.night = d::date
+            ORDER BY 1
+            """,
+            {"start": start, "end": end, "type": room_type},
+            fetch=True,
+            readonly=True,
+        )
+
+    def get_room_timeline(self, start, end, room_type: str = None, floor: int = None):
+        """
+        Occupancy of every room over [start, end) as run-length runs, in one query.
+        Returns [{room_id, type, floor, runs}] where each run is
+        [first night offset from start, nights, res_id, status, guest name].
+        """
+        return self.execute(
+            """
+            WITH runs AS (
+                SELECT n.room_id, n.res_id,
+                       MIN(n.night) - %(start)s::date AS first,
+                       COUNT(*) AS nights
+                FROM room_night n
+                WHERE n.night >= %(start)s AND n.night < %(end)s
+                GROUP BY n.room_id, n.res_id
+            )
+            SELECT rm.room_id, rm.type, rm.floor,
+                   COALESCE(
+                       json_agg(
+                           json_build_array(x.first, x.nights, x.res_id, r.status, g.name || ' ' || g.family)
+                           ORDER BY x.first
+                       ) FILTER (WHERE x.res_id IS NOT NULL),
+                       '[]'
+                   ) AS runs
+            FROM room rm
+            LEFT JOIN runs x ON x.room_id = rm.room_id
+            LEFT JOIN reservation r ON r.res_id = x.res_id
+            LEFT JOIN guest g ON g.guest_id = r.guest_id
+            WHERE (%(type)s::text IS NULL OR rm.type = %(type)s)
+              AND (%(floor)s::int IS NULL OR rm.floor = %(floor)s)
+            GROUP BY rm.room_id
+            ORDER BY rm.floor, rm.room_id
+            """,
+            {"start": start, "end": end, "type": room_type, "floor": floor},
+            fetch=True,
+            compact=True,
+            readonly=True,
+        )
 
     def get_reservation_by_id(self, res_id: int):
         return self.execute(
             """
-            SELECT res_id, guest_id, emp_id, check_in, check_out, booking_date,
-                   num_people, status, total_cost, payment, discount
-            FROM reservation
-            WHERE res_id = %s
+            SELECT r.res_id, r.guest_id, r.emp_id, r.check_in, r.check_out, r.booking_date,
+                   r.num_people, r.status, r.total_cost, COALESCE(b.paid, 0) AS payment, r.discount
+            FROM reservation r
+            LEFT JOIN reservation_balance b ON b.res_id = r.res_id
+            WHERE r.res_id = %s
             """,
             (res_id,),
             fetchone=True,
+            readonly=True,
         )
 
     def get_reservation_rooms(self, res_id: int):
@@ -716,33 +1579,113 @@ class Database:
             fetch=True,
         )
 
-    def list_active_reservations(self, limit=200):
-        return self.execute(
-            """
-            SELECT r.res_id, r.guest_id, g.name, g.family, r.emp_id, e.username,
-                   r.check_in, r.check_out, r.num_people, r.status, r.total_cost, r.payment, r.discount
-            FROM reservation r
-            JOIN guest g ON g.guest_id = r.guest_id
-            JOIN employee e ON e.emp_id = r.emp_id
-            WHERE r.status = 'active'
-            ORDER BY r.res_id DESC
-            LIMIT %s
-            """,
-            (limit,),
-            fetch=True,
-        )
+    def list_active_reservations(self, limit=200, before_res_id=None, with_rooms=False):
+        """
+        Active reservations, newest first, paged by res_id (see queries.py).
+        with_rooms=True adds r["rooms"] for the page with one extra query.
+        """
+        conn = self.get_connection(readonly=True)
+        try:
+            with conn.cursor() as cur:
+                rows = active_reservations_page(cur, limit=limit, before_res_id=before_res_id)
+                if with_rooms:
+                    attach_reservation_rooms(cur, rows)
+                return rows
+        finally:
+            self.put_connection(conn)
 
-    def add_payment(self, res_id: int, amount):
+    def add_payment(self, res_id: int, amount, idempotency_key=None, method="cash", emp_id=None, reference=None):
         """
-        payment = payment + amount
+        Post one payment to the ledger (once per idempotency_key).
         """
-        self.execute(
+        self.add_payments([(res_id, amount, method, reference)], emp_id=emp_id, idempotency_key=idempotency_key)
+
+    def add_payments(self, payments, emp_id=None, idempotency_key=None, request_hash=None):
+        """
+        Post a batch of payments [(res_id, amount[, method[, reference]]), ...]
+        (e.g. an end-of-day card settlement) with one INSERT; the payment
+        trigger folds the batch into reservation_balance with one upsert per
+        reservation. Postings for unknown reservations are skipped.
+        Returns {res_id: paid total} for the reservations posted to.
+        With idempotency_key a repeat returns the first result and posts nothing.
+        """
+        if not payments:
+            return {}
+        rows = [tuple(p) + (None,) * (4 - len(p)) for p in payments]
+        if idempotency_key and not request_hash:
+            request_hash = self.request_hash(sorted((int(r), str(a), m or "cash", ref) for r, a, m, ref in rows))
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                if idempotency_key:
+                    done = self._claim_idempotency_key(cur, "payment", idempotency_key, request_hash)
+                    if done:
+                        conn.rollback()
+                        return {int(r): Decimal(p) for r, p in done["result"]}
+                cur.execute(
+                    """
+                    WITH posted AS (
+                        INSERT INTO payment (res_id, amount, method, emp_id, reference)
+                        SELECT p.res_id, p.amount, COALESCE(p.method, 'cash'), %s, p.reference
+                        FROM unnest(%s::int[], %s::numeric[], %s::varchar[], %s::varchar[])
+                             AS p(res_id, amount, method, reference)
+                        JOIN reservation r ON r.res_id = p.res_id
+                        RETURNING res_id
+                    )
+                    SELECT DISTINCT res_id FROM posted
+                    """,
+                    (
+                        emp_id,
+                        [r[0] for r in rows],
+                        [r[1] for r in rows],
+                        [r[2] for r in rows],
+                        [r[3] for r in rows],
+                    ),
+                )
+                posted = [r["res_id"] for r in cur.fetchall()]
+                totals = self._balances(cur, posted)
+                if idempotency_key:
+                    self._store_idempotent_result(cur, "payment", idempotency_key, [[r, str(p)] for r, p in totals.items()])
+            conn.commit()
+            self.invalidate_cache()
+            return totals
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            self.put_connection(conn)
+
+    def _balances(self, cur, res_ids):
+        if not res_ids:
+            return {}
+        cur.execute(
+            "SELECT res_id, paid FROM reservation_balance WHERE res_id = ANY(%s) ORDER BY res_id",
+            (list(res_ids),),
+        )
+        return {r["res_id"]: r["paid"] for r in cur.fetchall()}
+
+    def get_balances(self, res_ids):
+        """{res_id: paid total} for reservations with at least one posting."""
+        conn = self.get_connection(readonly=True)
+        try:
+            with conn.cursor() as cur:
+                return self._balances(cur, res_ids)
+        finally:
+            self.put_connection(conn)
+
+    def get_payments(self, res_id: int):
+        """Ledger postings of one reservation, oldest first."""
+        return self.execute(
             """
-            UPDATE reservation
-            SET payment = payment + %s
-            WHERE res_id = %s
+            SELECT p.payment_id, p.res_id, p.amount, p.method, p.emp_id, e.username, p.reference, p.posted_at
+            FROM payment p
+            LEFT JOIN employee e ON e.emp_id = p.emp_id
+            WHERE p.res_id = %s
+            ORDER BY p.payment_id
             """,
-            (amount, res_id),
+            (res_id,),
+            fetch=True,
+            readonly=True,
         )
 
     def set_reservation_status(self, res_id: int, status: str):
@@ -754,81 +1697,754 @@ class Database:
     def delete_reservation(self, res_id: int):
         """
         reservation_room has ON DELETE CASCADE, so deleting reservation removes links too.
+        A reservation with payment postings cannot be deleted (the ledger is
+        append-only); cancel it instead.
         """
         self.execute("DELETE FROM reservation WHERE res_id = %s", (res_id,))
 
     
     def cancel_reservation(self, res_id: int):
         """
-        Set reservation status to canceled and free its rooms.
+        Set reservation status to canceled and free its rooms (one statement).
+        """
+        self.cancel_reservations([res_id])
+
+    def cancel_reservations(self, res_ids: list[int]):
+        """
+        Bulk cancel_reservation. Returns the res_ids that were active and got canceled.
         """
+        if not res_ids:
+            return []
         conn = self.get_connection()
         try:
             with conn.cursor() as cur:
-            
-                cur.execute("SELECT room_id FROM reservation_room WHERE res_id = %s", (res_id,))
-                room_ids = [r["room_id"] for r in cur.fetchall()]
-
-                
-                cur.execute("UPDATE reservation SET status = 'canceled' WHERE res_id = %s", (res_id,))
-
-                if room_ids:
-                    cur.execute(
-                        "UPDATE room SET status = 'available' WHERE room_id = ANY(%s)",
-                        (room_ids,),
+                before = self._lock_inventory_version(cur)
+                cur.execute(
+                    """
+                    WITH canceled AS (
+                        UPDATE reservation SET status = 'canceled'
+                        WHERE res_id = ANY(%s) AND status = 'active'
+                        RETURNING res_id, check_in
+                    ),
+                    released AS (
+                        DELETE FROM room_night n
+                        USING canceled c
+                        WHERE n.res_id = c.res_id
+                        RETURNING n.room_id, n.night
+                    ),
+                    -- room.status describes tonight only: free rooms held for a stay
+                    -- that has started, never a room another guest is in
+                    freed AS (
+                        UPDATE room rm
+                        SET status = 'available'
+                        FROM reservation_room rr
+                        JOIN canceled c ON c.res_id = rr.res_id
+                        WHERE rm.room_id = rr.room_id
+                          AND c.check_in <= CURRENT_DATE
+                          AND rm.status = 'reserved'
                     )
-
-                conn.commit()
+                    SELECT 'canceled' AS kind, res_id, NULL::int AS room_id, NULL::date AS night FROM canceled
+                    UNION ALL
+                    SELECT 'released', NULL, room_id, night FROM released
+                    """,
+                    (list(res_ids),),
+                )
+                rows = cur.fetchall()
+                released = [(r["room_id"], r["night"]) for r in rows if r["kind"] == "released"]
+                change = self._inventory_changed(cur, before, released=released)
+            conn.commit()
         except Error:
             conn.rollback()
             raise
         finally:
-            conn.close()
+            self.put_connection(conn)
+        self.invalidate_cache()
+        self._publish_inventory_change(change)
+        return [r["res_id"] for r in rows if r["kind"] == "canceled"]
 
+    def reassign_rooms(self, moves):
+        """
+        Move future stays to other rooms in one transaction; moves are
+        [(res_id, old_room_id, new_room_id)] (assignment.plan_window). Stays
+        that started, were canceled or are room_locked since the plan was
+        made are skipped; if a target night was taken meanwhile nothing is
+        moved and ValueError is raised. Returns the number of stays moved.
+        """
+        if not moves:
+            return 0
+        res_ids, old_rooms, new_rooms = (list(col) for col in zip(*moves))
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                before = self._lock_inventory_version(cur)
+                cur.execute(
+                    """
+                    DELETE FROM room_night n
+                    USING unnest(%s::int[], %s::int[], %s::int[]) m(res_id, old_room, new_room),
+                          reservation r
+                    WHERE n.res_id = m.res_id AND n.room_id = m.old_room
+                      AND r.res_id = m.res_id AND r.status = 'active'
+                      AND r.check_in > CURRENT_DATE AND NOT r.room_locked
+                    RETURNING n.res_id, n.room_id, n.night, m.new_room
+                    """,
+                    (res_ids, old_rooms, new_rooms),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    conn.rollback()
+                    return 0
+                cur.execute(
+                    """
+                    INSERT INTO room_night (room_id, night, res_id)
+                    SELECT * FROM unnest(%s::int[], %s::date[], %s::int[])
+                    ON CONFLICT (room_id, night) DO NOTHING
+                    """,
+                    ([r["new_room"] for r in rows], [r["night"] for r in rows], [r["res_id"] for r in rows]),
+                )
+                if cur.rowcount != len(rows):
+                    raise ValueError("اتاق‌های مقصد در این فاصله رزرو شده‌اند؛ دوباره برنامه‌ریزی کنید.")
+                moved = sorted({(r["res_id"], r["room_id"], r["new_room"]) for r in rows})
+                cur.execute(
+                    """
+                    DELETE FROM reservation_room rr
+                    USING unnest(%s::int[], %s::int[]) m(res_id, old_room)
+                    WHERE rr.res_id = m.res_id AND rr.room_id = m.old_room
+                    """,
+                    ([m[0] for m in moved], [m[1] for m in moved]),
+                )
+                cur.execute(
+                    """
+                    INSERT INTO reservation_room (res_id, room_id)
+                    SELECT * FROM unnest(%s::int[], %s::int[])
+                    ON CONFLICT DO NOTHING
+                    """,
+                    ([m[0] for m in moved], [m[2] for m in moved]),
+                )
+                claimed = {(r["new_room"], r["night"]) for r in rows}
+                # a night handed from one moved stay to another stays taken
+                released = {(r["room_id"], r["night"]) for r in rows} - claimed
+                change = self._inventory_changed(cur, before, claimed=claimed, released=released)
+            conn.commit()
+        except (Error, ValueError):
+            conn.rollback()
+            raise
+        finally:
+            self.put_connection(conn)
+        self.invalidate_cache()
+        self._publish_inventory_change(change)
+        return len(moved)
 
     def finish_reservation(self, res_id: int):
         """
-        Set reservation status to finished and free its rooms.
+        Set reservation status to finished; its rooms go to 'cleaning'.
         """
+        self.check_out_reservations([res_id])
+
+    def _reservation_queue(self, date_column: str, day, limit: int):
+        return self.execute(
+            f"""
+            SELECT r.res_id, r.guest_id, g.name, g.family, r.check_in, r.check_out,
+                   r.num_people, r.total_cost, COALESCE(b.paid, 0) AS payment,
+                   ARRAY_AGG(rr.room_id ORDER BY rr.room_id) AS rooms,
+                   BOOL_AND(rm.status = 'occupied') AS checked_in
+            FROM reservation r
+            JOIN guest g ON g.guest_id = r.guest_id
+            JOIN reservation_room rr ON rr.res_id = r.res_id
+            JOIN room rm ON rm.room_id = rr.room_id
+            LEFT JOIN reservation_balance b ON b.res_id = r.res_id
+            WHERE r.status = 'active' AND r.{date_column} = %s
+            GROUP BY r.res_id, g.guest_id, b.res_id
+            ORDER BY r.res_id
+            LIMIT %s
+            """,
+            (day or date.today(), limit),
+            fetch=True,
+            readonly=True,
+            compact=True,
+        )
+
+    def get_arrivals(self, day=None, limit=1000):
+        """Active reservations checking in on `day` (default today), with room ids and checked_in flag."""
+        return self._reservation_queue("check_in", day, limit)
+
+    def get_departures(self, day=None, limit=2000):
+        """Active reservations checking out on `day` (default today)."""
+        return self._reservation_queue("check_out", day, limit)
+
+    def check_in_reservation(self, res_id: int):
+        """
+        Mark every room of an active reservation occupied in one statement.
+        Nothing changes, and ValueError says why, if the stay has not started
+        yet or any of its rooms is occupied or being cleaned.
+        Returns the room ids.
+        """
+        rows = self.execute(
+            """
+            UPDATE room rm
+            SET status = 'occupied'
+            FROM reservation_room rr
+            JOIN reservation r ON r.res_id = rr.res_id
+            WHERE rm.room_id = rr.room_id
+              AND rr.res_id = %(res_id)s
+              AND r.status = 'active'
+              AND r.check_in <= CURRENT_DATE
+              AND rm.status IN ('reserved', 'available')
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM reservation_room o
+                  JOIN room orm ON orm.room_id = o.room_id
+                  WHERE o.res_id = %(res_id)s AND orm.status NOT IN ('reserved', 'available')
+              )
+            RETURNING rm.room_id
+            """,
+            {"res_id": res_id},
+            fetch=True,
+        )
+        if rows:
+            return [r["room_id"] for r in rows]
+
+        r = self.execute(
+            """
+            SELECT r.status, r.check_in, r.check_in > CURRENT_DATE AS early,
+                   ARRAY_AGG(rm.room_id::text || ' (' || rm.status || ')' ORDER BY rm.room_id)
+                       FILTER (WHERE rm.status NOT IN ('reserved', 'available')) AS blocked
+            FROM reservation r
+            LEFT JOIN reservation_room rr ON rr.res_id = r.res_id
+            LEFT JOIN room rm ON rm.room_id = rr.room_id
+            WHERE r.res_id = %s
+            GROUP BY r.res_id
+            """,
+            (res_id,),
+            fetchone=True,
+        )
+        if not r:
+            raise ValueError(f"رزرو {res_id} پیدا نشد.")
+        if r["status"] != "active":
+            raise ValueError(f"رزرو {res_id} فعال نیست.")
+        if r["early"]:
+            raise ValueError(f"ورود رزرو {res_id} از {r['check_in']} است؛ پذیرش زودتر ممکن نیست.")
+        if r["blocked"]:
+            raise ValueError(f"اتاق‌های رزرو {res_id} آماده پذیرش نیستند: {', '.join(r['blocked'])}")
+        raise ValueError(f"رزرو {res_id} اتاقی ندارد.")
+
+    def check_out_reservations(self, res_ids: list[int]):
+        """
+        Bulk check-out: reservations -> finished, their occupied rooms -> cleaning
+        and rooms still held for a no-show -> available, in a single statement
+        regardless of how many departures there are. Rooms already taken
+        tonight by another active stay (same-day turnover) keep their status.
+        Returns the res_ids that were actually active and got finished.
+        """
+        if not res_ids:
+            return []
         conn = self.get_connection()
         try:
             with conn.cursor() as cur:
-                cur.execute("SELECT room_id FROM reservation_room WHERE res_id = %s", (res_id,))
-                room_ids = [r["room_id"] for r in cur.fetchall()]
+                before = self._lock_inventory_version(cur)
+                cur.execute(
+                    """
+                    WITH done AS (
+                        UPDATE reservation SET status = 'finished'
+                        WHERE res_id = ANY(%s) AND status = 'active'
+                        RETURNING res_id
+                    ),
+                    freed AS (
+                        UPDATE room rm
+                        SET status = CASE WHEN rm.status = 'occupied' THEN 'cleaning' ELSE 'available' END
+                        FROM reservation_room rr
+                        JOIN done d ON d.res_id = rr.res_id
+                        WHERE rm.room_id = rr.room_id
+                          AND rm.status IN ('occupied', 'reserved')
+                          AND NOT EXISTS (
+                              SELECT 1
+                              FROM room_night o
+                              JOIN reservation r ON r.res_id = o.res_id
+                              WHERE o.room_id = rm.room_id AND o.night = CURRENT_DATE
+                                AND o.res_id <> rr.res_id AND r.status = 'active'
+                          )
+                        RETURNING rm.room_id
+                    ),
+                    released AS (
+                        -- early departures give their remaining nights back to inventory
+                        DELETE FROM room_night n
+                        USING done d
+                        WHERE n.res_id = d.res_id AND n.night >= CURRENT_DATE
+                        RETURNING n.room_id, n.night
+                    )
+                    SELECT 'done' AS kind, res_id, NULL::int AS room_id, NULL::date AS night FROM done
+                    UNION ALL
+                    SELECT 'released', NULL, room_id, night FROM released
+                    """,
+                    (list(res_ids),),
+                )
+                rows = cur.fetchall()
+                released = [(r["room_id"], r["night"]) for r in rows if r["kind"] == "released"]
+                change = self._inventory_changed(cur, before, released=released)
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            self.put_connection(conn)
+        self.invalidate_cache()
+        self._publish_inventory_change(change)
+        return [r["res_id"] for r in rows if r["kind"] == "done"]
 
-                cur.execute("UPDATE reservation SET status = 'finished' WHERE res_id = %s", (res_id,))
+    def finish_overdue_reservations(self, batch_size=500, max_batches=100):
+        """
+        Check out active reservations whose check_out date has passed, in
+        batches (oldest first). Returns how many were finished.
+        """
+        total = 0
+        for _ in range(max_batches):
+            rows = self.execute(
+                """
+                SELECT res_id
+                FROM reservation
+                WHERE status = 'active' AND check_out < CURRENT_DATE
+                ORDER BY check_out
+                LIMIT %s
+                """,
+                (batch_size,),
+                fetch=True,
+            )
+            if not rows:
+                break
+            total += len(self.check_out_reservations([r["res_id"] for r in rows]))
+            if len(rows) < batch_size:
+                break
+        return total
+
+    def notify_overdue_checkouts(self, checkout_hour=12):
+        """
+        Publish an overdue_checkout event (notifier.py) for every active
+        reservation past its check-out time, once per reservation.
+        Returns how many were announced.
+        """
+        rows = self.execute(
+            """
+            WITH due AS (
+                INSERT INTO overdue_notice (res_id)
+                SELECT res_id
+                FROM reservation
+                WHERE status = 'active'
+                  AND (check_out < CURRENT_DATE OR (check_out = CURRENT_DATE AND LOCALTIME >= make_time(%s, 0, 0)))
+                ON CONFLICT (res_id) DO NOTHING
+                RETURNING res_id
+            )
+            SELECT pg_notify('hotel_events', json_build_object(
+                       'event', 'overdue_checkout', 'res_id', r.res_id, 'check_out', r.check_out)::text)
+            FROM due d
+            JOIN reservation r ON r.res_id = d.res_id
+            """,
+            (checkout_hour,),
+            fetch=True,
+        )
+        return len(rows or [])
+
+    def add_waitlist_entry(
+        self,
+        guest_id: int,
+        emp_id: int,
+        check_in,
+        check_out,
+        num_people: int,
+        rooms=1,
+        room_type=None,
+        min_capacity=None,
+        like_room_ids=None,
+    ):
+        """
+        Queue a booking that could not be placed. Without room_type, the type
+        of like_room_ids is used when they are all of one type. The entry is
+        matched right away if rooms are free after all.
+        Returns (wait_id, matched).
+        """
+        row = self.execute(
+            """
+            INSERT INTO waitlist (guest_id, emp_id, check_in, check_out, room_type, min_capacity, rooms, num_people)
+            SELECT %s, %s, %s, %s,
+                   COALESCE(%s, (SELECT MIN(type) FROM room WHERE room_id = ANY(%s::int[]) HAVING COUNT(DISTINCT type) = 1)),
+                   %s, %s, %s
+            RETURNING wait_id
+            """,
+            (
+                guest_id, emp_id, check_in, check_out,
+                room_type or None, list(like_room_ids or []),
+                min_capacity, max(1, int(rooms)), num_people,
+            ),
+            fetchone=True,
+        )
+        matched = self.match_waitlist(check_in, check_out)
+        return row["wait_id"], row["wait_id"] in matched
 
-                if room_ids:
+    def match_waitlist(self, start, end, room_ids=None, limit=50):
+        """
+        Offer free rooms to waiting entries that overlap [start, end), oldest
+        first. With room_ids (the rooms just freed) only entries that could use
+        one of those room types are considered. A matched entry holds its
+        rooms (matched_rooms) against other entries until it is booked or
+        canceled; the trigger from migration 12 announces it.
+        Returns the matched wait_ids.
+        """
+        matched = []
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                # one matcher at a time, so two entries are never offered the same room
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('waitlist_match'))")
+                cur.execute(
+                    """
+                    SELECT wait_id, check_in, check_out, room_type, min_capacity, rooms, num_people
+                    FROM waitlist
+                    WHERE status = 'waiting'
+                      AND daterange(check_in, check_out) && daterange(%(start)s, %(end)s)
+                      AND check_in >= CURRENT_DATE
+                      AND (%(room_ids)s::int[] IS NULL OR room_type IS NULL
+                           OR room_type IN (SELECT type FROM room WHERE room_id = ANY(%(room_ids)s::int[])))
+                    ORDER BY created_at, wait_id
+                    LIMIT %(limit)s
+                    """,
+                    {"start": start, "end": end, "room_ids": room_ids, "limit": limit},
+                )
+                for e in cur.fetchall():
                     cur.execute(
-                        "UPDATE room SET status = 'available' WHERE room_id = ANY(%s)",
-                        (room_ids,),
+                        """
+                        SELECT rm.room_id
+                        FROM room rm
+                        WHERE (%(type)s::varchar IS NULL OR rm.type = %(type)s)
+                          AND rm.capacity >= %(capacity)s
+                          AND (%(check_in)s > CURRENT_DATE OR rm.status = 'available')
+                          AND NOT EXISTS (
+                              SELECT 1 FROM room_night n
+                              WHERE n.room_id = rm.room_id
+                                AND n.night >= %(check_in)s AND n.night < %(check_out)s
+                          )
+                          AND NOT EXISTS (
+                              SELECT 1 FROM waitlist w
+                              WHERE w.status IN ('matched', 'booking') AND rm.room_id = ANY(w.matched_rooms)
+                                AND daterange(w.check_in, w.check_out) && daterange(%(check_in)s, %(check_out)s)
+                          )
+                        ORDER BY rm.capacity, rm.room_id
+                        LIMIT %(rooms)s
+                        """,
+                        {
+                            "type": e["room_type"],
+                            "capacity": e["min_capacity"] or -(-e["num_people"] // e["rooms"]),
+                            "check_in": e["check_in"],
+                            "check_out": e["check_out"],
+                            "rooms": e["rooms"],
+                        },
                     )
-
-                conn.commit()
+                    free = [r["room_id"] for r in cur.fetchall()]
+                    if len(free) < e["rooms"]:
+                        continue
+                    cur.execute(
+                        """
+                        UPDATE waitlist
+                        SET status = 'matched', matched_rooms = %s, matched_at = now()
+                        WHERE wait_id = %s
+                        """,
+                        (free, e["wait_id"]),
+                    )
+                    matched.append(e["wait_id"])
+            conn.commit()
+            return matched
         except Error:
             conn.rollback()
             raise
         finally:
-            conn.close()
+            self.put_connection(conn)
 
-    def get_cleaning_rooms(self, limit=50):
+    def release_expired_holds(self, hold_hours=24):
+        """
+        Expire matched entries nobody booked within hold_hours (or whose stay
+        has started), and claims left behind by a booking that died half-way,
+        and offer the rooms they held to the entries behind them.
+        Returns how many holds were released.
+        """
+        rows = self.execute(
+            """
+            UPDATE waitlist
+            SET status = 'expired'
+            WHERE status IN ('matched', 'booking')
+              AND (matched_at < NOW() - make_interval(hours => %s) OR check_in < CURRENT_DATE)
+            RETURNING check_in, check_out, matched_rooms
+            """,
+            (hold_hours,),
+            fetch=True,
+        )
+        live = [r for r in rows if r["check_out"] > date.today()]
+        if live:
+            self.match_waitlist(
+                max(min(r["check_in"] for r in live), date.today()),
+                max(r["check_out"] for r in live),
+                room_ids=sorted({room_id for r in live for room_id in r["matched_rooms"] or ()}),
+            )
+        return len(rows)
+
+    def _match_waitlist_on_release(self, change):
+        """Inventory listener: only the freed nights and room types are matched."""
+        if not change["released"]:
+            return
+        nights = [n for _, n in change["released"]]
+        self.match_waitlist(
+            min(nights),
+            max(nights) + timedelta(days=1),
+            room_ids=sorted({room_id for room_id, _ in change["released"]}),
+        )
+
+    def list_waitlist(self, limit=200):
+        """Open (waiting/matched) entries that have not checked out yet; matched ones first."""
         return self.execute(
             """
+            SELECT w.wait_id, w.guest_id, g.name, g.family, w.check_in, w.check_out,
+                   w.room_type, w.rooms, w.num_people, w.status, w.matched_rooms,
+                   w.created_at, w.matched_at
+            FROM waitlist w
+            JOIN guest g ON g.guest_id = w.guest_id
+            WHERE w.status IN ('waiting', 'matched') AND w.check_out > CURRENT_DATE
+            ORDER BY w.status = 'matched' DESC, w.created_at
+            LIMIT %s
+            """,
+            (limit,),
+            fetch=True,
+            compact=True,
+            readonly=True,
+        )
+
+    def book_waitlist_entry(self, wait_id: int, emp_id: int):
+        """
+        Turn a matched entry into an active reservation on its matched rooms,
+        priced at the rooms' nightly rates. The entry is claimed ('booking')
+        first, so a double click or a second employee gets ValueError instead
+        of a second reservation. If the rooms were taken meanwhile the entry
+        goes back to waiting (and is matched again) and ValueError is raised.
+        Returns the new res_id.
+        """
+        e = self.execute(
+            """
+            UPDATE waitlist w
+            SET status = 'booking'
+            WHERE w.wait_id = %s AND w.status = 'matched'
+            RETURNING w.guest_id, w.check_in, w.check_out, w.num_people, w.matched_rooms,
+                      (SELECT COALESCE(SUM(price), 0) FROM room WHERE room_id = ANY(w.matched_rooms))
+                          * (w.check_out - w.check_in) AS total_cost
+            """,
+            (wait_id,),
+            fetchone=True,
+        )
+        if not e:
+            raise ValueError("این درخواست آماده رزرو نیست.")
+        try:
+            res_id = self.create_reservation(
+                guest_id=e["guest_id"],
+                emp_id=emp_id,
+                check_in=e["check_in"],
+                check_out=e["check_out"],
+                num_people=e["num_people"],
+                status="active",
+                total_cost=e["total_cost"],
+                room_ids=e["matched_rooms"],
+            )
+        except ValueError:
+            self.execute(
+                """
+                UPDATE waitlist SET status = 'waiting', matched_rooms = NULL, matched_at = NULL
+                WHERE wait_id = %s AND status = 'booking'
+                """,
+                (wait_id,),
+            )
+            self.match_waitlist(e["check_in"], e["check_out"])
+            raise
+        except Exception:
+            # nothing was booked: hand the claim back
+            self.execute("UPDATE waitlist SET status = 'matched' WHERE wait_id = %s AND status = 'booking'", (wait_id,))
+            raise
+        self.execute(
+            "UPDATE waitlist SET status = 'booked', res_id = %s WHERE wait_id = %s AND status = 'booking'",
+            (res_id, wait_id),
+        )
+        return res_id
+
+    def cancel_waitlist_entry(self, wait_id: int):
+        """Drop an open entry; rooms it was holding are offered to the next entries."""
+        row = self.execute(
+            """
+            UPDATE waitlist w
+            SET status = 'canceled'
+            FROM (SELECT wait_id, status, matched_rooms FROM waitlist WHERE wait_id = %s FOR UPDATE) old
+            WHERE w.wait_id = old.wait_id AND old.status IN ('waiting', 'matched')
+            RETURNING w.check_in, w.check_out, old.status AS was, old.matched_rooms AS held
+            """,
+            (wait_id,),
+            fetchone=True,
+        )
+        if row and row["was"] == "matched":
+            self.match_waitlist(row["check_in"], row["check_out"], room_ids=row["held"])
+        return bool(row)
+
+    def get_subscriptions(self, chat_id: int):
+        # from the primary: the bot redraws the toggles right after set_subscription()
+        with self.pinned_to_primary():
+            rows = self.execute(
+                "SELECT event FROM bot_subscription WHERE chat_id = %s",
+                (chat_id,),
+                fetch=True,
+                readonly=True,
+            )
+        return {r["event"] for r in rows or []}
+
+    def set_subscription(self, chat_id: int, event: str, enabled: bool):
+        if enabled:
+            self.execute(
+                """
+                INSERT INTO bot_subscription (chat_id, event) VALUES (%s,%s)
+                ON CONFLICT (chat_id, event) DO NOTHING
+                """,
+                (chat_id, event),
+                invalidate=False,
+            )
+        else:
+            self.execute(
+                "DELETE FROM bot_subscription WHERE chat_id = %s AND event = %s",
+                (chat_id, event),
+                invalidate=False,
+            )
+
+    def remove_subscriber(self, chat_id: int):
+        self.execute("DELETE FROM bot_subscription WHERE chat_id = %s", (chat_id,), invalidate=False)
+
+    def get_subscribers(self, events):
+        """{event: [chat_id, ...]} for the given event types."""
+        rows = self.execute(
+            """
+            SELECT event, chat_id
+            FROM bot_subscription
+            WHERE event = ANY(%s)
+            ORDER BY event, chat_id
+            """,
+            (list(events),),
+            fetch=True,
+            readonly=True,
+        )
+        subscribers = {}
+        for r in rows or []:
+            subscribers.setdefault(r["event"], []).append(r["chat_id"])
+        return subscribers
+
+    def get_bot_session(self, chat_id: int):
+        """Unexpired session row {emp_id, data, ttl_left} for a chat, or None."""
+        # from the primary: a replica may not have the login saved a moment ago
+        with self.pinned_to_primary():
+            return self.execute(
+                """
+                SELECT emp_id, data, EXTRACT(EPOCH FROM expires_at - NOW()) AS ttl_left
+                FROM bot_session
+                WHERE chat_id = %s AND expires_at > NOW()
+                """,
+                (chat_id,),
+                fetchone=True,
+                readonly=True,
+            )
+
+    def save_bot_session(self, chat_id: int, emp_id, data: dict, ttl_seconds: int):
+        self.execute(
+            """
+            INSERT INTO bot_session (chat_id, emp_id, data, expires_at)
+            VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+            ON CONFLICT (chat_id) DO UPDATE
+            SET emp_id = EXCLUDED.emp_id, data = EXCLUDED.data, expires_at = EXCLUDED.expires_at
+            """,
+            (chat_id, emp_id, Json(data), ttl_seconds),
+            invalidate=False,
+        )
+
+    def touch_bot_session(self, chat_id: int, ttl_seconds: int):
+        self.execute(
+            """
+            UPDATE bot_session
+            SET expires_at = NOW() + make_interval(secs => %s)
+            WHERE chat_id = %s AND expires_at > NOW()
+            """,
+            (ttl_seconds, chat_id),
+            invalidate=False,
+        )
+
+    def delete_bot_session(self, chat_id: int):
+        self.execute("DELETE FROM bot_session WHERE chat_id = %s", (chat_id,), invalidate=False)
+
+    def purge_bot_sessions(self):
+        """Delete expired bot sessions. Returns how many."""
+        rows = self.execute(
+            "DELETE FROM bot_session WHERE expires_at <= NOW() RETURNING chat_id",
+            fetch=True,
+            invalidate=False,
+        )
+        return len(rows or [])
+
+    def get_cleaning_rooms(self, limit=50, after=None):
+        """Rooms being cleaned, by floor; after=(floor, room_id) of the last row seen gives the next page."""
+        where = "status = 'cleaning'"
+        params = []
+        if after is not None:
+            where += " AND (floor, room_id) > (%s, %s)"
+            params.extend(after)
+        params.append(limit)
+        return self.execute(
+            f"""
             SELECT room_id, type, floor, bed_type, capacity, price, features
             FROM room
-            WHERE status = 'cleaning'
+            WHERE {where}
             ORDER BY floor, room_id
             LIMIT %s
             """,
-            (limit,),
+            params,
             fetch=True,
+            compact=True,
+            readonly=True,
         )
 
+    def get_room_status_counts(self):
+        """Room counts per status plus active reservations, in one query (bot quick status)."""
+
+        def load():
+            return self.execute(
+                """
+                SELECT COUNT(*) AS total_rooms,
+                       COUNT(*) FILTER (WHERE status = 'available') AS available_rooms,
+                       COUNT(*) FILTER (WHERE status = 'cleaning') AS cleaning_rooms,
+                       COUNT(*) FILTER (WHERE status = 'reserved') AS reserved_rooms,
+                       COUNT(*) FILTER (WHERE status = 'occupied') AS occupied_rooms,
+                       (SELECT COUNT(*) FROM reservation WHERE status = 'active') AS active_reservations
+                FROM room
+                """,
+                fetchone=True,
+                readonly=True,
+            )
+
+        return self._cached("room_status_counts", load)
+
     def get_stats(self):
-        conn = self.get_connection()
+        try:
+            return self._cached("stats", self._load_stats)
+        except Error as e:
+            print(f"Error getting stats: {e}")
+            return {
+                "total_guests": 0,
+                "total_rooms": 0,
+                "available_rooms": 0,
+                "active_reservations": 0,
+                "total_payments": 0,
+                "total_revenue": 0,
+            }
+
+    def _load_stats(self):
+        conn = self.get_connection(readonly=True)
         try:
             with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) AS c FROM guest")
+                # archived guests (archive.py) still count
+                cur.execute("SELECT (SELECT COUNT(*) FROM guest) + (SELECT COUNT(*) FROM guest_history) AS c")
                 total_guests = cur.fetchone()["c"]
 
                 cur.execute("SELECT COUNT(*) AS c FROM room")
@@ -848,11 +2464,18 @@ class Database:
 
                 available_rooms = max(0, total_rooms - occupied_rooms)
 
-                cur.execute("SELECT COALESCE(SUM(payment),0) AS s FROM reservation")
-                total_payments = cur.fetchone()["s"]
-
-                cur.execute("SELECT COALESCE(SUM(total_cost),0) AS s FROM reservation")
-                total_revenue = cur.fetchone()["s"]
+                # archived reservations (archive.py) only survive as monthly rollups
+                cur.execute(
+                    """
+                    SELECT (SELECT COALESCE(SUM(paid),0) FROM reservation_balance)
+                           + (SELECT COALESCE(SUM(payment),0) FROM reservation_rollup) AS payments,
+                           (SELECT COALESCE(SUM(total_cost),0) FROM reservation)
+                           + (SELECT COALESCE(SUM(total_cost),0) FROM reservation_rollup) AS revenue
+                    """
+                )
+                totals = cur.fetchone()
+                total_payments = totals["payments"]
+                total_revenue = totals["revenue"]
 
                 return {
                     "total_guests": total_guests,
@@ -862,18 +2485,8 @@ class Database:
                     "total_payments": float(total_payments),
                     "total_revenue": float(total_revenue),
                 }
-        except Error as e:
-            print(f"Error getting stats: {e}")
-            return {
-                "total_guests": 0,
-                "total_rooms": 0,
-                "available_rooms": 0,
-                "active_reservations": 0,
-                "total_payments": 0,
-                "total_revenue": 0,
-            }
         finally:
-            conn.close()
+            self.put_connection(conn)
 
     def get_employee_by_id(self, emp_id: int):
         return self.execute(
@@ -884,6 +2497,57 @@ class Database:
             """,
             (emp_id,),
             fetchone=True,
+            readonly=True,
         )
 
-db = Database()
+# Database instances a forked child inherited from its parent. Their sockets
+# are shared with the parent, and closing one sends Terminate to the parent's
+# server session, so the child keeps them here and never touches them.
+_inherited = []
+
+
+class _ProcessLocalDatabase:
+    """
+    Lazy, per-process handle to the shared Database.
+
+    Nothing is validated or connected at import time; the Database (and its
+    pool) is created on first attribute access. After a fork (gunicorn
+    --preload, multiprocessing) the child parks the inherited instance in
+    _inherited, so its connections are never closed or freed there, and
+    builds its own.
+    """
+
+    def __init__(self):
+        self._instance = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.init_seconds = None
+
+    def _get(self):
+        pid = os.getpid()
+        if self._instance is None or self._pid != pid:
+            with self._lock:
+                if self._instance is None or self._pid != pid:
+                    if self._instance is not None:
+                        _inherited.append(self._instance)
+                    started = time.perf_counter()
+                    self._instance = Database()
+                    self._pid = pid
+                    self.init_seconds = time.perf_counter() - started
+        return self._instance
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+        if self._instance is not None:
+            _inherited.append(self._instance)
+        self._instance = None
+        self._pid = None
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+db = _ProcessLocalDatabase()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=db._after_fork_in_child)
@@ -0,0 +1,365 @@
+"""
+Occupancy and revenue forecast per room type for the next FORECAST_HORIZON_DAYS nights.
+
+History comes from reservation/reservation_room plus the archived
+reservation_history/reservation_room_history partitions (archive.py), as
+booked room-nights per (room type, night, booking lead bucket). For every
+future night and type:
+
+  seasonal final   mean occupancy of the same week of the year, times a
+                   weekday factor and the recent occupancy trend
+  booking pace     P = share of a night's final occupancy that is usually
+                   already on the books this many days ahead
+  forecast rooms   on_books + (1 - P) * seasonal final, i.e. the pace-implied
+                   final (on_books / P) blended with the seasonal one by P,
+                   kept between on_books and the rooms of that type
+  revenue          rooms x average nightly rate of that week of the year,
+                   adjusted by the price trend
+
+The price trend is last year's revenue over the year before (live
+reservations plus reservation_rollup for archived months, which keep no
+per-night detail), divided by the occupancy change over the same years.
+
+Fitting is plain NumPy over (types x days x lead buckets) arrays; results
+are stored in occupancy_forecast by the refit_forecast scheduler job only.
+Readers (the dashboard, /api/forecast) never fit: they read the latest stored
+forecast through a short in-process cache.
+
+    python forecast.py            # refit now and print the next 30 nights
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import psycopg2.extensions
+from psycopg2 import Error
+
+HORIZON_DAYS = int(os.environ.get("FORECAST_HORIZON_DAYS", "365"))
+HISTORY_YEARS = int(os.environ.get("FORECAST_HISTORY_YEARS", "10"))
+CACHE_SECONDS = float(os.environ.get("FORECAST_CACHE_SECONDS", "300"))
+
+# days between booking and the night; bucket i covers [LEAD_BUCKETS[i], LEAD_BUCKETS[i + 1])
+LEAD_BUCKETS = np.array([0, 1, 2, 3, 5, 7, 10, 14, 21, 30, 45, 60, 90, 120, 180, 270, 365])
+WEEKS = 52
+MIN_PACE = 0.05
+
+REFIT_LOCK_KEY = 0x5AB4_F0CA_0001
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _weeks_and_weekdays(first: date, days: int):
+    """Week of the year (0..51) and weekday (Monday = 0) for `days` dates from `first`."""
+    d = np.datetime64(first, "D") + np.arange(days)
+    day_of_year = (d - d.astype("datetime64[Y]").astype("datetime64[D]")).astype(np.int64)
+    weekday = (d.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    return np.minimum(day_of_year // 7, WEEKS - 1), weekday
+
+
+def load(database, today=None, years=HISTORY_YEARS, horizon=HORIZON_DAYS):
+    """Read everything fit() needs in one snapshot."""
+    conn = database.get_connection(readonly=True)
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            history = _load(cur, today, years, horizon)
+        conn.commit()
+    finally:
+        database.put_connection(conn)
+    return history
+
+
+def _load(cur, today=None, years=HISTORY_YEARS, horizon=HORIZON_DAYS):
+    """load() on a tuple cursor whose transaction is already REPEATABLE READ."""
+    today = today or date.today()
+    since = today - timedelta(days=365 * years)
+    cur.execute("SELECT type, COUNT(*), AVG(price) FROM room GROUP BY type ORDER BY type")
+    rooms = cur.fetchall()
+    cur.execute(
+        """
+        WITH stays AS (
+            SELECT r.check_in, r.check_out, r.booking_date::date AS booked, r.total_cost, rr.room_id,
+                   COUNT(*) OVER (PARTITION BY r.res_id) AS res_rooms
+            FROM reservation r
+            JOIN reservation_room rr ON rr.res_id = r.res_id
+            WHERE r.status <> 'canceled' AND r.check_out > %(since)s AND r.check_in < %(today)s
+            UNION ALL
+            SELECT h.check_in, h.check_out, h.booking_date::date, h.total_cost, rh.room_id,
+                   COUNT(*) OVER (PARTITION BY h.res_id, h.check_out)
+            FROM reservation_history h
+            JOIN reservation_room_history rh ON rh.res_id = h.res_id AND rh.check_out = h.check_out
+            WHERE h.status = 'finished' AND h.check_out > %(since)s
+        )
+        SELECT rm.type,
+               d::date - %(since)s::date AS day,
+               width_bucket(LEAST(GREATEST(d::date - s.booked, 0), 365), %(buckets)s::int[]) - 1 AS bucket,
+               COUNT(*) AS rooms,
+               SUM(s.total_cost / (s.res_rooms * (s.check_out - s.check_in))) AS revenue
+        FROM stays s
+        JOIN room rm ON rm.room_id = s.room_id
+        CROSS JOIN LATERAL generate_series(
+            GREATEST(s.check_in, %(since)s::date), LEAST(s.check_out, %(today)s::date) - 1, INTERVAL '1 day'
+        ) d
+        GROUP BY 1, 2, 3
+        """,
+        {"since": since, "today": today, "buckets": LEAD_BUCKETS.tolist()},
+    )
+    nights = cur.fetchall()
+    cur.execute(
+        """
+        SELECT rm.type, n.night - %(today)s::date, COUNT(*)
+        FROM room_night n
+        JOIN room rm ON rm.room_id = n.room_id
+        WHERE n.night >= %(today)s AND n.night < %(today)s::date + %(horizon)s
+        GROUP BY 1, 2
+        """,
+        {"today": today, "horizon": horizon},
+    )
+    on_books = cur.fetchall()
+    # monthly revenue incl. archived months (rollups); for the price trend only
+    cur.execute(
+        """
+        SELECT month >= %(year_ago)s AS recent, SUM(total) FROM (
+            SELECT date_trunc('month', check_out)::date AS month, total_cost AS total
+            FROM reservation
+            WHERE status <> 'canceled' AND check_out >= %(two_years_ago)s AND check_out < %(month)s
+            UNION ALL
+            SELECT month, total_cost FROM reservation_rollup
+            WHERE month >= %(two_years_ago)s AND month < %(month)s
+        ) t
+        GROUP BY 1
+        """,
+        {
+            "month": today.replace(day=1),
+            "year_ago": today.replace(day=1) - timedelta(days=365),
+            "two_years_ago": today.replace(day=1) - timedelta(days=730),
+        },
+    )
+    revenue_years = dict(cur.fetchall())
+    return {
+        "today": today,
+        "since": since,
+        "rooms": rooms,
+        "nights": nights,
+        "on_books": on_books,
+        "revenue_years": revenue_years,
+    }
+
+
+def fit(history, horizon=HORIZON_DAYS):
+    """
+    Forecast arrays from load()'s output: {"types", "first_night", "capacity"[T],
+    "on_books"[T, F], "rooms"[T, F], "revenue"[T, F]} for F = horizon nights.
+    """
+    today, since = history["today"], history["since"]
+    types = [r[0] for r in history["rooms"]]
+    t_of = {t: i for i, t in enumerate(types)}
+    capacity = np.array([r[1] for r in history["rooms"]], dtype=np.float64)
+    list_price = np.array([float(r[2] or 0) for r in history["rooms"]])
+    n_types, n_days, n_buckets = len(types), (today - since).days, len(LEAD_BUCKETS)
+
+    sold = np.zeros((n_types, n_days, n_buckets))
+    revenue = np.zeros((n_types, n_days))
+    rows = [r for r in history["nights"] if r[0] in t_of]
+    if rows:
+        ti = np.array([t_of[r[0]] for r in rows])
+        day = np.array([r[1] for r in rows])
+        bucket = np.array([r[2] for r in rows])
+        np.add.at(sold, (ti, day, bucket), np.array([r[3] for r in rows], dtype=np.float64))
+        np.add.at(revenue, (ti, day), np.array([float(r[4] or 0) for r in rows]))
+    final = sold.sum(axis=2)
+
+    # only days since the first recorded stay count as history
+    booked_days = np.flatnonzero(final.sum(axis=0))
+    first = booked_days[0] if booked_days.size else n_days
+    valid = np.arange(n_days) >= first
+    week, weekday = _weeks_and_weekdays(since, n_days)
+    occ = np.minimum(final / np.maximum(capacity, 1)[:, None], 1.0)
+
+    # booking pace: share of final rooms already booked at least LEAD_BUCKETS[b] days ahead
+    ahead = sold[:, valid][:, :, ::-1].cumsum(axis=2)[:, :, ::-1].sum(axis=1)
+    total = final[:, valid].sum(axis=1)
+    pace = np.where(total[:, None] > 0, ahead / np.maximum(total, 1)[:, None], 1.0)
+
+    # seasonality: week-of-year level x weekday factor x recent trend
+    mean_occ = np.array([occ[t, valid].mean() if valid.any() else 0.0 for t in range(n_types)])
+    week_occ = np.empty((n_types, WEEKS))
+    weekday_factor = np.ones((n_types, 7))
+    week_adr = np.empty((n_types, WEEKS))
+    overall_adr = np.where(total > 0, revenue[:, valid].sum(axis=1) / np.maximum(total, 1), list_price)
+    week_days = np.bincount(week[valid], minlength=WEEKS)
+    weekday_days = np.bincount(weekday[valid], minlength=7)
+    for t in range(n_types):
+        by_week = np.bincount(week[valid], weights=occ[t, valid], minlength=WEEKS)
+        week_occ[t] = np.where(week_days > 0, by_week / np.maximum(week_days, 1), mean_occ[t])
+        if mean_occ[t] > 0:
+            by_weekday = np.bincount(weekday[valid], weights=occ[t, valid], minlength=7)
+            weekday_factor[t] = np.where(weekday_days > 0, by_weekday / np.maximum(weekday_days, 1) / mean_occ[t], 1.0)
+        week_rooms = np.bincount(week[valid], weights=final[t, valid], minlength=WEEKS)
+        week_rev = np.bincount(week[valid], weights=revenue[t, valid], minlength=WEEKS)
+        week_adr[t] = np.where(week_rooms > 0, week_rev / np.maximum(week_rooms, 1), overall_adr[t])
+
+    occ_trend = np.ones(n_types)
+    price_trend = 1.0
+    if valid.sum() >= 730:
+        recent = occ[:, -365:].mean(axis=1)
+        occ_trend = np.clip(np.where(mean_occ > 0, recent / np.maximum(mean_occ, 1e-9), 1.0), 0.5, 1.5)
+        sold_recent, sold_before = final[:, -365:].sum(), final[:, -730:-365].sum()
+        rev = history["revenue_years"]
+        if sold_before > 0 and rev.get(False) and rev.get(True):
+            revenue_change = float(rev[True]) / float(rev[False])
+            price_trend = float(np.clip(revenue_change / (sold_recent / sold_before), 0.8, 1.25))
+
+    # future nights
+    lead = np.arange(horizon)
+    f_week, f_weekday = _weeks_and_weekdays(today, horizon)
+    f_bucket = np.searchsorted(LEAD_BUCKETS, lead, side="right") - 1
+    on_books = np.zeros((n_types, horizon))
+    for t, offset, count in history["on_books"]:
+        if t in t_of and 0 <= offset < horizon:
+            on_books[t_of[t], offset] = count
+
+    seasonal = np.clip(week_occ[:, f_week] * weekday_factor[:, f_weekday] * occ_trend[:, None], 0.0, 1.0)
+    seasonal_rooms = seasonal * capacity[:, None]
+    share_booked = np.maximum(pace[:, f_bucket], MIN_PACE)
+    rooms = np.clip(on_books + (1.0 - share_booked) * seasonal_rooms, on_books, capacity[:, None])
+    return {
+        "types": types,
+        "first_night": today,
+        "capacity": capacity,
+        "on_books": on_books,
+        "rooms": rooms,
+        "revenue": rooms * week_adr[:, f_week] * price_trend,
+        "history_days": int(valid.sum()),
+    }
+
+
+def refit(database, horizon=HORIZON_DAYS):
+    """
+    Fit and replace occupancy_forecast. Returns a summary, or None if another
+    process is refitting right now. The lock is taken before anything is read,
+    and history is read in the same transaction that stores the result.
+    """
+    started = time.perf_counter()
+    conn = database.get_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (REFIT_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return None
+            result = fit(_load(cur, horizon=horizon), horizon)
+            fit_ms = (time.perf_counter() - started) * 1000
+
+            n_types = len(result["types"])
+            nights = [result["first_night"] + timedelta(days=int(i)) for i in range(horizon)] * n_types
+            types = [t for t in result["types"] for _ in range(horizon)]
+            capacity = np.repeat(result["capacity"], horizon)
+            rooms = result["rooms"].ravel()
+            cur.execute("DELETE FROM occupancy_forecast")
+            cur.execute(
+                """
+                INSERT INTO occupancy_forecast (night, room_type, capacity, on_books, rooms, revenue)
+                SELECT * FROM unnest(%s::date[], %s::varchar[], %s::int[], %s::int[], %s::numeric[], %s::numeric[])
+                """,
+                (
+                    nights,
+                    types,
+                    capacity.astype(int).tolist(),
+                    result["on_books"].ravel().astype(int).tolist(),
+                    np.round(rooms, 2).tolist(),
+                    np.round(result["revenue"].ravel(), 2).tolist(),
+                ),
+            )
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        database.put_connection(conn)
+    with _cache_lock:
+        _cache.clear()
+    return {
+        "types": n_types,
+        "nights": horizon,
+        "history_days": result["history_days"],
+        "fit_ms": round(fit_ms, 1),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _read(database, days, room_type):
+    return database.execute(
+        """
+        SELECT night, room_type, capacity, on_books, rooms, revenue, fitted_at
+        FROM occupancy_forecast
+        WHERE night >= CURRENT_DATE AND night < CURRENT_DATE + %s
+          AND (%s::varchar IS NULL OR room_type = %s)
+        ORDER BY night, room_type
+        """,
+        (days, room_type, room_type),
+        fetch=True,
+        readonly=True,
+    )
+
+
+def get_forecast(database, days=90, room_type=None):
+    """
+    [{night, room_type, capacity, on_books, rooms, revenue, fitted_at}] for
+    the next `days` nights, as last stored by refit(); empty until it has run.
+    """
+    days = max(1, min(int(days), HORIZON_DAYS))
+    key = (days, room_type)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+    rows = _read(database, days, room_type)
+    with _cache_lock:
+        _cache[key] = (now + CACHE_SECONDS, rows)
+    return rows
+
+
+def by_night(rows):
+    """Hotel-wide [{night, capacity, on_books, rooms, occupancy, revenue}] from get_forecast() rows."""
+    out = {}
+    for r in rows:
+        n = out.setdefault(r["night"], {"night": r["night"], "capacity": 0, "on_books": 0, "rooms": 0.0, "revenue": 0.0})
+        n["capacity"] += r["capacity"]
+        n["on_books"] += r["on_books"]
+        n["rooms"] += float(r["rooms"])
+        n["revenue"] += float(r["revenue"])
+    for n in out.values():
+        n["occupancy"] = n["rooms"] / n["capacity"] if n["capacity"] else 0.0
+    return list(out.values())
+
+
+def by_month(rows):
+    """Hotel-wide [{month, nights, occupancy, revenue}] from get_forecast() rows."""
+    out = {}
+    for n in by_night(rows):
+        month = n["night"].replace(day=1)
+        m = out.setdefault(month, {"month": month, "nights": 0, "room_nights": 0.0, "capacity": 0, "revenue": 0.0})
+        m["nights"] += 1
+        m["room_nights"] += n["rooms"]
+        m["capacity"] += n["capacity"]
+        m["revenue"] += n["revenue"]
+    for m in out.values():
+        m["occupancy"] = m["room_nights"] / m["capacity"] if m["capacity"] else 0.0
+    return list(out.values())
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from database import db
+
+    print(refit(db))
+    for n in by_night(get_forecast(db, days=30)):
+        print(f"{n['night']}  {n['occupancy']:6.1%}  on books {n['on_books']:4d}  revenue {n['revenue']:12,.0f}")
@@ -0,0 +1,95 @@
+"""
+Partition management for finished/canceled reservation history.
+
+reservation_history, reservation_room_history and payment_history are
+range-partitioned by check_out year (see migrations.py, versions 3 and 16). Live reads stay on the
+reservation table and its partial "active" indexes; history partitions can
+be detached and archived a year at a time.
+"""
+from psycopg2 import Error
+
+HISTORY_TABLES = ("reservation_history", "reservation_room_history", "payment_history")
+
+
+def partition_name(table: str, year: int) -> str:
+    return f"{table}_{int(year)}"
+
+
+def create_history_partitions(cur, year: int):
+    """Cursor-level variant of ensure_history_partitions for callers already in a transaction."""
+    year = int(year)
+    for table in HISTORY_TABLES:
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(table, year)}
+            PARTITION OF {table}
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+            """
+        )
+
+
+def ensure_history_partitions(database, year: int):
+    """Create the yearly partitions of every history table if they do not exist."""
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            create_history_partitions(cur, year)
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        database.put_connection(conn)
+
+
+def list_history_partitions(database):
+    """
+    Returns [{table, partition, year, rows}] for attached partitions.
+    rows is the planner estimate (pg_class.reltuples), good enough for ops pages.
+    """
+    rows = database.execute(
+        """
+        SELECT p.relname AS table, c.relname AS partition, c.reltuples::BIGINT AS rows
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = ANY(%s)
+        ORDER BY c.relname
+        """,
+        (list(HISTORY_TABLES),),
+        fetch=True,
+    )
+    for r in rows:
+        r["year"] = int(r["partition"].rsplit("_", 1)[1])
+    return rows
+
+
+def detach_history_partition(database, year: int):
+    """
+    Detach one year of history from every parent so it can be dumped, moved to
+    cheaper storage or dropped. Uses DETACH ... CONCURRENTLY (PostgreSQL 14+),
+    which cannot run inside a transaction block.
+    """
+    conn = database.get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for table in HISTORY_TABLES:
+                cur.execute(
+                    """
+                    SELECT 1
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE c.relname = %s
+                    """,
+                    (partition_name(table, year),),
+                )
+                if not cur.fetchone():
+                    continue
+                cur.execute(
+                    f"ALTER TABLE {table} DETACH PARTITION {partition_name(table, year)} CONCURRENTLY"
+                )
+    finally:
+        if not conn.closed:
+            conn.autocommit = False
+        database.put_connection(conn)
@@ -0,0 +1,744 @@
+"""
+Versioned schema migrations for the hotel database.
+
+Applied versions are recorded in schema_migrations. Migrations marked
+concurrent run in autocommit mode so CREATE INDEX CONCURRENTLY can build
+indexes without blocking writes on a live database.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show applied / pending versions
+"""
+import re
+import sys
+import time
+
+from psycopg2 import Error
+
+# session-level advisory lock key so two deploys never migrate at once
+MIGRATION_LOCK_KEY = 742001
+# seconds between attempts to take it while another node migrates
+MIGRATION_LOCK_POLL_SECONDS = 1.0
+
+# (version, name, concurrent, statements)
+MIGRATIONS = [
+    (
+        1,
+        "hot path indexes",
+        True,
+        [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservation_guest_id ON reservation (guest_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservation_room_room_id ON reservation_room (room_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_room_status_floor ON room (status, floor, room_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_guest_family_name ON guest (family, name)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_guest_address_guest_id ON guest_address (guest_id)",
+        ],
+    ),
+    (
+        2,
+        "partial indexes on active reservations",
+        True,
+        [
+            # almost every read filters status = 'active'; index only those rows so
+            # the index stays small however much finished/canceled history piles up
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservation_active ON reservation (res_id DESC) WHERE status = 'active'",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservation_active_guest ON reservation (guest_id) WHERE status = 'active'",
+            # replaced by the partial indexes; only databases migrated by an older version 1 have it
+            "DROP INDEX CONCURRENTLY IF EXISTS idx_reservation_status",
+        ],
+    ),
+    (
+        3,
+        "reservation history partitioned by check_out",
+        False,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS reservation_history (
+                res_id INT NOT NULL,
+                guest_id INT NOT NULL,
+                emp_id INT NOT NULL,
+                check_in DATE NOT NULL,
+                check_out DATE NOT NULL,
+                booking_date TIMESTAMP NOT NULL,
+                num_people INT NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                total_cost NUMERIC(10,2) NOT NULL,
+                payment NUMERIC(10,2) NOT NULL,
+                discount NUMERIC(5,2) NOT NULL,
+                archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                CONSTRAINT chk_res_history_status CHECK (status IN ('canceled','finished')),
+                PRIMARY KEY (res_id, check_out)
+            ) PARTITION BY RANGE (check_out)
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS reservation_room_history (
+                res_id INT NOT NULL,
+                room_id INT NOT NULL,
+                check_out DATE NOT NULL,
+                PRIMARY KEY (res_id, room_id, check_out)
+            ) PARTITION BY RANGE (check_out)
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_reservation_history_guest ON reservation_history (guest_id)",
+            "CREATE INDEX IF NOT EXISTS idx_reservation_room_history_room ON reservation_room_history (room_id)",
+        ],
+    ),
+    (
+        4,
+        "monthly rollup of archived reservations",
+        False,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS reservation_rollup (
+                month DATE PRIMARY KEY,
+                reservations INT NOT NULL DEFAULT 0,
+                total_cost NUMERIC(14,2) NOT NULL DEFAULT 0,
+                payment NUMERIC(14,2) NOT NULL DEFAULT 0
+            )
+            """,
+        ],
+    ),
+    (
+        5,
+        "arrival and departure queues",
+        True,
+        [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservation_arrivals ON reservation (check_in) WHERE status = 'active'",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservation_departures ON reservation (check_out) WHERE status = 'active'",
+        ],
+    ),
+    (
+        6,
+        "scheduler job bookkeeping",
+        False,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS scheduler_job (
+                name VARCHAR(64) PRIMARY KEY,
+                last_started_at TIMESTAMP,
+                last_finished_at TIMESTAMP,
+                last_duration_ms INT,
+                last_error TEXT,
+                runs INT NOT NULL DEFAULT 0
+            )
+            """,
+        ],
+    ),
+    (
+        7,
+        "per-night room inventory",
+        False,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS room_night (
+                room_id INT NOT NULL,
+                night DATE NOT NULL,
+                res_id INT NOT NULL,
+                PRIMARY KEY (room_id, night),
+                CONSTRAINT fk_room_night_room FOREIGN KEY (room_id) REFERENCES room(room_id) ON DELETE CASCADE,
+                CONSTRAINT fk_room_night_res FOREIGN KEY (res_id) REFERENCES reservation(res_id) ON DELETE CASCADE
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_room_night_night ON room_night (night)",
+            "CREATE INDEX IF NOT EXISTS idx_room_night_res ON room_night (res_id)",
+            # backfill from existing active reservations (same as Database.backfill_room_nights)
+            """
+            INSERT INTO room_night (room_id, night, res_id)
+            SELECT DISTINCT ON (rr.room_id, d::date) rr.room_id, d::date, r.res_id
+            FROM reservation r
+            JOIN reservation_room rr ON rr.res_id = r.res_id
+            CROSS JOIN LATERAL generate_series(r.check_in, r.check_out - 1, INTERVAL '1 day') d
+            WHERE r.status = 'active'
+            ORDER BY rr.room_id, d::date, r.res_id
+            ON CONFLICT (room_id, night) DO NOTHING
+            """,
+        ],
+    ),
+    (
+        8,
+        "bot event subscriptions and change feed",
+        False,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS bot_subscription (
+                chat_id BIGINT NOT NULL,
+                event VARCHAR(32) NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (chat_id, event)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_bot_subscription_event ON bot_subscription (event)",
+            # overdue check-outs already announced (one notice per reservation)
+            """
+            CREATE TABLE IF NOT EXISTS overdue_notice (
+                res_id INT PRIMARY KEY,
+                notified_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                CONSTRAINT fk_overdue_notice_res FOREIGN KEY (res_id) REFERENCES reservation(res_id) ON DELETE CASCADE
+            )
+            """,
+            """
+            CREATE OR REPLACE FUNCTION notify_room_cleaning() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('hotel_events', json_build_object(
+                    'event', 'room_cleaning', 'room_id', NEW.room_id, 'floor', NEW.floor)::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_room_cleaning ON room",
+            """
+            CREATE TRIGGER trg_room_cleaning
+            AFTER UPDATE OF status ON room
+            FOR EACH ROW
+            WHEN (NEW.status = 'cleaning' AND OLD.status IS DISTINCT FROM 'cleaning')
+            EXECUTE FUNCTION notify_room_cleaning()
+            """,
+            """
+            CREATE OR REPLACE FUNCTION notify_reservation_created() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('hotel_events', json_build_object(
+                    'event', 'reservation_created', 'res_id', NEW.res_id,
+                    'check_in', NEW.check_in, 'check_out', NEW.check_out)::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_reservation_created ON reservation",
+            """
+            CREATE TRIGGER trg_reservation_created
+            AFTER INSERT ON reservation
+            FOR EACH ROW
+            EXECUTE FUNCTION notify_reservation_created()
+            """,
+        ],
+    ),
+    (
+        9,
+        "bot sessions",
+        False,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS bot_session (
+                chat_id BIGINT PRIMARY KEY,
+                emp_id INT,
+                data JSONB NOT NULL DEFAULT '{}',
+                expires_at TIMESTAMP NOT NULL,
+                CONSTRAINT fk_bot_session_emp FOREIGN KEY (emp_id) REFERENCES employee(emp_id) ON DELETE CASCADE
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_bot_session_expires ON bot_session (expires_at)",
+        ],
+    ),
+    (
+        10,
+        "inventory version counter",
+        False,
+        [
+            # bumped by every statement that changes room_night or a room's bookable
+            # attributes; in-process availability indexes compare it to know they are stale
+            """
+            CREATE TABLE IF NOT EXISTS inventory_version (
+                id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                version BIGINT NOT NULL DEFAULT 0
+            )
+            """,
+            "INSERT INTO inventory_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+            """
+            CREATE OR REPLACE FUNCTION bump_inventory_version() RETURNS trigger AS $$
+            BEGIN
+                UPDATE inventory_version SET version = version + 1 WHERE id = 1;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_room_night_version ON room_night",
+            """
+            CREATE TRIGGER trg_room_night_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON room_night
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION bump_inventory_version()
+            """,
+            "DROP TRIGGER IF EXISTS trg_room_version ON room",
+            """
+            CREATE TRIGGER trg_room_version
+            AFTER INSERT OR DELETE OR UPDATE OF room_id, type, capacity, floor, bed_type, smoking OR TRUNCATE ON room
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION bump_inventory_version()
+            """,
+        ],
+    ),
+    (
+        11,
+        "reservation room_locked",
+        False,
+        [
+            # guest asked for this exact room: the assignment optimizer must not move it
+            "ALTER TABLE reservation ADD COLUMN IF NOT EXISTS room_locked BOOLEAN NOT NULL DEFAULT FALSE",
+        ],
+    ),
+    (
+        12,
+        "waitlist",
+        False,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS waitlist (
+                wait_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                guest_id INTEGER NOT NULL REFERENCES guest(guest_id) ON DELETE CASCADE,
+                emp_id INTEGER NOT NULL REFERENCES employee(emp_id),
+                check_in DATE NOT NULL,
+                check_out DATE NOT NULL,
+                room_type VARCHAR(50),
+                min_capacity INTEGER,
+                rooms INTEGER NOT NULL DEFAULT 1 CHECK (rooms > 0),
+                num_people INTEGER NOT NULL,
+                status VARCHAR(10) NOT NULL DEFAULT 'waiting'
+                    CHECK (status IN ('waiting', 'matched', 'booked', 'canceled')),
+                matched_rooms INTEGER[],
+                res_id INTEGER REFERENCES reservation(res_id) ON DELETE SET NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT now(),
+                matched_at TIMESTAMP,
+                CHECK (check_out > check_in)
+            )
+            """,
+            # matching only looks at open entries overlapping the freed nights
+            """
+            CREATE INDEX IF NOT EXISTS idx_waitlist_waiting_dates
+            ON waitlist USING gist (daterange(check_in, check_out))
+            WHERE status = 'waiting'
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_waitlist_matched_dates
+            ON waitlist USING gist (daterange(check_in, check_out))
+            WHERE status = 'matched'
+            """,
+            """
+            CREATE OR REPLACE FUNCTION notify_waitlist_matched() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('hotel_events', json_build_object(
+                    'event', 'waitlist_matched', 'wait_id', NEW.wait_id, 'rooms', NEW.matched_rooms,
+                    'check_in', NEW.check_in, 'check_out', NEW.check_out)::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_waitlist_matched ON waitlist",
+            """
+            CREATE TRIGGER trg_waitlist_matched
+            AFTER UPDATE OF status ON waitlist
+            FOR EACH ROW
+            WHEN (NEW.status = 'matched' AND OLD.status IS DISTINCT FROM 'matched')
+            EXECUTE FUNCTION notify_waitlist_matched()
+            """,
+        ],
+    ),
+    (
+        13,
+        "occupancy forecast",
+        False,
+        [
+            # written by forecast.refit(), read by the dashboard and /api/forecast
+            """
+            CREATE TABLE IF NOT EXISTS occupancy_forecast (
+                night DATE NOT NULL,
+                room_type VARCHAR(50) NOT NULL,
+                capacity INTEGER NOT NULL,
+                on_books INTEGER NOT NULL,
+                rooms NUMERIC(8,2) NOT NULL,
+                revenue NUMERIC(14,2) NOT NULL,
+                fitted_at TIMESTAMP NOT NULL DEFAULT now(),
+                PRIMARY KEY (night, room_type)
+            )
+            """,
+        ],
+    ),
+    (
+        14,
+        "idempotency keys",
+        False,
+        [
+            # one row per retried-safe write (reservation, payment); purged by the scheduler
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_key (
+                scope VARCHAR(20) NOT NULL,
+                key VARCHAR(100) NOT NULL,
+                request_hash CHAR(64),
+                result JSONB,
+                created_at TIMESTAMP NOT NULL DEFAULT now(),
+                expires_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_idempotency_key_expires ON idempotency_key (expires_at)",
+        ],
+    ),
+    (
+        15,
+        "payment ledger",
+        False,
+        [
+            # append-only: corrections are new postings (negative amounts for refunds)
+            """
+            CREATE TABLE IF NOT EXISTS payment (
+                payment_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                res_id INTEGER NOT NULL REFERENCES reservation(res_id) ON DELETE CASCADE,
+                amount NUMERIC(10,2) NOT NULL CHECK (amount <> 0),
+                method VARCHAR(20) NOT NULL DEFAULT 'cash'
+                    CHECK (method IN ('cash', 'card', 'transfer', 'other')),
+                emp_id INTEGER REFERENCES employee(emp_id) ON DELETE SET NULL,
+                reference VARCHAR(100),
+                posted_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_payment_res ON payment (res_id)",
+            # paid total per reservation, kept by the statement trigger below
+            """
+            CREATE TABLE IF NOT EXISTS reservation_balance (
+                res_id INTEGER PRIMARY KEY REFERENCES reservation(res_id) ON DELETE CASCADE,
+                paid NUMERIC(12,2) NOT NULL DEFAULT 0,
+                postings INTEGER NOT NULL DEFAULT 0,
+                last_posted_at TIMESTAMP
+            )
+            """,
+            # one upsert per reservation per INSERT statement, however many
+            # postings it carries; res_id order keeps concurrent batches from deadlocking
+            """
+            CREATE OR REPLACE FUNCTION apply_payment_postings() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO reservation_balance (res_id, paid, postings, last_posted_at)
+                SELECT res_id, SUM(amount), COUNT(*), MAX(posted_at)
+                FROM posted
+                GROUP BY res_id
+                ORDER BY res_id
+                ON CONFLICT (res_id) DO UPDATE SET
+                    paid = reservation_balance.paid + EXCLUDED.paid,
+                    postings = reservation_balance.postings + EXCLUDED.postings,
+                    last_posted_at = GREATEST(reservation_balance.last_posted_at, EXCLUDED.last_posted_at);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_payment_posted ON payment",
+            """
+            CREATE TRIGGER trg_payment_posted
+            AFTER INSERT ON payment
+            REFERENCING NEW TABLE AS posted
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION apply_payment_postings()
+            """,
+            """
+            CREATE OR REPLACE FUNCTION payment_is_append_only() RETURNS trigger AS $$
+            BEGIN
+                RAISE EXCEPTION 'payment is append-only; post a correcting entry instead';
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_payment_append_only ON payment",
+            """
+            CREATE TRIGGER trg_payment_append_only
+            BEFORE UPDATE ON payment
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION payment_is_append_only()
+            """,
+            # what was paid so far becomes the opening posting; reservation.payment stays 0 from now on
+            """
+            INSERT INTO payment (res_id, amount, method, emp_id, reference, posted_at)
+            SELECT res_id, payment, 'other', emp_id, 'opening balance', booking_date
+            FROM reservation
+            WHERE payment > 0
+            """,
+            "UPDATE reservation SET payment = 0 WHERE payment <> 0",
+        ],
+    ),
+    (
+        16,
+        "payment ledger history",
+        False,
+        [
+            # a reservation with postings can no longer be deleted out from under them
+            "ALTER TABLE payment DROP CONSTRAINT IF EXISTS payment_res_id_fkey",
+            "ALTER TABLE payment DROP CONSTRAINT IF EXISTS fk_payment_res",
+            """
+            ALTER TABLE payment ADD CONSTRAINT fk_payment_res
+            FOREIGN KEY (res_id) REFERENCES reservation(res_id) ON DELETE RESTRICT
+            """,
+            # DELETE is refused like UPDATE, except for archive.py moving postings to history
+            """
+            CREATE OR REPLACE FUNCTION payment_is_append_only() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' AND current_setting('hotel.archiving', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                RAISE EXCEPTION 'payment is append-only; post a correcting entry instead';
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_payment_append_only ON payment",
+            """
+            CREATE TRIGGER trg_payment_append_only
+            BEFORE UPDATE OR DELETE ON payment
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION payment_is_append_only()
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS payment_history (
+                payment_id BIGINT NOT NULL,
+                res_id INT NOT NULL,
+                amount NUMERIC(10,2) NOT NULL,
+                method VARCHAR(20) NOT NULL,
+                emp_id INT,
+                reference VARCHAR(100),
+                posted_at TIMESTAMP NOT NULL,
+                check_out DATE NOT NULL,
+                PRIMARY KEY (payment_id, check_out)
+            ) PARTITION BY RANGE (check_out)
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_payment_history_res ON payment_history (res_id)",
+            # one payment_history partition per year already archived
+            """
+            DO $$
+            DECLARE
+                year INT;
+            BEGIN
+                FOR year IN
+                    SELECT right(c.relname, 4)::int
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    JOIN pg_class p ON p.oid = i.inhparent
+                    WHERE p.relname = 'reservation_history'
+                LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF payment_history FOR VALUES FROM (%L) TO (%L)',
+                        'payment_history_' || year, year || '-01-01', (year + 1) || '-01-01'
+                    );
+                END LOOP;
+            END;
+            $$
+            """,
+        ],
+    ),
+    (
+        17,
+        "rehydration hold",
+        False,
+        [
+            # set on reservations brought back from history: archival skips them until then
+            "ALTER TABLE reservation ADD COLUMN IF NOT EXISTS hold_until TIMESTAMP",
+            # and they are not announced as new bookings
+            "DROP TRIGGER IF EXISTS trg_reservation_created ON reservation",
+            """
+            CREATE TRIGGER trg_reservation_created
+            AFTER INSERT ON reservation
+            FOR EACH ROW
+            WHEN (NEW.hold_until IS NULL)
+            EXECUTE FUNCTION notify_reservation_created()
+            """,
+        ],
+    ),
+    (
+        18,
+        "waitlist hold expiry",
+        False,
+        [
+            # a matched entry nobody booked within WAITLIST_HOLD_HOURS gives its rooms up
+            "ALTER TABLE waitlist DROP CONSTRAINT IF EXISTS waitlist_status_check",
+            "ALTER TABLE waitlist DROP CONSTRAINT IF EXISTS chk_waitlist_status",
+            """
+            ALTER TABLE waitlist ADD CONSTRAINT chk_waitlist_status
+            CHECK (status IN ('waiting', 'matched', 'booked', 'canceled', 'expired'))
+            """,
+        ],
+    ),
+    (
+        19,
+        "waitlist booking claim",
+        False,
+        [
+            # a matched entry being turned into a reservation; only one booking may claim it
+            "ALTER TABLE waitlist DROP CONSTRAINT IF EXISTS chk_waitlist_status",
+            """
+            ALTER TABLE waitlist ADD CONSTRAINT chk_waitlist_status
+            CHECK (status IN ('waiting', 'matched', 'booking', 'booked', 'canceled', 'expired'))
+            """,
+            # handing a claimed entry back is not a new match
+            "DROP TRIGGER IF EXISTS trg_waitlist_matched ON waitlist",
+            """
+            CREATE TRIGGER trg_waitlist_matched
+            AFTER UPDATE OF status ON waitlist
+            FOR EACH ROW
+            WHEN (NEW.status = 'matched' AND OLD.status NOT IN ('matched', 'booking'))
+            EXECUTE FUNCTION notify_waitlist_matched()
+            """,
+        ],
+    ),
+    (
+        20,
+        "guest history",
+        False,
+        [
+            # guests whose stays are all archived (archive.py); phones and addresses kept as JSON
+            """
+            CREATE TABLE IF NOT EXISTS guest_history (
+                guest_id INT PRIMARY KEY,
+                name VARCHAR(50) NOT NULL,
+                family VARCHAR(50) NOT NULL,
+                national_id VARCHAR(20),
+                passport VARCHAR(20),
+                birthdate DATE NOT NULL,
+                email VARCHAR(100) NOT NULL,
+                phones JSONB NOT NULL DEFAULT '[]',
+                addresses JSONB NOT NULL DEFAULT '[]',
+                emp_ids INT[] NOT NULL DEFAULT '{}',
+                archived_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+        ],
+    ),
+]
+
+_INDEX_NAME_RE = re.compile(r"INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+
+def _ensure_migrations_table(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            duration_ms INT NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+
+def _applied_versions(cur):
+    cur.execute("SELECT version FROM schema_migrations")
+    return {r["version"] for r in cur.fetchall()}
+
+
+def _record_migration(cur, version, name, started) -> int:
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    cur.execute(
+        "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s,%s,%s)",
+        (version, name, duration_ms),
+    )
+    return duration_ms
+
+
+def _drop_invalid_index(cur, statement):
+    """
+    A CREATE INDEX CONCURRENTLY that failed half-way leaves an INVALID index
+    behind, and IF NOT EXISTS would then silently skip it. Drop it first.
+    """
+    m = _INDEX_NAME_RE.search(statement)
+    if not m:
+        return
+    cur.execute(
+        """
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+        """,
+        (m.group(1),),
+    )
+    if cur.fetchone():
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {m.group(1)}")
+
+
+def migration_status(database):
+    """Return [(version, name, applied_bool)] for every known migration."""
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            _ensure_migrations_table(cur)
+            applied = _applied_versions(cur)
+        conn.commit()
+        return [(version, name, version in applied) for version, name, _, _ in MIGRATIONS]
+    finally:
+        database.put_connection(conn)
+
+
+def _wait_for_lock(cur, verbose):
+    """
+    Take the migration lock, polling while another node holds it. Blocking
+    in pg_advisory_lock would keep a statement (and its snapshot) open, and
+    the other node's CREATE INDEX CONCURRENTLY waits for every snapshot to
+    end: both would wait forever. Between attempts this session is idle.
+    """
+    waiting = False
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s) AS ok", (MIGRATION_LOCK_KEY,))
+        if cur.fetchone()["ok"]:
+            return
+        if verbose and not waiting:
+            print("Another node is migrating; waiting for it to finish ...")
+            waiting = True
+        time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+
+
+def run_migrations(database, verbose=True):
+    """
+    Apply pending migrations in version order. Safe to run against a live
+    database and from several nodes at once: they take turns on an advisory
+    lock, and a node that waited skips what the other one applied.
+    Returns the list of versions applied by this call.
+    """
+    conn = database.get_connection()
+    done = []
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            _ensure_migrations_table(cur)
+            _wait_for_lock(cur, verbose)
+            try:
+                applied = _applied_versions(cur)
+                for version, name, concurrent, statements in MIGRATIONS:
+                    if version in applied:
+                        continue
+                    started = time.perf_counter()
+                    if concurrent:
+                        # each statement is idempotent; a crash just re-runs it next time
+                        for stmt in statements:
+                            _drop_invalid_index(cur, stmt)
+                            cur.execute(stmt)
+                        duration_ms = _record_migration(cur, version, name, started)
+                    else:
+                        # recorded in the same transaction: applied and recorded, or neither
+                        cur.execute("BEGIN")
+                        try:
+                            for stmt in statements:
+                                cur.execute(stmt)
+                            duration_ms = _record_migration(cur, version, name, started)
+                        except Error:
+                            cur.execute("ROLLBACK")
+                            raise
+                        cur.execute("COMMIT")
+                    done.append(version)
+                    if verbose:
+                        print(f"Applied migration {version:03d} {name} ({duration_ms} ms)")
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        return done
+    except Error as e:
+        print(f"Error running migrations: {e}")
+        raise
+    finally:
+        if not conn.closed:
+            conn.autocommit = False
+        database.put_connection(conn)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from database import db
+
+    if "--status" in sys.argv:
+        for version, name, applied in migration_status(db):
+            print(f"{version:03d} {'applied' if applied else 'pending'}  {name}")
+    else:
+        applied_now = run_migrations(db)
+        if not applied_now:
+            print("Schema is up to date.")
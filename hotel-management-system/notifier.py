@@ -0,0 +1,277 @@
+"""
+Push notifications for the Telegram bot.
+
+Triggers (migrations.py, versions 8 and 12) and the notify_overdue_checkouts
+scheduler job publish events on the Postgres channel hotel_events. The
+notifier LISTENs on it, groups whatever arrives within
+NOTIFY_COALESCE_SECONDS per event type (a bulk check-out is one message,
+not hundreds) and sends one message per subscribed chat through SendQueue,
+which keeps inside Telegram's rate limits.
+
+Run exactly one notifier per deployment (the bot process starts it), or
+every chat gets each message once per listener. NOTIFY is not durable:
+events published while the listener is reconnecting are lost.
+
+Offline check against a fake Telegram API: python benchmarks/fake_telegram.py
+"""
+import collections
+import json
+import os
+import select
+import threading
+import time
+import traceback
+
+import psycopg2
+from psycopg2 import Error
+from telebot.apihelper import ApiTelegramException
+
+CHANNEL = "hotel_events"
+
+EVENTS = {
+    "room_cleaning": "🧹 اتاق وارد نظافت شد",
+    "reservation_created": "🧾 رزرو جدید",
+    "overdue_checkout": "⏰ خروج دیرهنگام",
+    "waitlist_matched": "📋 برای لیست انتظار اتاق پیدا شد",
+}
+
+COALESCE_SECONDS = float(os.environ.get("NOTIFY_COALESCE_SECONDS", "2"))
+
+# Telegram: ~30 messages/s per bot, ~1 message/s per chat
+GLOBAL_PER_SECOND = 30
+PER_CHAT_SECONDS = 1.0
+
+MAX_LINES = 20
+MAX_ATTEMPTS = 3
+
+
+def format_event(event: str, payloads):
+    lines = [f"{EVENTS.get(event, event)}\n"]
+    for p in payloads[:MAX_LINES]:
+        if event == "room_cleaning":
+            lines.append(f"• اتاق {p['room_id']} | طبقه {p['floor']}")
+        elif event == "reservation_created":
+            lines.append(f"• کد رزرو: {p['res_id']} | ورود: {p['check_in']} | خروج: {p['check_out']}")
+        elif event == "overdue_checkout":
+            lines.append(f"• کد رزرو: {p['res_id']} | خروج: {p['check_out']}")
+        elif event == "waitlist_matched":
+            rooms = ", ".join(str(r) for r in p.get("rooms") or [])
+            lines.append(f"• درخواست {p['wait_id']} | اتاق: {rooms} | ورود: {p['check_in']} | خروج: {p['check_out']}")
+        else:
+            lines.append(f"• {p}")
+    if len(payloads) > MAX_LINES:
+        lines.append(f"… و {len(payloads) - MAX_LINES} مورد دیگر")
+    return "\n".join(lines)
+
+
+class SendQueue:
+    """
+    Rate-limited outbox in front of send(chat_id, text).
+
+    Messages leave at most GLOBAL_PER_SECOND per second and one per
+    PER_CHAT_SECONDS per chat; a chat that is not ready yet does not hold up
+    the others. A 429 pauses the whole queue for the retry_after Telegram
+    asks for; 403 (bot blocked) or 400 "chat not found" drops the message
+    and calls on_blocked(chat_id). Any other 400 (e.g. text Telegram cannot
+    parse) drops just that message.
+    """
+
+    def __init__(self, send, per_second=GLOBAL_PER_SECOND, per_chat_seconds=PER_CHAT_SECONDS, on_blocked=None):
+        self._send = send
+        self._interval = 1.0 / per_second
+        self._per_chat = per_chat_seconds
+        self.on_blocked = on_blocked
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._chat_ready = {}
+        self._paused_until = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.metrics = {"queued": 0, "sent": 0, "rate_limited": 0, "retried": 0, "dropped": 0}
+
+    def put(self, chat_id: int, text: str):
+        with self._cond:
+            self._queue.append([chat_id, text, 0])
+            self.metrics["queued"] += 1
+            self._cond.notify()
+
+    def pending(self):
+        return len(self._queue)
+
+    def _take(self):
+        """Next message whose chat may receive now, waiting as needed; None once stopped."""
+        with self._cond:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if not self._queue:
+                    self._cond.wait(0.5)
+                    continue
+                if self._paused_until > now:
+                    self._cond.wait(self._paused_until - now)
+                    continue
+                soonest = None
+                for i, item in enumerate(self._queue):
+                    ready = self._chat_ready.get(item[0], 0.0)
+                    if ready <= now:
+                        del self._queue[i]
+                        self._chat_ready[item[0]] = now + self._per_chat
+                        return item
+                    soonest = ready if soonest is None else min(soonest, ready)
+                self._cond.wait(soonest - now)
+        return None
+
+    def _requeue(self, item, front=False):
+        with self._cond:
+            if front:
+                self._queue.appendleft(item)
+            else:
+                self._queue.append(item)
+            self._cond.notify()
+
+    def send_one(self):
+        """Send the next message. Returns False once the queue is stopped."""
+        item = self._take()
+        if item is None:
+            return False
+        chat_id, text, attempts = item
+        try:
+            self._send(chat_id, text)
+            self.metrics["sent"] += 1
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                retry_after = (e.result_json.get("parameters") or {}).get("retry_after", 1)
+                self.metrics["rate_limited"] += 1
+                with self._cond:
+                    self._paused_until = time.monotonic() + retry_after
+                self._requeue(item, front=True)
+            elif e.error_code in (400, 403):
+                self.metrics["dropped"] += 1
+                gone = e.error_code == 403 or "chat not found" in (e.description or "").lower()
+                if gone and self.on_blocked:
+                    self.on_blocked(chat_id)
+                elif not gone:
+                    print(f"notify: dropped message to {chat_id}: {e.description}")
+            else:
+                self._retry(item)
+        except Exception:
+            traceback.print_exc()
+            self._retry(item)
+        time.sleep(self._interval)
+        return True
+
+    def _retry(self, item):
+        item[2] += 1
+        if item[2] >= MAX_ATTEMPTS:
+            self.metrics["dropped"] += 1
+            return
+        self.metrics["retried"] += 1
+        self._requeue(item)
+
+    def run(self):
+        while self.send_one():
+            pass
+
+    def start_in_background(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="notify-send", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+
+class Notifier:
+    """LISTEN on hotel_events, coalesce per event type, fan out to subscribers."""
+
+    def __init__(self, database, send, coalesce_seconds=COALESCE_SECONDS):
+        self.database = database
+        self.coalesce_seconds = coalesce_seconds
+        self.queue = SendQueue(send, on_blocked=database.remove_subscriber)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.metrics = {"events": 0, "batches": 0}
+
+    def on_event(self, payload):
+        event = payload.get("event")
+        if event not in EVENTS:
+            return
+        with self._lock:
+            self._pending.setdefault(event, []).append(payload)
+            self.metrics["events"] += 1
+
+    def flush(self):
+        """Turn pending events into queued messages. Returns the number queued."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            subscribers = self.database.get_subscribers(pending.keys())
+        except Error as e:
+            print(f"[notifier] subscribers error: {e}")
+            return 0
+        queued = 0
+        for event, payloads in pending.items():
+            chats = subscribers.get(event)
+            if not chats:
+                continue
+            text = format_event(event, payloads)
+            for chat_id in chats:
+                self.queue.put(chat_id, text)
+                queued += 1
+        self.metrics["batches"] += 1
+        return queued
+
+    def listen(self):
+        """Blocking LISTEN loop on a dedicated connection (it never goes back to the pool)."""
+        backoff = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.database.db_url)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                backoff = 1
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        n = conn.notifies.pop(0)
+                        try:
+                            self.on_event(json.loads(n.payload))
+                        except ValueError:
+                            print(f"[notifier] bad payload: {n.payload!r}")
+            except Error as e:
+                print(f"[notifier] listen error: {e}; reconnecting in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.coalesce_seconds):
+            self.flush()
+
+    def start_in_background(self):
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self.listen, name="notify-listen", daemon=True),
+            threading.Thread(target=self._flush_loop, name="notify-flush", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        self.queue.start_in_background()
+        return self._threads
+
+    def stop(self):
+        self._stop.set()
+        self.queue.stop()
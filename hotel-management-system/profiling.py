@@ -0,0 +1,186 @@
+"""
+Sampled per-request profiling for the web app and the bot.
+
+A request is profiled when random() < PROFILE_SAMPLE_RATE, or when it
+carries an X-Profile header equal to PROFILE_TOKEN (so one slow page can be
+profiled on demand). Bot handlers wrapped in @profiled are sampled at the
+same rate. Nothing is profiled while both are unset.
+
+PROFILE_MODE=stack (default) runs a sampler thread that reads the handler
+thread's Python stack every PROFILE_INTERVAL_MS and writes
+PROFILE_DIR/<time>-<label>.collapsed: one "frame;frame;frame count" line per
+stack, the input of flamegraph.pl and speedscope. Samples taken while the
+handler is inside database.py or psycopg2 get a final "[db]" frame, so DB
+waits show up as their own towers. PROFILE_MODE=cprofile writes a .prof
+file instead (python -m pstats, snakeviz), with deterministic call counts
+but only one profiled request at a time.
+
+Either way one line is logged per profile with total time and the DB time
+Database measured for that thread (connections held, see thread_metrics()).
+"""
+import cProfile
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+TOKEN = os.environ.get("PROFILE_TOKEN", "")
+MODE = os.environ.get("PROFILE_MODE", "stack")
+INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+HEADER = "X-Profile"
+DB_FRAME = "[db]"
+
+_DB_FILES = (os.sep + "database.py", os.sep + "psycopg2" + os.sep)
+_LABEL_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# cProfile hooks the interpreter for the whole process: one at a time
+_cprofile_lock = threading.Lock()
+
+
+def should_profile(token: str = None) -> bool:
+    """Sampled by PROFILE_SAMPLE_RATE, or asked for with the right PROFILE_TOKEN."""
+    if token and TOKEN and hmac.compare_digest(token, TOKEN):
+        return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """Counts the collapsed Python stacks of one thread until stop()."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.db_samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            in_db = False
+            while frame is not None:
+                code = frame.f_code
+                names.append(_frame_name(code))
+                in_db = in_db or any(part in code.co_filename for part in _DB_FILES)
+                frame = frame.f_back
+            names.reverse()
+            if in_db:
+                names.append(DB_FRAME)
+                self.db_samples += 1
+            self.stacks[";".join(names)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Profile:
+    """
+    Profile the calling thread between start() and stop(); stop() writes the
+    file and logs the summary. start() returns False when nothing was started
+    (cProfile already busy in another thread).
+    """
+
+    def __init__(self, label: str, database=None, mode: str = None):
+        self.label = _LABEL_RE.sub("_", label).strip("_") or "request"
+        self.database = database
+        self.mode = mode or MODE
+        self._sampler = None
+        self._profiler = None
+
+    def start(self) -> bool:
+        if self.mode == "cprofile":
+            if not _cprofile_lock.acquire(blocking=False):
+                return False
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), INTERVAL_MS / 1000)
+            self._sampler.start()
+        self._db_before = self.database.thread_metrics() if self.database else (0.0, 0)
+        self._started = time.perf_counter()
+        return True
+
+    def stop(self):
+        total_ms = (time.perf_counter() - self._started) * 1000
+        db_ms, borrows = self.database.thread_metrics() if self.database else (0.0, 0)
+        db_ms -= self._db_before[0]
+        borrows -= self._db_before[1]
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{self.label}")
+        if self._profiler is not None:
+            self._profiler.disable()
+            _cprofile_lock.release()
+            path = base + ".prof"
+            self._profiler.dump_stats(path)
+            detail = ""
+        else:
+            self._sampler.stop()
+            path = base + ".collapsed"
+            with open(path, "w", encoding="utf-8") as fh:
+                for stack, count in self._sampler.stacks.most_common():
+                    fh.write(f"{stack} {count}\n")
+            samples = sum(self._sampler.stacks.values())
+            detail = f", {self._sampler.db_samples}/{samples} samples in db"
+        print(
+            f"[profile] {self.label}: {total_ms:.1f} ms total, {db_ms:.1f} ms db, "
+            f"{borrows} borrows{detail} -> {path}"
+        )
+        return path
+
+
+def init_app(app, database=None):
+    """Profile sampled (or X-Profile: PROFILE_TOKEN) requests of a Flask app."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        if not should_profile(request.headers.get(HEADER)):
+            return
+        profile = Profile(f"web-{request.endpoint or 'unknown'}", database)
+        if profile.start():
+            g.profile = profile
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.stop()
+
+
+def profiled(func=None, *, database=None):
+    """Decorator for bot handlers: profile sampled calls as bot-<handler name>."""
+    if func is None:
+        return lambda f: profiled(f, database=database)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not should_profile():
+            return func(*args, **kwargs)
+        profile = Profile(f"bot-{func.__name__}", database)
+        if not profile.start():
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.stop()
+
+    return wrapper
@@ -0,0 +1,58 @@
+"""
+Shared, cursor-level read queries used by both the web app (database.py)
+and the Telegram bot (bot_app.py).
+
+Listings page first (so the partial "active" index stops after LIMIT rows)
+and then batch-load child rows for just that page with = ANY(%s), instead
+of aggregating over the whole active set or querying once per row.
+"""
+
+
+def active_reservations_page(cur, limit=200, before_res_id=None):
+    """
+    One page of active reservations, newest first. Pass the last res_id of
+    the previous page as before_res_id for the next one (keyset paging).
+    """
+    where = "r.status = 'active'"
+    params = []
+    if before_res_id is not None:
+        where += " AND r.res_id < %s"
+        params.append(before_res_id)
+    params.append(limit)
+    cur.execute(
+        f"""
+        SELECT r.res_id, r.guest_id, g.name, g.family, r.emp_id, e.username,
+               r.check_in, r.check_out, r.num_people, r.status, r.total_cost,
+               COALESCE(b.paid, 0) AS payment, r.discount
+        FROM reservation r
+        JOIN guest g ON g.guest_id = r.guest_id
+        JOIN employee e ON e.emp_id = r.emp_id
+        LEFT JOIN reservation_balance b ON b.res_id = r.res_id
+        WHERE {where}
+        ORDER BY r.res_id DESC
+        LIMIT %s
+        """,
+        params,
+    )
+    return cur.fetchall()
+
+
+def attach_reservation_rooms(cur, rows):
+    """Set row["rooms"] = [room_id, ...] for every reservation row, in one query."""
+    if not rows:
+        return rows
+    cur.execute(
+        """
+        SELECT res_id, room_id
+        FROM reservation_room
+        WHERE res_id = ANY(%s)
+        ORDER BY res_id, room_id
+        """,
+        ([r["res_id"] for r in rows],),
+    )
+    rooms = {}
+    for link in cur.fetchall():
+        rooms.setdefault(link["res_id"], []).append(link["room_id"])
+    for r in rows:
+        r["rooms"] = rooms.get(r["res_id"], [])
+    return rows
@@ -0,0 +1,272 @@
+"""
+Background scheduler for time-driven jobs (overdue check-outs, archival, ...).
+
+Run it standalone:
+    python scheduler.py            # loop forever
+    python scheduler.py --once     # run every due job once and exit
+    python scheduler.py --status   # last run of every job (from scheduler_job)
+
+or in-process by setting SCHEDULER_ENABLED=1 for the web app (started by
+each worker's first request, after any fork).
+
+Any number of processes/nodes may run the scheduler. Before running a job
+a process takes that job's Postgres advisory lock and re-checks
+scheduler_job.last_finished_at, so each job runs once per interval across
+the whole deployment. The lock is held on the scheduler's own session,
+outside the pool, so a running job can borrow every pooled connection.
+Per-process jobs (cache warming) skip the lock and run in every web
+process that runs the scheduler; the standalone process leaves them out.
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+import zlib
+
+import psycopg2
+from psycopg2 import Error
+from psycopg2.extras import RealDictCursor
+
+SCHEDULER_TICK_SECONDS = 15
+
+# guests still checked in after this hour on their check-out day are overdue
+CHECKOUT_HOUR = int(os.environ.get("CHECKOUT_HOUR", "12"))
+# hours a matched waitlist entry holds its rooms before they go to the next entry
+WAITLIST_HOLD_HOURS = float(os.environ.get("WAITLIST_HOLD_HOURS", "24"))
+
+JOBS = {}
+
+
+class Job:
+    def __init__(self, name: str, interval: int, func, per_process=False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.per_process = per_process
+        # stable per-name advisory lock key (pg_try_advisory_lock takes a bigint)
+        self.lock_key = 0x5AB4_0000_0000 + zlib.crc32(name.encode("utf-8"))
+
+
+def job(name: str, interval: int, per_process=False):
+    """Register func(database) to run every `interval` seconds (in every process if per_process)."""
+
+    def decorator(func):
+        JOBS[name] = Job(name, interval, func, per_process)
+        return func
+
+    return decorator
+
+
+@job("finish_overdue_reservations", interval=300)
+def _finish_overdue(database):
+    return database.finish_overdue_reservations()
+
+
+@job("notify_overdue_checkouts", interval=600)
+def _notify_overdue(database):
+    return database.notify_overdue_checkouts(CHECKOUT_HOUR)
+
+
+@job("release_expired_holds", interval=600)
+def _release_expired_holds(database):
+    return database.release_expired_holds(WAITLIST_HOLD_HOURS)
+
+
+@job("purge_bot_sessions", interval=3600)
+def _purge_bot_sessions(database):
+    return database.purge_bot_sessions()
+
+
+@job("purge_idempotency_keys", interval=3600)
+def _purge_idempotency_keys(database):
+    return database.purge_idempotency_keys()
+
+
+@job("refit_forecast", interval=24 * 3600)
+def _refit_forecast(database):
+    from forecast import refit
+
+    return refit(database)
+
+
+@job("archive_reservations", interval=24 * 3600)
+def _archive(database):
+    from archive import run_archive
+
+    return run_archive(database)
+
+
+@job("warm_caches", interval=60, per_process=True)
+def _warm_caches(database):
+    """This process's availability index and dashboard forecast, rebuilt off the request path."""
+    import forecast
+    from availability import get_index
+
+    version = get_index(database).refresh()
+    forecast.get_forecast(database)
+    return f"inventory version {version}"
+
+
+class Scheduler:
+    def __init__(self, database, jobs=None):
+        self.database = database
+        self.jobs = dict(jobs if jobs is not None else JOBS)
+        self.metrics = {
+            name: {"runs": 0, "skipped": 0, "failures": 0, "last_ms": None, "max_ms": 0.0, "total_ms": 0.0}
+            for name in self.jobs
+        }
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_conn = None
+        self._local_due = {}
+
+    def _lock_connection(self):
+        """The session job locks are held on; reopened if the server dropped it."""
+        if self._lock_conn is None or self._lock_conn.closed:
+            self._lock_conn = psycopg2.connect(self.database.db_url, cursor_factory=RealDictCursor)
+            self._lock_conn.autocommit = True
+        return self._lock_conn
+
+    def _claim(self, cur, j: Job) -> bool:
+        """Inside j's advisory lock: True if nobody finished it within the last interval."""
+        cur.execute(
+            """
+            INSERT INTO scheduler_job (name) VALUES (%s)
+            ON CONFLICT (name) DO NOTHING
+            """,
+            (j.name,),
+        )
+        cur.execute(
+            """
+            UPDATE scheduler_job
+            SET last_started_at = NOW()
+            WHERE name = %s
+              AND (last_finished_at IS NULL OR last_finished_at <= NOW() - make_interval(secs => %s))
+            RETURNING name
+            """,
+            (j.name, j.interval),
+        )
+        return cur.fetchone() is not None
+
+    def _timed(self, j: Job, m):
+        """Run j.func, record its timing in m. Returns (result, error, elapsed_ms)."""
+        started = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = j.func(self.database)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            m["failures"] += 1
+            traceback.print_exc()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        m["runs"] += 1
+        m["last_ms"] = elapsed_ms
+        m["total_ms"] += elapsed_ms
+        m["max_ms"] = max(m["max_ms"], elapsed_ms)
+        print(f"[scheduler] {j.name}: {'failed' if error else result} in {elapsed_ms:.1f} ms")
+        return result, error, elapsed_ms
+
+    def run_job(self, j: Job):
+        """Run one job if this process wins its lock and it is due. Returns True if it ran."""
+        m = self.metrics.setdefault(
+            j.name, {"runs": 0, "skipped": 0, "failures": 0, "last_ms": None, "max_ms": 0.0, "total_ms": 0.0}
+        )
+        if j.per_process:
+            now = time.monotonic()
+            if self._local_due.get(j.name, 0.0) > now:
+                m["skipped"] += 1
+                return False
+            self._local_due[j.name] = now + j.interval
+            self._timed(j, m)
+            return True
+        try:
+            conn = self._lock_connection()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s) AS ok", (j.lock_key,))
+                if not cur.fetchone()["ok"]:
+                    m["skipped"] += 1
+                    return False
+                try:
+                    if not self._claim(cur, j):
+                        m["skipped"] += 1
+                        return False
+
+                    result, error, elapsed_ms = self._timed(j, m)
+                    cur.execute(
+                        """
+                        UPDATE scheduler_job
+                        SET last_finished_at = NOW(), last_duration_ms = %s, last_error = %s, runs = runs + 1
+                        WHERE name = %s
+                        """,
+                        (int(elapsed_ms), error, j.name),
+                    )
+                    return True
+                finally:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (j.lock_key,))
+        except Error as e:
+            print(f"[scheduler] {j.name} error: {e}")
+            if self._lock_conn is not None:
+                self._lock_conn.close()
+            return False
+
+    def run_pending(self):
+        for j in list(self.jobs.values()):
+            if self._stop.is_set():
+                break
+            self.run_job(j)
+
+    def run_forever(self, tick: float = SCHEDULER_TICK_SECONDS):
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(tick)
+
+    def start_in_background(self, tick: float = SCHEDULER_TICK_SECONDS):
+        """Run the loop in a daemon thread of the current process."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, args=(tick,), name="scheduler", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._lock_conn is not None:
+            self._lock_conn.close()
+            self._lock_conn = None
+
+
+def job_status(database):
+    return database.execute(
+        """
+        SELECT name, last_started_at, last_finished_at, last_duration_ms, last_error, runs
+        FROM scheduler_job
+        ORDER BY name
+        """,
+        fetch=True,
+    )
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from database import db
+
+    # caches warmed here would serve no request
+    shared = {name: j for name, j in JOBS.items() if not j.per_process}
+    if "--status" in sys.argv:
+        for r in job_status(db):
+            print(
+                f"{r['name']:32s} runs={r['runs']:<6d} last={r['last_finished_at']} "
+                f"{r['last_duration_ms']} ms {r['last_error'] or ''}"
+            )
+    elif "--once" in sys.argv:
+        Scheduler(db, shared).run_pending()
+    else:
+        print("Saba Hotel scheduler is running ...")
+        Scheduler(db, shared).run_forever()
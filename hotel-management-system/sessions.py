@@ -0,0 +1,107 @@
+"""
+Session stores for the Telegram bot.
+
+A session is a small dict per chat_id with a TTL. A logged-in session has
+"emp_id" (from Database.authenticate_employee); a login in progress only
+has "pending_username".
+
+    BOT_SESSION_STORE=postgres   bot_session table, shared by every bot process (default)
+    BOT_SESSION_STORE=memory     per-process dict, for local runs and tests
+    BOT_SESSION_TTL_SECONDS      sliding expiry, default 12 hours
+
+Expired Postgres rows are removed by the purge_bot_sessions scheduler job.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL_SECONDS = int(os.environ.get("BOT_SESSION_TTL_SECONDS", str(12 * 3600)))
+LOGIN_STEP_TTL_SECONDS = 300
+
+
+class MemorySessionStore:
+    """In-process stand-in: TTL per entry, oldest entries evicted past max_entries."""
+
+    def __init__(self, ttl_seconds=SESSION_TTL_SECONDS, max_entries=10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(chat_id)
+            if entry is None:
+                return None
+            expires_at, ttl, data = entry
+            if expires_at <= now:
+                del self._data[chat_id]
+                return None
+            self._data[chat_id] = (now + ttl, ttl, data)
+            self._data.move_to_end(chat_id)
+            return dict(data)
+
+    def set(self, chat_id: int, data: dict, ttl_seconds=None):
+        ttl = ttl_seconds or self.ttl_seconds
+        with self._lock:
+            self._data[chat_id] = (time.monotonic() + ttl, ttl, dict(data))
+            self._data.move_to_end(chat_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, chat_id: int):
+        with self._lock:
+            self._data.pop(chat_id, None)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (expires_at, _, _) in self._data.items() if expires_at <= now]
+            for k in expired:
+                del self._data[k]
+        return len(expired)
+
+
+class PostgresSessionStore:
+    """
+    bot_session table via Database. Expiry slides, but the row is only
+    rewritten once less than half the TTL is left, so most messages cost a
+    single primary-key read.
+    """
+
+    def __init__(self, database, ttl_seconds=SESSION_TTL_SECONDS):
+        self.database = database
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, chat_id: int):
+        row = self.database.get_bot_session(chat_id)
+        if not row:
+            return None
+        data = dict(row["data"] or {})
+        if row["emp_id"] is not None:
+            data["emp_id"] = row["emp_id"]
+            if row["ttl_left"] < self.ttl_seconds / 2:
+                self.database.touch_bot_session(chat_id, self.ttl_seconds)
+        return data
+
+    def set(self, chat_id: int, data: dict, ttl_seconds=None):
+        data = dict(data)
+        emp_id = data.pop("emp_id", None)
+        self.database.save_bot_session(chat_id, emp_id, data, ttl_seconds or self.ttl_seconds)
+
+    def delete(self, chat_id: int):
+        self.database.delete_bot_session(chat_id)
+
+    def purge_expired(self):
+        return self.database.purge_bot_sessions()
+
+
+def make_session_store(database, kind=None):
+    kind = (kind or os.environ.get("BOT_SESSION_STORE", "postgres")).lower()
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "postgres":
+        return PostgresSessionStore(database)
+    raise ValueError(f"unknown BOT_SESSION_STORE: {kind}")
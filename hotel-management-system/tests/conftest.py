@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    database.db pointed at TEST_DATABASE_URL with the schema applied. Tests
+    using it TRUNCATE tables, so they only run against a scratch database.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set (these tests truncate tables; use a scratch DB)")
+    os.environ["DATABASE_URL"] = url
+
+    from database import db
+
+    db.init_db()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def hotel(database):
+    """
+    Empty hotel on the test database: rooms 1-2 single, 3-4 double, all
+    available, one guest and the admin employee. Returns their ids.
+    """
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                TRUNCATE waitlist, room_night, reservation_room, payment, reservation,
+                         guest_phone, guest_address, employee_guest, guest, room,
+                         reservation_history, reservation_room_history, payment_history,
+                         reservation_rollup, guest_history RESTART IDENTITY CASCADE
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO room (room_id, type, capacity, price, floor, bed_type, smoking, status)
+                SELECT g, CASE WHEN g <= 2 THEN 'single' ELSE 'double' END, 1 + (g > 2)::int, 100,
+                       1, 'single', false, 'available'
+                FROM generate_series(1, 4) g
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO guest (name, family, national_id, birthdate, email)
+                VALUES ('Test', 'Guest', 'T0001', '1990-01-01', 'test@example.com')
+                RETURNING guest_id
+                """
+            )
+            guest_id = cur.fetchone()["guest_id"]
+            cur.execute("SELECT MIN(emp_id) AS emp_id FROM employee")
+            emp_id = cur.fetchone()["emp_id"]
+        conn.commit()
+    finally:
+        database.put_connection(conn)
+    database.invalidate_cache()
+    return {"guest_id": guest_id, "emp_id": emp_id}
+
+
+def book(database, hotel, room_ids, start=0, nights=2):
+    """Active reservation on room_ids from today + start for `nights` nights; returns res_id."""
+    from datetime import date, timedelta
+
+    check_in = date.today() + timedelta(days=start)
+    return database.create_reservation(
+        guest_id=hotel["guest_id"],
+        emp_id=hotel["emp_id"],
+        check_in=check_in.isoformat(),
+        check_out=(check_in + timedelta(days=nights)).isoformat(),
+        num_people=1,
+        status="active",
+        total_cost=100 * nights * len(room_ids),
+        room_ids=list(room_ids),
+    )
+
+
+def room_status(database, room_id):
+    return database.execute("SELECT status FROM room WHERE room_id = %s", (room_id,), fetchone=True)["status"]
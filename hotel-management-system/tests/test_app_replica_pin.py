@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SCRIPT = """
+import app as web
+from database import db
+
+web.app.add_url_rule(
+    "/_pinned", "_pinned", lambda: "pinned" if db._reads_pinned() else "free", methods=["GET", "POST"]
+)
+client = web.app.test_client()
+
+assert client.get("/_pinned").text == "free"
+assert client.post("/_pinned").text == "pinned"
+assert client.get("/_pinned").text == "pinned"  # the page a form redirects to
+
+web.REPLICA_PIN_SECONDS = 0
+client.post("/_pinned")
+assert client.get("/_pinned").text == "free"
+assert client.get("/_pinned").text == "free"
+other = web.app.test_client()
+assert other.get("/_pinned").text == "free"
+"""
+
+
+def test_reads_after_a_write_stay_on_the_primary():
+    env = dict(
+        os.environ,
+        DATABASE_URL="postgresql://localhost:1/unused",
+        DATABASE_REPLICA_URLS="postgresql://localhost:1/replica",
+    )
+    env.pop("SCHEDULER_ENABLED", None)
+    done = subprocess.run([sys.executable, "-c", SCRIPT], cwd=HERE, env=env, capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0, done.stderr
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SCRIPT = """
+import threading
+import database
+import app as web
+
+def scheduler_threads():
+    return [t for t in threading.enumerate() if t.name == "scheduler"]
+
+# importing the app connects nothing and starts nothing (gunicorn --preload forks after this)
+assert database.db._instance is None
+assert not scheduler_threads()
+assert "scheduler" not in web.app.extensions
+
+web.app.test_client().get("/login")
+assert len(scheduler_threads()) == 1
+web.app.test_client().get("/login")
+assert len(scheduler_threads()) == 1
+web.app.extensions["scheduler"].stop()
+"""
+
+
+def test_scheduler_starts_in_the_serving_process():
+    env = dict(
+        os.environ,
+        SCHEDULER_ENABLED="1",
+        DATABASE_URL=os.environ.get("TEST_DATABASE_URL", "postgresql://localhost:1/unused"),
+    )
+    done = subprocess.run([sys.executable, "-c", SCRIPT], cwd=HERE, env=env, capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0, done.stderr
@@ -0,0 +1,58 @@
+from archive import rehydrate_guest, rehydrate_reservation, run_archive
+from conftest import book
+
+
+def _old_stay(database, hotel):
+    """A finished reservation that ended well before any horizon; returns res_id."""
+    return database.execute(
+        """
+        INSERT INTO reservation (guest_id, emp_id, check_in, check_out, num_people, status, total_cost)
+        VALUES (%s, %s, CURRENT_DATE - 400, CURRENT_DATE - 398, 1, 'finished', 200)
+        RETURNING res_id
+        """,
+        (hotel["guest_id"], hotel["emp_id"]),
+        fetchone=True,
+    )["res_id"]
+
+
+def _is_live(database, guest_id):
+    return database.execute("SELECT 1 FROM guest WHERE guest_id = %s", (guest_id,), fetchone=True) is not None
+
+
+def test_idle_guest_is_archived_and_comes_back_with_their_reservation(database, hotel):
+    guest_id = hotel["guest_id"]
+    database.execute("INSERT INTO guest_phone (guest_id, phone) VALUES (%s, '0912')", (guest_id,))
+    database.execute("INSERT INTO employee_guest (emp_id, guest_id) VALUES (%s, %s)", (hotel["emp_id"], guest_id))
+    res_id = _old_stay(database, hotel)
+
+    assert run_archive(database, horizon_days=30, pause=0) == {"reservations": 1, "guests": 1}
+    assert not _is_live(database, guest_id)
+    database.invalidate_cache()
+    assert database.get_stats()["total_guests"] == 1
+
+    assert rehydrate_reservation(database, res_id)
+    profile = database.get_guest_profile(guest_id)
+    assert [p["phone"] for p in profile["phones"]] == ["0912"]
+    assert profile["reservation_count"] == 1
+    assert database.execute(
+        "SELECT emp_id FROM employee_guest WHERE guest_id = %s", (guest_id,), fetchone=True
+    )["emp_id"] == hotel["emp_id"]
+    assert database.execute("SELECT COUNT(*) AS c FROM guest_history", fetchone=True)["c"] == 0
+
+
+def test_guests_with_anything_live_or_no_stays_are_kept(database, hotel):
+    _old_stay(database, hotel)
+    book(database, hotel, [1], start=10)
+    never_stayed = database.execute(
+        """
+        INSERT INTO guest (name, family, national_id, birthdate, email)
+        VALUES ('New', 'Guest', 'T0002', '1990-01-01', 'new@example.com')
+        RETURNING guest_id
+        """,
+        fetchone=True,
+    )["guest_id"]
+
+    assert run_archive(database, horizon_days=30, pause=0) == {"reservations": 1, "guests": 0}
+    assert _is_live(database, hotel["guest_id"])
+    assert _is_live(database, never_stayed)
+    assert not rehydrate_guest(database, hotel["guest_id"])
@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+import assets
+from assets import _rewrite_css, build_assets
+
+CSS = 'body { background: url("/static/img/bg.png") no-repeat; color: #333; }\n.logo { background: url(/static/img/logo.svg); }\n'
+
+
+def test_rewrite_css_hashes_urls():
+    files = {"img/logo.svg": "dist/img/logo.abc.svg"}
+    out = _rewrite_css(CSS, files, {})
+    assert 'url("/static/dist/img/logo.abc.svg")' in out
+    assert 'url("/static/img/bg.png")' in out  # not built: left as is
+    assert "image-set(" not in out
+
+
+def test_rewrite_css_adds_image_set_declaration():
+    files = {"img/bg.png": "dist/img/bg.111.png"}
+    images = {"img/bg.png": ["dist/img/bg.222.avif", "dist/img/bg.333.webp"]}
+    out = _rewrite_css(CSS, files, images)
+    plain = 'background: url("/static/dist/img/bg.111.png") no-repeat;'
+    with_set = (
+        'background: image-set(url("/static/dist/img/bg.222.avif") type("image/avif"), '
+        'url("/static/dist/img/bg.333.webp") type("image/webp"), '
+        'url("/static/dist/img/bg.111.png") type("image/png")) no-repeat;'
+    )
+    assert plain in out and with_set in out
+    assert out.index(plain) < out.index(with_set)  # fallback first
+    assert "color: #333;" in out
+
+
+def _static(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "img").mkdir()
+    (tmp_path / "css" / "style.css").write_text(CSS * 20, encoding="utf-8")
+    (tmp_path / "img" / "logo.svg").write_text("<svg xmlns='http://www.w3.org/2000/svg'>" + "<g/>" * 50 + "</svg>")
+    (tmp_path / "robots.txt").write_text("x")
+    return tmp_path
+
+
+def test_build_assets(tmp_path):
+    static = _static(tmp_path)
+    manifest = build_assets(str(static))
+
+    files = manifest["files"]
+    assert set(files) == {"css/style.css", "img/logo.svg", "robots.txt"}
+    for built in files.values():
+        assert built.startswith("dist/")
+        assert (static / built).is_file()
+    css = (static / files["css/style.css"]).read_text(encoding="utf-8")
+    assert f'url("/static/{files["img/logo.svg"]}")' in css
+
+    # gzip always, br when brotli is installed; never when it would not be smaller
+    assert "gzip" in manifest["encodings"][files["css/style.css"]]
+    assert (static / (files["css/style.css"] + ".gz")).is_file()
+    assert files["robots.txt"] not in manifest["encodings"]
+
+    with open(static / "dist" / assets.MANIFEST, encoding="utf-8") as fh:
+        assert json.load(fh) == manifest
+
+
+def test_build_assets_is_repeatable(tmp_path):
+    static = _static(tmp_path)
+    first = build_assets(str(static))
+    (static / "dist" / "stale.css").write_text("x")
+    assert build_assets(str(static)) == first
+    assert not (static / "dist" / "stale.css").exists()
+
+    (static / "img" / "logo.svg").write_text("<svg/>")
+    changed = build_assets(str(static))
+    assert changed["files"]["img/logo.svg"] != first["files"]["img/logo.svg"]
+    assert changed["files"]["css/style.css"] != first["files"]["css/style.css"]  # CSS hash follows its images
+
+
+def test_build_assets_image_variants(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    static = _static(tmp_path)
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(static / "img" / "bg.png")
+    manifest = build_assets(str(static))
+
+    variants = manifest["images"]["img/bg.png"]
+    assert variants and all(os.path.isfile(static / v) for v in variants)
+    assert variants[-1].endswith(".webp")
+    css = (static / manifest["files"]["css/style.css"]).read_text(encoding="utf-8")
+    assert "image-set(" in css and variants[-1] in css
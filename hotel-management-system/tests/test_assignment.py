@@ -0,0 +1,57 @@
+import numpy as np
+
+import assignment
+from assignment import best_row, orphan_gaps
+
+
+def _taken(*rows):
+    """One string per room, '#' = taken night."""
+    return np.array([[c == "#" for c in r] for r in rows], dtype=bool)
+
+
+def test_best_row_prefers_exact_fit():
+    taken = _taken(
+        "##.....",  # stay [3, 5) would leave night 2 empty
+        "###....",  # stay starts right when the last one ends
+    )
+    assert best_row(taken, np.array([0, 1]), 3, 5) == 1
+
+
+def test_best_row_avoids_orphan_night():
+    taken = _taken(
+        "#.....#",  # stay [2, 5) leaves one night on each side
+        ".......",
+    )
+    assert best_row(taken, np.array([0, 1]), 2, 5) == 1
+
+
+def test_best_row_skips_taken_rooms():
+    taken = _taken(
+        "..##...",
+        "..#....",
+        ".......",
+    )
+    assert best_row(taken, np.array([0, 1, 2]), 2, 4) == 2
+    assert best_row(taken, np.array([0, 1]), 2, 4) is None
+    assert best_row(taken, np.array([], dtype=np.int64), 2, 4) is None
+
+
+def test_best_row_ties_go_to_first_candidate():
+    taken = _taken(".......", ".......")
+    assert best_row(taken, np.array([1, 0]), 2, 4) == 0
+
+
+def test_best_row_move_cost_keeps_current_room():
+    taken = _taken(".......", ".......")
+    assert best_row(taken, np.array([0, 1]), 2, 4, current=1) == 1
+
+
+def test_orphan_gaps():
+    assert assignment.ORPHAN_GAP_NIGHTS == 1
+    taken = _taken(
+        "#.#.##.",  # two single-night holes
+        "#..#...",  # two-night hole: sellable
+        ".#.....",  # leading free night is open, not orphaned
+    )
+    assert orphan_gaps(taken) == 2
+    assert orphan_gaps(_taken("#")) == 0
@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import book, room_status
+
+
+def test_check_in_marks_every_room_occupied(database, hotel):
+    res_id = book(database, hotel, [1, 3], start=0)
+    assert sorted(database.check_in_reservation(res_id)) == [1, 3]
+    assert room_status(database, 1) == room_status(database, 3) == "occupied"
+
+
+def test_future_stay_is_refused(database, hotel):
+    res_id = book(database, hotel, [1], start=3)
+    with pytest.raises(ValueError, match="پذیرش زودتر"):
+        database.check_in_reservation(res_id)
+    assert room_status(database, 1) == "available"
+
+
+def test_room_in_use_is_refused(database, hotel):
+    res_id = book(database, hotel, [1, 2], start=0)
+    database.execute("UPDATE room SET status = 'occupied' WHERE room_id = 2")  # previous guest still in
+    with pytest.raises(ValueError, match=r"2 \(occupied\)"):
+        database.check_in_reservation(res_id)
+    assert room_status(database, 1) == "reserved"  # all rooms or none
+
+    database.execute("UPDATE room SET status = 'cleaning' WHERE room_id = 2")
+    with pytest.raises(ValueError, match=r"2 \(cleaning\)"):
+        database.check_in_reservation(res_id)
+    assert room_status(database, 1) == "reserved"
+
+
+def test_inactive_or_missing_reservation_is_refused(database, hotel):
+    res_id = book(database, hotel, [1], start=0)
+    database.cancel_reservations([res_id])
+    with pytest.raises(ValueError, match="فعال نیست"):
+        database.check_in_reservation(res_id)
+    with pytest.raises(ValueError, match="پیدا نشد"):
+        database.check_in_reservation(res_id + 1000)
@@ -0,0 +1,28 @@
+from conftest import book, room_status
+
+
+def test_overdue_no_show_frees_its_room(database, hotel):
+    res_id = book(database, hotel, [1], start=-2, nights=1)
+    assert room_status(database, 1) == "reserved"
+
+    assert database.finish_overdue_reservations() == 1
+    assert database.get_reservation_by_id(res_id)["status"] == "finished"
+    assert room_status(database, 1) == "available"
+
+
+def test_checked_in_room_goes_to_cleaning(database, hotel):
+    res_id = book(database, hotel, [1], start=-1, nights=1)
+    database.check_in_reservation(res_id)
+    assert room_status(database, 1) == "occupied"
+
+    assert database.check_out_reservations([res_id]) == [res_id]
+    assert room_status(database, 1) == "cleaning"
+
+
+def test_room_held_for_tonight_keeps_its_status(database, hotel):
+    no_show = book(database, hotel, [1], start=-2, nights=1)
+    database.execute("UPDATE room SET status = 'available' WHERE room_id = 1")  # front desk let it go
+    book(database, hotel, [1], start=0, nights=2)  # next guest arrives today
+
+    assert database.check_out_reservations([no_show]) == [no_show]
+    assert room_status(database, 1) == "reserved"
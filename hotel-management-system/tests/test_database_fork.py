@@ -0,0 +1,49 @@
+import gc
+import os
+
+
+def _in_child(fn):
+    """Run fn() in a forked child; returns its exit status (0 = ok)."""
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            fn()
+            code = 0
+        finally:
+            os._exit(code)
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+
+def test_child_leaves_parent_connections_open(database):
+    conn = database.get_connection()
+    parent_conn = id(conn)
+    database.put_connection(conn)
+    del conn
+
+    def child():
+        assert database.execute("SELECT 1 AS one", fetchone=True)["one"] == 1
+        gc.collect()
+        database.close()  # shutdown in the child closes its own pool only
+
+    assert _in_child(child) == 0
+    conn = database.get_connection()
+    try:
+        assert id(conn) == parent_conn
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 AS one")
+            assert cur.fetchone()["one"] == 1
+        conn.rollback()
+    finally:
+        database.put_connection(conn)
+
+
+def test_child_builds_its_own_pool(database):
+    parent_pool = database._get_pool()
+
+    def child():
+        assert database._get_pool() is not parent_pool
+        database.execute("SELECT 1")
+
+    assert _in_child(child) == 0
+    assert database._get_pool() is parent_pool
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from forecast import fit
+
+TODAY = date(2026, 3, 2)
+HORIZON = 14
+
+
+def _history(days=28):
+    since = TODAY - timedelta(days=days)
+    return {
+        "today": TODAY,
+        "since": since,
+        "rooms": [("double", 2, 80), ("single", 4, 50)],
+        # every past night one single booked a week ahead and one on the day, 50 each
+        "nights": [("single", d, 5, 1, 50) for d in range(days)]
+        + [("single", d, 0, 1, 50) for d in range(days)]
+        + [("suite", 0, 0, 1, 500)],  # a type without rooms is ignored
+        "on_books": [("single", 0, 3), ("double", 2, 1), ("single", HORIZON, 4)],
+        "revenue_years": {},
+    }
+
+
+def test_shapes_and_bounds():
+    result = fit(_history(), HORIZON)
+    assert result["types"] == ["double", "single"]
+    assert result["first_night"] == TODAY
+    assert result["history_days"] == 28
+    assert list(result["capacity"]) == [2, 4]
+    for key in ("on_books", "rooms", "revenue"):
+        assert result[key].shape == (2, HORIZON)
+    rooms, on_books = result["rooms"], result["on_books"]
+    assert (rooms >= on_books).all()
+    assert (rooms <= result["capacity"][:, None]).all()
+
+
+def test_on_books_outside_horizon_dropped():
+    on_books = fit(_history(), HORIZON)["on_books"]
+    assert on_books[1, 0] == 3
+    assert on_books[0, 2] == 1
+    assert on_books.sum() == 4
+
+
+def test_type_without_history_stays_on_books_at_list_price():
+    result = fit(_history(), HORIZON)
+    assert np.array_equal(result["rooms"][0], result["on_books"][0])
+    assert np.allclose(result["revenue"][0], result["rooms"][0] * 80)
+
+
+def test_pace_fills_in_the_unbooked_share():
+    result = fit(_history(), HORIZON)
+    # two of four singles sold every night, one booked a week ahead, one on the day
+    single = result["rooms"][1]
+    assert np.isclose(single[0], 3.0)  # everything is booked by the day: on_books only
+    assert np.isclose(single[1], 1.0)  # 1-9 days out: the same-day half is still to come
+    assert np.isclose(single[7], 1.0)
+    assert np.isclose(single[HORIZON - 1], 2 * (1 - 0.05))  # nothing booked 10+ days out: MIN_PACE
+    assert np.allclose(result["revenue"][1], single * 50)
+
+
+def test_empty_history():
+    result = fit(dict(_history(), nights=[], on_books=[]), HORIZON)
+    assert result["history_days"] == 0
+    assert not result["rooms"].any()
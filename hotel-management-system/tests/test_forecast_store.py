@@ -0,0 +1,39 @@
+import psycopg2
+import pytest
+
+import forecast
+from conftest import book
+
+
+@pytest.fixture
+def empty_forecast(database, hotel):
+    database.execute("DELETE FROM occupancy_forecast")
+    with forecast._cache_lock:
+        forecast._cache.clear()
+    return hotel
+
+
+def test_reading_never_fits(database, empty_forecast, monkeypatch):
+    monkeypatch.setattr(forecast, "_load", lambda *a, **k: pytest.fail("get_forecast must not fit"))
+    assert forecast.get_forecast(database, days=7) == []
+
+
+def test_refit_stores_what_get_forecast_reads(database, empty_forecast):
+    book(database, empty_forecast, [1], start=1)
+    summary = forecast.refit(database, horizon=30)
+    assert summary["types"] == 2 and summary["nights"] == 30
+    rows = forecast.get_forecast(database, days=7, room_type="single")
+    assert len(rows) == 7
+    assert rows[1]["on_books"] == 1
+
+
+def test_refit_loser_does_no_work(database, empty_forecast, monkeypatch):
+    monkeypatch.setattr(forecast, "_load", lambda *a, **k: pytest.fail("loser must not read history"))
+    other = psycopg2.connect(database.db_url)
+    try:
+        with other.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (forecast.REFIT_LOCK_KEY,))
+            assert forecast.refit(database, horizon=30) is None
+    finally:
+        other.rollback()
+        other.close()
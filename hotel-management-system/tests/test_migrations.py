@@ -0,0 +1,35 @@
+import threading
+
+import psycopg2
+
+import migrations
+from migrations import MIGRATION_LOCK_KEY, MIGRATIONS, run_migrations
+
+
+def test_fresh_schema_never_builds_the_replaced_status_index():
+    statements = [s for _, _, _, stmts in MIGRATIONS for s in stmts]
+    assert not any("CREATE INDEX" in s and "idx_reservation_status " in s for s in statements)
+
+
+def test_waiting_node_does_not_block_concurrent_index_build(database, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATION_LOCK_POLL_SECONDS", 0.05)
+    other = psycopg2.connect(database.db_url)
+    other.autocommit = True
+    try:
+        with other.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))  # "node 1" is migrating
+            result = []
+            waiter = threading.Thread(target=lambda: result.append(run_migrations(database, verbose=False)))
+            waiter.start()
+            waiter.join(0.3)
+            assert waiter.is_alive()  # "node 2" waits for its turn ...
+
+            # ... without holding a snapshot that node 1's concurrent build would wait on
+            cur.execute("SET statement_timeout = '5s'")
+            cur.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_test_lock_wait ON room (price)")
+            cur.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_test_lock_wait")
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+            waiter.join(5)
+            assert result == [[]]
+    finally:
+        other.close()
@@ -0,0 +1,94 @@
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from notifier import SendQueue
+
+
+def _error(code, description, **extra):
+    return ApiTelegramException("sendMessage", None, dict({"error_code": code, "description": description}, **extra))
+
+
+class FakeSend:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.sent = []
+
+    def __call__(self, chat_id, text):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def _queue(send, **kwargs):
+    blocked = []
+    kwargs.setdefault("per_chat_seconds", 0)
+    queue = SendQueue(send, per_second=1e6, on_blocked=blocked.append, **kwargs)
+    return queue, blocked
+
+
+def test_sends_in_order():
+    send = FakeSend()
+    queue, _ = _queue(send)
+    queue.put(1, "a")
+    queue.put(2, "b")
+    assert queue.send_one() and queue.send_one()
+    assert send.sent == [(1, "a"), (2, "b")]
+    assert queue.metrics["sent"] == 2
+
+
+def test_busy_chat_does_not_hold_up_others():
+    send = FakeSend()
+    queue, _ = _queue(send, per_chat_seconds=60)
+    queue.put(1, "a")
+    queue.put(1, "b")
+    queue.put(2, "c")
+    queue.send_one()
+    queue.send_one()
+    assert send.sent == [(1, "a"), (2, "c")]
+    assert queue.pending() == 1
+
+
+def test_429_pauses_and_requeues():
+    send = FakeSend(_error(429, "Too Many Requests: retry after 5", parameters={"retry_after": 5}))
+    queue, blocked = _queue(send)
+    queue.put(1, "a")
+    queue.send_one()
+    assert queue._paused_until > time.monotonic() + 4
+    assert queue.pending() == 1
+    assert queue.metrics["rate_limited"] == 1
+    assert blocked == []
+
+
+def test_blocked_and_missing_chats_call_on_blocked():
+    send = FakeSend(_error(403, "Forbidden: bot was blocked by the user"), _error(400, "Bad Request: chat not found"))
+    queue, blocked = _queue(send)
+    queue.put(1, "a")
+    queue.put(2, "b")
+    queue.send_one()
+    queue.send_one()
+    assert blocked == [1, 2]
+    assert queue.metrics["dropped"] == 2
+    assert queue.pending() == 0
+
+
+def test_other_400_drops_only_the_message():
+    send = FakeSend(_error(400, "Bad Request: can't parse entities"))
+    queue, blocked = _queue(send)
+    queue.put(1, "a")
+    queue.put(1, "b")
+    queue.send_one()
+    queue.send_one()
+    assert blocked == []
+    assert send.sent == [(1, "b")]
+    assert queue.metrics["dropped"] == 1
+
+
+def test_other_errors_are_retried():
+    send = FakeSend(_error(502, "Bad Gateway"))
+    queue, _ = _queue(send)
+    queue.put(1, "a")
+    queue.send_one()
+    queue.send_one()
+    assert send.sent == [(1, "a")]
+    assert queue.metrics["retried"] == 1
@@ -0,0 +1,58 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+from psycopg2.pool import PoolError
+
+from conftest import book
+
+
+def test_getconn_waits_for_a_returned_connection(database):
+    from database import _CountingPool
+
+    pool = _CountingPool(1, 1, database.db_url, timeout=5)
+    try:
+        first = pool.getconn()
+        timer = threading.Timer(0.2, pool.putconn, (first,))
+        timer.start()
+        started = time.monotonic()
+        assert pool.getconn() is first
+        assert time.monotonic() - started >= 0.15
+        timer.join()
+    finally:
+        pool.closeall()
+
+
+def test_getconn_gives_up_after_timeout(database):
+    from database import _CountingPool
+
+    pool = _CountingPool(1, 1, database.db_url, timeout=0.1)
+    try:
+        pool.getconn()
+        with pytest.raises(PoolError):
+            pool.getconn()
+    finally:
+        pool.closeall()
+
+
+def test_cancel_offers_nights_to_waitlist_on_a_one_connection_pool(database, hotel, monkeypatch):
+    from database import Database
+
+    monkeypatch.setenv("DB_POOL_MAX", "1")
+    monkeypatch.setenv("DB_POOL_TIMEOUT_SECONDS", "2")
+    small = Database()
+    try:
+        res_id = book(small, hotel, [1, 2], start=1)
+        start = date.today() + timedelta(days=1)
+        wait_id, matched = small.add_waitlist_entry(
+            hotel["guest_id"], hotel["emp_id"], start, start + timedelta(days=2), 1, rooms=1, room_type="single"
+        )
+        assert not matched
+
+        # the waitlist listener borrows after cancel_reservations gave its connection back
+        assert small.cancel_reservations([res_id]) == [res_id]
+        row = small.execute("SELECT status FROM waitlist WHERE wait_id = %s", (wait_id,), fetchone=True)
+        assert row["status"] == "matched"
+    finally:
+        small.close()
@@ -0,0 +1,40 @@
+import pytest
+
+from database import CompactCursor
+
+COLUMNS = ("guest_id", "name", "count")
+
+
+def _row(*values):
+    return CompactCursor._cached_make_nt(COLUMNS)._make(values)
+
+
+def test_columns_by_name_attribute_and_index():
+    row = _row(7, "Sara", 3)
+    assert row["name"] == row.name == row[1] == "Sara"
+    assert row["count"] == 3
+    assert row.get("guest_id") == 7
+
+
+def test_only_columns_are_keys():
+    row = _row(7, "Sara", 3)
+    assert row.get("index") is None
+    assert row.get("_asdict", "missing") == "missing"
+    with pytest.raises(KeyError):
+        row["_asdict"]
+    with pytest.raises(KeyError):
+        row["email"]
+    assert "name" in row
+    assert "index" not in row
+
+
+def test_mapping_views():
+    row = _row(7, "Sara", 3)
+    assert list(row.keys()) == list(COLUMNS)
+    assert dict(row.items()) == {"guest_id": 7, "name": "Sara", "count": 3}
+    assert dict(row) == row._asdict()
+
+
+def test_row_class_is_cached_per_column_set():
+    assert type(_row(1, "a", 0)) is type(_row(2, "b", 1))
+    assert CompactCursor._cached_make_nt(("guest_id",)) is not type(_row(1, "a", 0))
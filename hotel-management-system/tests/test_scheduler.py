@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+from scheduler import JOBS, Job, Scheduler
+
+
+def _wait(database, hotel, start=5, nights=2):
+    check_in = date.today() + timedelta(days=start)
+    return database.add_waitlist_entry(
+        hotel["guest_id"], hotel["emp_id"], check_in, check_in + timedelta(days=nights), 1, rooms=1, room_type="single"
+    )
+
+
+def _status(database, wait_id):
+    return database.execute(
+        "SELECT status, matched_rooms FROM waitlist WHERE wait_id = %s", (wait_id,), fetchone=True
+    )
+
+
+def test_expired_hold_goes_to_next_entry(database, hotel):
+    first, matched = _wait(database, hotel)
+    assert matched
+    second, matched = _wait(database, hotel)
+    assert matched
+    third, matched = _wait(database, hotel)
+    assert not matched  # both singles are held
+    database.execute("UPDATE waitlist SET matched_at = NOW() - INTERVAL '2 days' WHERE wait_id = %s", (first,))
+
+    assert database.release_expired_holds(24) == 1
+    assert _status(database, first)["status"] == "expired"
+    assert _status(database, second)["status"] == "matched"
+    assert _status(database, third) == {"status": "matched", "matched_rooms": _status(database, first)["matched_rooms"]}
+    assert database.release_expired_holds(24) == 0
+
+
+def test_per_process_job_runs_without_lock_or_bookkeeping(database):
+    calls = []
+    j = Job("test_local", 60, lambda db: calls.append(db), per_process=True)
+    s = Scheduler(database, {j.name: j})
+    try:
+        assert s.run_job(j)
+        assert not s.run_job(j)  # not due again for a minute
+        assert len(calls) == 1
+        assert s.metrics[j.name]["runs"] == 1 and s.metrics[j.name]["skipped"] == 1
+        assert not database.execute("SELECT 1 FROM scheduler_job WHERE name = %s", (j.name,), fetch=True)
+    finally:
+        s.stop()
+
+
+def test_warm_caches(database, hotel):
+    assert JOBS["warm_caches"].per_process
+    assert JOBS["warm_caches"].func(database).startswith("inventory version")
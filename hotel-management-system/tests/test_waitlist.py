@@ -0,0 +1,65 @@
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import book
+
+
+def _matched_entry(database, hotel):
+    check_in = date.today() + timedelta(days=5)
+    wait_id, matched = database.add_waitlist_entry(
+        hotel["guest_id"], hotel["emp_id"], check_in, check_in + timedelta(days=2), 1, rooms=1, room_type="single"
+    )
+    assert matched
+    return wait_id
+
+
+def _entry(database, wait_id):
+    return database.execute("SELECT status, res_id FROM waitlist WHERE wait_id = %s", (wait_id,), fetchone=True)
+
+
+def _reservations(database):
+    return database.execute("SELECT COUNT(*) AS n FROM reservation", fetchone=True)["n"]
+
+
+def test_second_booking_is_refused_and_keeps_the_entry_booked(database, hotel):
+    wait_id = _matched_entry(database, hotel)
+    res_id = database.book_waitlist_entry(wait_id, hotel["emp_id"])
+    with pytest.raises(ValueError):
+        database.book_waitlist_entry(wait_id, hotel["emp_id"])
+    assert _entry(database, wait_id) == {"status": "booked", "res_id": res_id}
+    assert _reservations(database) == 1
+
+
+def test_concurrent_bookings_make_one_reservation(database, hotel):
+    wait_id = _matched_entry(database, hotel)
+    start = threading.Barrier(4)
+    results = []
+
+    def click():
+        start.wait()
+        try:
+            results.append(database.book_waitlist_entry(wait_id, hotel["emp_id"]))
+        except ValueError as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=click) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    booked = [r for r in results if isinstance(r, int)]
+    assert len(booked) == 1
+    assert _entry(database, wait_id) == {"status": "booked", "res_id": booked[0]}
+    assert _reservations(database) == 1
+
+
+def test_taken_rooms_send_the_entry_back_to_waiting(database, hotel):
+    wait_id = _matched_entry(database, hotel)
+    rooms = database.execute("SELECT matched_rooms FROM waitlist WHERE wait_id = %s", (wait_id,), fetchone=True)
+    book(database, hotel, rooms["matched_rooms"] + [2], start=5)  # both singles booked behind the waitlist's back
+    with pytest.raises(ValueError):
+        database.book_waitlist_entry(wait_id, hotel["emp_id"])
+    assert _entry(database, wait_id)["status"] == "waiting"